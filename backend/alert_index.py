@@ -0,0 +1,196 @@
+"""
+In-process index of the alerts collection for real-time ingestion.
+
+`/api/transaction` asks two questions about the alerts collection for every
+transaction: was the same amount paid to this vendor in the last 24 hours
+(duplicate check), and how many alerts does the vendor have (repeat-offender
+boost). AlertIndex answers both from memory:
+
+- (vendor_id, amount) keys of recent alerts, bucketed by the hour of their
+  created_at; buckets older than the window are dropped as time moves on;
+- an alert counter per vendor.
+
+It is warmed from MongoDB at startup and updated by the API on every alert it
+inserts, so the lookups cost the same whatever the size of the collection.
+Until it is warm (or if warming failed) the queries go to MongoDB.
+
+Consistency (AUDITAI_ALERT_INDEX):
+
+- "local" (default): the index sees the alerts that existed when it was warmed
+  plus the ones this process inserts. Exact with a single API worker. With
+  several workers, alerts inserted by the others are missed until the next
+  refresh; set AUDITAI_ALERT_INDEX_REFRESH (seconds) to re-warm periodically,
+  which bounds that staleness. Alerts this process inserts while a warm is
+  reading MongoDB are recorded and replayed into the new state before it is
+  swapped in, unless the scan already returned them (matched on _id).
+- "mongo": no index; every check queries MongoDB. Consistent across any number
+  of workers, at two round trips per transaction.
+"""
+
+import asyncio
+import os
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+MODE = os.getenv("AUDITAI_ALERT_INDEX", "local")
+REFRESH_SECONDS = float(os.getenv("AUDITAI_ALERT_INDEX_REFRESH", "0"))
+DUPLICATE_WINDOW = timedelta(hours=24)
+
+_HOUR = 3600
+
+
+class AlertIndex:
+    def __init__(self, collection, mode: str = MODE, window: timedelta = DUPLICATE_WINDOW):
+        if mode not in ("local", "mongo"):
+            raise ValueError(f"unknown alert index mode: {mode}")
+        self.collection = collection
+        self.mode = mode
+        self.window = window
+        self.ready = False
+        self.warmed_at = None
+        self._buckets: Dict[int, Dict[tuple, List[tuple]]] = {} # hour -> (vendor, amount) -> [(created_at, transaction_id)]
+        self._vendor_counts = Counter()
+        self._lookups = Counter()
+        self._refresh_task = None
+        self._inserted_during_warm = None # alerts add_many saw while a warm is reading
+        self._generation = 0 # bumped by clear(), so a warm that overlapped it is dropped
+
+    async def warm(self):
+        """Load the vendor counters and the last window's keys from MongoDB"""
+        if self.mode != "local":
+            return
+        generation = self._generation
+        self._inserted_during_warm = inserted = []
+        try:
+            since = datetime.utcnow() - self.window
+            # Alerts before the window are only counted; the window's are read one by one
+            counts = Counter()
+            older = {"$match": {"created_at": {"$not": {"$gte": since}}}}
+            async for group in self.collection.aggregate([older, {"$group": {"_id": "$vendor_id", "count": {"$sum": 1}}}]):
+                counts[group["_id"]] = group["count"]
+            buckets, scanned = {}, set()
+            projection = {"vendor_id": 1, "amount": 1, "created_at": 1, "transaction_id": 1}
+            async for alert in self.collection.find({"created_at": {"$gte": since}}, projection):
+                counts[alert.get("vendor_id")] += 1
+                self._add_key(buckets, alert)
+                scanned.add(alert["_id"])
+        finally:
+            self._inserted_during_warm = None
+        if generation != self._generation:
+            return # the collection was emptied meanwhile; what was read may be gone
+        # Inserts made during the scan that it did not return (the API's alerts are dated now)
+        for alert in inserted:
+            created_at = as_utc(alert.get("created_at"))
+            if created_at is not None and created_at >= since and alert.get("_id") not in scanned:
+                counts[alert.get("vendor_id")] += 1
+                self._add_key(buckets, alert)
+        # Swapped in together, so a lookup never sees half a warm-up
+        self._buckets, self._vendor_counts = buckets, counts
+        self.ready = True
+        self.warmed_at = datetime.utcnow()
+
+    def start_refresh(self, interval: float = REFRESH_SECONDS):
+        """Re-warm every `interval` seconds in the background (multi-worker "local" mode)"""
+        if self.mode == "local" and interval > 0 and self._refresh_task is None:
+            self._refresh_task = asyncio.get_running_loop().create_task(self._refresh_forever(interval))
+
+    async def _refresh_forever(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.warm()
+            except Exception as e:
+                print(f"⚠️ Alert index refresh failed: {e}")
+
+    def add(self, alert: Dict):
+        """Record an alert the API has inserted"""
+        self.add_many([alert])
+
+    def add_many(self, alerts: List[Dict]):
+        if self._inserted_during_warm is not None:
+            self._inserted_during_warm.extend(alerts)
+        if not self.ready:
+            return
+        since = datetime.utcnow() - self.window
+        for alert in alerts:
+            self._vendor_counts[alert.get("vendor_id")] += 1
+            created_at = as_utc(alert.get("created_at"))
+            if created_at is not None and created_at >= since:
+                self._add_key(self._buckets, alert)
+
+    def clear(self):
+        """The alerts collection was emptied"""
+        self._generation += 1
+        self._buckets = {}
+        self._vendor_counts = Counter()
+
+    async def find_duplicate(self, vendor_id, amount, since: datetime) -> Optional[Dict]:
+        """An alert for the same vendor and amount created at or after `since`, else None"""
+        if not self.ready:
+            self._lookups["mongo"] += 1
+            return await self.collection.find_one({
+                "vendor_id": vendor_id,
+                "amount": amount,
+                "created_at": {"$gte": since}
+            })
+        self._lookups["memory"] += 1
+        self._prune(since)
+        first_hour = _hour(since)
+        for hour in sorted(h for h in self._buckets if h >= first_hour):
+            for created_at, transaction_id in self._buckets[hour].get((vendor_id, amount), ()):
+                if created_at >= since:
+                    return {"vendor_id": vendor_id, "amount": amount, "created_at": created_at, "transaction_id": transaction_id}
+        return None
+
+    async def vendor_alert_count(self, vendor_id) -> int:
+        if not self.ready:
+            return await self.collection.count_documents({"vendor_id": vendor_id})
+        return self._vendor_counts.get(vendor_id, 0)
+
+    def metrics(self) -> Dict:
+        return {
+            "mode": self.mode,
+            "ready": self.ready,
+            "warmed_at": self.warmed_at,
+            "vendors": len(self._vendor_counts),
+            "recent_keys": sum(len(keys) for keys in self._buckets.values()),
+            "hour_buckets": len(self._buckets),
+            "lookups": dict(self._lookups),
+        }
+
+    def _add_key(self, buckets, alert):
+        created_at = as_utc(alert.get("created_at"))
+        if created_at is None:
+            return # never matches the duplicate query's created_at range
+        key = (alert.get("vendor_id"), alert.get("amount"))
+        buckets.setdefault(_hour(created_at), {}).setdefault(key, []).append((created_at, alert.get("transaction_id")))
+
+    def _prune(self, since: datetime):
+        first_hour = _hour(since)
+        for hour in [h for h in self._buckets if h < first_hour]:
+            del self._buckets[hour]
+
+
+def _hour(moment: datetime) -> int:
+    return int(moment.replace(tzinfo=timezone.utc).timestamp()) // _HOUR
+
+
+def as_utc(value) -> Optional[datetime]:
+    """A created_at value as MongoDB compares it: a naive UTC datetime (None if it is not a date)"""
+    if value is None or value is pd.NaT:
+        return None
+    if isinstance(value, pd.Timestamp):
+        value = value.to_pydatetime()
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def is_number(value) -> bool:
+    """A numeric field value as `$sum`/`$avg` count it (bools are not numbers)"""
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
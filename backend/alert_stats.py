@@ -0,0 +1,140 @@
+"""
+Alert statistics for the dashboard (`/api/stats`).
+
+Two ways to answer, picked with AUDITAI_STATS_MODE:
+
+- "facet" (default): one `$facet` aggregation computes the severity counts, the
+  flagged amount and the monthly counts in a single pass over `alerts`.
+- "materialized": a stats document keeps the same numbers. The API applies
+  `$inc` updates to it as it inserts or deletes alerts, so `/api/stats` reads
+  one document whatever the collection size. `$inc` is atomic, so any number
+  of workers can update it. The document is built with the facet pipeline at
+  startup if it is missing, and rebuilt on demand with `rebuild()`. Writes
+  that bypass the API are not counted, and floating-point drift in the
+  amount total is possible; a rebuild fixes both.
+"""
+
+import os
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Iterable
+
+from alert_index import as_utc, is_number
+
+MODE = os.getenv("AUDITAI_STATS_MODE", "facet")
+STATS_ID = "alerts"
+
+# Severity bands of /api/stats, as (name, lower bound, upper bound)
+BANDS = [("critical", 0.8, None), ("high", 0.6, 0.8), ("medium", 0.4, 0.6)]
+
+
+def _is_date(expr):
+    return {"$eq": [{"$type": expr}, "date"]}
+
+
+def _in_band(low, high):
+    # Only numbers are compared, as in a {"risk_score": {"$gte": ...}} query
+    conditions = [{"$isNumber": "$risk_score"}, {"$gte": ["$risk_score", low]}]
+    if high is not None:
+        conditions.append({"$lt": ["$risk_score", high]})
+    return {"$cond": [{"$and": conditions}, 1, 0]}
+
+
+FACET_PIPELINE = [
+    {"$facet": {
+        "totals": [{"$group": dict(
+            {"_id": None, "total": {"$sum": 1}, "total_flagged_amount": {"$sum": "$amount"}},
+            **{name: {"$sum": _in_band(low, high)} for name, low, high in BANDS}
+        )}],
+        "monthly": [
+            {"$group": {
+                "_id": {"$cond": [_is_date("$created_at"), {"$month": "$created_at"}, None]},
+                "count": {"$sum": 1}
+            }},
+            {"$sort": {"_id": 1}}
+        ],
+    }}
+]
+
+
+class AlertStats:
+    def __init__(self, alerts, stats_collection, mode: str = MODE):
+        if mode not in ("facet", "materialized"):
+            raise ValueError(f"unknown stats mode: {mode}")
+        self.alerts = alerts
+        self.stats_collection = stats_collection
+        self.mode = mode
+
+    async def get(self) -> Dict:
+        """{total, critical, high, medium, total_flagged_amount, monthly: {month: count}}"""
+        if self.mode == "materialized":
+            doc = await self.stats_collection.find_one({"_id": STATS_ID})
+            if doc is not None:
+                return {
+                    "total": doc.get("total", 0),
+                    **{name: doc.get(name, 0) for name, _, _ in BANDS},
+                    "total_flagged_amount": doc.get("total_flagged_amount", 0.0),
+                    "monthly": {int(m): n for m, n in doc.get("monthly", {}).items() if n},
+                }
+        return await self.compute()
+
+    async def compute(self) -> Dict:
+        """The statistics from the alerts themselves, in one aggregation"""
+        result = await self.alerts.aggregate(FACET_PIPELINE).to_list(length=1)
+        facets = result[0] if result else {"totals": [], "monthly": []}
+        totals = facets["totals"][0] if facets["totals"] else {}
+        return {
+            "total": totals.get("total", 0),
+            **{name: totals.get(name, 0) for name, _, _ in BANDS},
+            "total_flagged_amount": totals.get("total_flagged_amount", 0.0),
+            "monthly": {m["_id"]: m["count"] for m in facets["monthly"] if m["_id"] is not None},
+        }
+
+    async def ensure(self):
+        """Build the stats document if the materialized mode has none yet"""
+        if self.mode == "materialized" and await self.stats_collection.find_one({"_id": STATS_ID}) is None:
+            await self.rebuild()
+
+    async def rebuild(self):
+        stats = await self.compute()
+        doc = {key: value for key, value in stats.items() if key != "monthly"}
+        doc["monthly"] = {str(m): n for m, n in stats["monthly"].items()}
+        doc["updated_at"] = datetime.utcnow()
+        await self.stats_collection.replace_one({"_id": STATS_ID}, doc, upsert=True)
+
+    async def apply(self, added: Iterable[Dict] = (), removed: Iterable[Dict] = ()):
+        """
+        Count inserted alerts in and deleted ones out (a re-scored alert is both:
+        its old version removed, its new one added), in one atomic $inc.
+        """
+        if self.mode != "materialized":
+            return
+        inc = Counter()
+        for alerts, sign in ((added, 1), (removed, -1)):
+            for alert in alerts:
+                _count(inc, alert, sign)
+        inc = {key: value for key, value in inc.items() if value}
+        if inc:
+            await self.stats_collection.update_one(
+                {"_id": STATS_ID}, {"$inc": inc, "$set": {"updated_at": datetime.utcnow()}}, upsert=True
+            )
+
+    async def reset(self):
+        """The alerts collection was emptied"""
+        if self.mode == "materialized":
+            await self.rebuild()
+
+
+def _count(inc: Counter, alert: Dict, sign: int):
+    inc["total"] += sign
+    score = alert.get("risk_score")
+    if is_number(score):
+        for name, low, high in BANDS:
+            if score >= low and (high is None or score < high):
+                inc[name] += sign
+    amount = alert.get("amount")
+    if is_number(amount):
+        inc["total_flagged_amount"] += sign * amount
+    created_at = as_utc(alert.get("created_at"))
+    if created_at is not None:
+        inc[f"monthly.{created_at.month}"] += sign
@@ -11,16 +11,35 @@ from typing import List, Optional
 import pandas as pd
 import io
 import json
-from datetime import datetime, timedelta
+import asyncio
+import heapq
+import os
+import tempfile
+from datetime import date, datetime, timedelta
 from pathlib import Path
 
-from fraud_detector import FraudDetector, get_detector
+from fraud_detector import FraudDetector, get_detector, reload_detector
+from model_registry import ModelRegistry
+from micro_batcher import MicroBatcher
+from executors import Executors
+from jobs import JobStore
+from csv_stream import CsvBatchReader
+from alert_index import AlertIndex
+from alert_stats import AlertStats
+from vendor_rollups import VendorRollups
+from department_rollups import DepartmentRollups
 from database import (
     users_collection, 
     alerts_collection, 
     transactions_collection,
+    jobs_collection,
+    stats_collection,
+    vendor_rollups_collection,
+    department_days_collection,
     alert_helper, 
-    user_helper
+    user_helper,
+    ensure_indexes,
+    explain_hot_queries
 )
 from auth import (
     get_password_hash, 
@@ -32,7 +51,8 @@ from auth import (
 from network_engine import NetworkEngine
 from benford import BenfordAnalyzer
 
-from narrative_engine import NarrativeEngine
+from narrative_engine import NarrativeEngine, NarrativeContext, render_explanation
+from reason_codes import reason, render_reasons, REPEAT_OFFENDER, ESCALATING, DUPLICATE_PAYMENT
 from rag_engine import RagEngine
 
 # Initialize engines
@@ -65,8 +85,40 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize fraud detector
-detector = get_detector()
+# Initialize fraud detector (loads on first use). Routes call get_detector() so a
+# model reload is picked up by the next request.
+get_detector()
+model_registry = ModelRegistry()
+_model_reload_lock = asyncio.Lock()
+
+# CPU-bound work (parsing, batch scoring, narratives, Benford) runs here, not on the event loop
+executors = Executors(get_detector().model_path)
+
+# Real-time scoring: concurrent /api/predict and /api/transaction calls are
+# scored together, one detector call per batch in the executors' thread pool
+prediction_batcher = MicroBatcher(
+    lambda transactions: get_detector().predict_batch(transactions),
+    max_batch_size=int(os.getenv("PREDICT_BATCH_SIZE", "64")),
+    max_wait_ms=float(os.getenv("PREDICT_BATCH_WAIT_MS", "2")),
+    run=executors.run,
+)
+
+# Uploads are parsed and scored UPLOAD_CHUNK_ROWS rows at a time. Background
+# uploads (/api/upload?background=true) are tracked at /api/jobs/{id}; the last
+# AUDITAI_FINISHED_JOBS finished ones are kept in memory
+upload_jobs = JobStore(jobs_collection, max_finished=int(os.getenv("AUDITAI_FINISHED_JOBS", "256")))
+
+# Duplicate and vendor-history checks of /api/transaction, answered from memory
+# (see alert_index.py for the multi-worker consistency modes)
+alert_index = AlertIndex(alerts_collection)
+# Dashboard statistics (see alert_stats.py for the materialized mode)
+alert_stats = AlertStats(alerts_collection, stats_collection)
+# Per-vendor rollups behind /api/entities, updated as alerts are written
+vendor_rollups = VendorRollups(alerts_collection, vendor_rollups_collection)
+# Per-department day buckets behind /api/departments date ranges
+department_rollups = DepartmentRollups(alerts_collection, department_days_collection)
+UPLOAD_CHUNK_ROWS = int(os.getenv("UPLOAD_CHUNK_ROWS", "10000"))
+UPLOAD_REQUIRED_COLUMNS = ['transaction_id', 'amount', 'department_id', 'vendor_id']
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 # --- Pydantic Models ---
@@ -99,12 +151,16 @@ class Token(BaseModel):
     access_token: str
     token_type: str
 
+class ModelReload(BaseModel):
+    version: Optional[str] = None
+
 class PredictionResult(BaseModel):
     transaction_id: str
     is_fraud: bool
     risk_score: float
     risk_level: str
     reasons: List[str]
+    reason_codes: List[dict] = []
     amount: float
     department_id: str
     vendor_id: str
@@ -131,6 +187,11 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
         raise HTTPException(status_code=404, detail="User not found")
     return user_helper(user)
 
+async def get_admin_user(current_user: dict = Depends(get_current_user)):
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return current_user
+
 # --- Routes ---
 
 @app.get("/")
@@ -140,7 +201,7 @@ async def root():
         "version": "2.0.0",
         "status": "running",
         "database": "connected (MongoDB)",
-        "model_status": detector.get_model_info()
+        "model_status": get_detector().get_model_info()
     }
 
 @app.get("/api/health")
@@ -148,12 +209,94 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "model_loaded": detector.model_loaded,
+        "model_loaded": get_detector().model_loaded,
         "database": "connected"
     }
 
+@app.get("/api/metrics")
+async def metrics():
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "prediction_batcher": prediction_batcher.metrics(),
+        "alert_index": alert_index.metrics()
+    }
+
+# --- Model Administration ---
+
+@app.get("/api/admin/models")
+async def list_models(admin: dict = Depends(get_admin_user)):
+    return {
+        "active": get_detector().get_model_info(),
+        "registry_active_version": model_registry.active_version(),
+        "versions": model_registry.versions()
+    }
+
+@app.post("/api/admin/models/reload")
+async def reload_model(request: ModelReload, admin: dict = Depends(get_admin_user)):
+    """
+    Load a registry version (the ACTIVE one by default) in a worker thread and
+    swap it in. Requests already holding the old detector finish on it; the
+    event loop keeps serving predictions while the new model loads.
+    """
+    async with _model_reload_lock:
+        try:
+            if request.version:
+                model_path = model_registry.path(request.version)
+            else:
+                model_path = model_registry.active_path()
+                if model_path is None:
+                    raise HTTPException(status_code=404, detail="No active model version in the registry")
+        except KeyError as e:
+            raise HTTPException(status_code=404, detail=str(e))
+
+        try:
+            detector = await asyncio.to_thread(reload_detector, model_path)
+        except RuntimeError as e:
+            raise HTTPException(status_code=500, detail=str(e))
+        executors.reload(detector.model_path)
+        if request.version:
+            model_registry.activate(request.version) # a restart keeps serving this version
+        return detector.get_model_info()
+
+# --- Database Diagnostics ---
+
+@app.get("/api/admin/db/explain")
+async def explain_queries(admin: dict = Depends(get_admin_user)):
+    """Query plan of each hot query; any collection scan is listed under `collscans`"""
+    queries = await explain_hot_queries()
+    return {
+        "collscans": [name for name, plan in queries.items() if plan.get("collscan")],
+        "queries": queries
+    }
+
+@app.on_event("startup")
+async def start_executors():
+    # Spawn the scoring processes in the background so startup is not held up
+    def warm():
+        try:
+            executors.warm()
+        except Exception as e:
+            print(f"⚠️ Scoring process pool not warmed: {e}")
+    executors.threads.submit(warm)
+
+@app.on_event("shutdown")
+async def stop_executors():
+    executors.shutdown()
+
 @app.on_event("startup")
 async def startup_db_client():
+    # Indexes for every access path (see database.INDEX_SPECS); no-op once they exist
+    await ensure_indexes()
+
+    try:
+        await alert_index.warm()
+        alert_index.start_refresh()
+    except Exception as e:
+        print(f"⚠️ Alert index not warmed, checks will query MongoDB: {e}")
+    await alert_stats.ensure()
+    await vendor_rollups.ensure()
+    await department_rollups.ensure()
+
     # Create default admin user if not exists
     admin_email = "admin@auditai.gov"
     existing_admin = await users_collection.find_one({"email": admin_email})
@@ -215,7 +358,8 @@ async def read_users_me(current_user: User = Depends(get_current_user)):
 @app.post("/api/predict", response_model=PredictionResult)
 async def predict_single(transaction: Transaction, current_user: User = Depends(get_current_user)):
     tx_dict = transaction.dict()
-    result = detector.predict_single(tx_dict)
+    result = await prediction_batcher.submit(tx_dict)
+    result['reasons'] = render_reasons(result.get('reason_codes'))
     return result
 
 @app.post("/api/transaction")
@@ -227,32 +371,29 @@ async def ingest_transaction(transaction: Transaction):
     tx_dict = transaction.dict()
     
     # 1. Predict (Base ML Score)
-    result = detector.predict_single(tx_dict)
+    result = await prediction_batcher.submit(tx_dict)
     
     # 1. Duplicate Check (The "Basic Fail" Fix)
     # Check if exact same amount to same vendor in last 24 hours
     cutoff_time = datetime.utcnow() - timedelta(hours=24)
-    duplicate = await alerts_collection.find_one({
-        "vendor_id": tx_dict.get('vendor_id'),
-        "amount": tx_dict.get('amount'),
-        "created_at": {"$gte": cutoff_time}
-    })
+    duplicate = await alert_index.find_duplicate(tx_dict.get('vendor_id'), tx_dict.get('amount'), cutoff_time)
 
     if duplicate:
         result['risk_score'] = 1.0
         result['risk_level'] = "CRITICAL"
-        result['explanation'] = f"🚨 DUPLICATE PAYMENT DETECTED. Identical amount (₹{tx_dict.get('amount')}) paid to this vendor recently (ID: {duplicate.get('transaction_id')})."
+        result['narrative_codes'] = [reason(DUPLICATE_PAYMENT, amount=tx_dict.get('amount'), transaction_id=duplicate.get('transaction_id'))]
         # Skip ML if duplicate
         await alerts_collection.insert_one(result)
-        return result
+        await record_alerts([result])
+        return with_text(result)
 
     # 2. Risk Recalibration (The "Entity-First" Logic)
     # Check history: Has this vendor been flagged before?
     vendor_id = tx_dict.get('vendor_id')
-    history_count = await alerts_collection.count_documents({"vendor_id": vendor_id})
+    history_count = await alert_index.vendor_alert_count(vendor_id)
     
-    recalibration_note = ""
     boost = 0.0
+    narrative_codes = []
     
     if history_count > 0:
         # Boost logic: +10% for repeat offense, max +30%
@@ -265,20 +406,13 @@ async def ingest_transaction(transaction: Transaction):
         elif result['risk_score'] >= 0.6:
             result['risk_level'] = "HIGH"
             
-        recalibration_note = f" [Score boosted +{int(boost*100)} due to {history_count} previous flags]"
+        narrative_codes.append(reason(REPEAT_OFFENDER, flags=history_count, boost=int(boost*100)))
 
     # 3. AI Narrative
-    # Generate base narrative
-    explanation = narrative_engine.generate_narrative(result, None)
-    
-    # Enrich narrative with historical context
-    if history_count > 0:
-        explanation = f"⚠️ Repeat Offender ({history_count} prior flags). {explanation}{recalibration_note}"
-    
+    # Stored as codes (reason_codes + narrative_codes); the text is rendered when read
     if boost > 0.15:
-        explanation = f"🚨 ESCALATING RISK: Vendor risk trajectory is increasing rapidly. {explanation}"
-
-    result['explanation'] = explanation
+        narrative_codes.append(reason(ESCALATING))
+    result['narrative_codes'] = narrative_codes
     
     # 4. Store in DB
     # Ensure timestamps
@@ -298,100 +432,206 @@ async def ingest_transaction(transaction: Transaction):
     alert.pop('_id', None) 
     
     await alerts_collection.insert_one(alert)
+    await record_alerts([alert])
     
     # Clean up for response
     alert.pop('_id', None)
-    return alert
+    return with_text(alert)
+
+async def record_alerts(alerts: List[dict]):
+    """Count newly inserted alerts into the in-memory index, the stats document and the rollups"""
+    alert_index.add_many(alerts)
+    await alert_stats.apply(added=alerts)
+    await vendor_rollups.apply(alerts)
+    await department_rollups.apply(alerts)
+
+def with_text(document: dict) -> dict:
+    """A result or alert ready for a response: its codes rendered into reasons and explanation"""
+    document['reasons'] = render_reasons(document.get('reason_codes'))
+    document['explanation'] = render_explanation(document)
+    return document
+
+def build_upload_results(results_df: pd.DataFrame, context: NarrativeContext) -> List[dict]:
+    """Scored rows as JSON-safe dicts, riskiest first, each with its narrative codes"""
+    results_df = results_df.sort_values('risk_score', ascending=False)
+    # Use to_json to handle NaNs correctly (converts to null), then load back to dict list
+    results_list = json.loads(results_df.to_json(orient='records'))
+    
+    # [NEW] Generate Narratives (AI Detective)
+    # The context holds the whole upload's averages and counts; only the facts
+    # a narrative quotes are stored, and the text is rendered when read
+    for res in results_list:
+        res['narrative_codes'] = narrative_engine.narrative_codes(res, context)
+    return results_list
+
+def build_upload_alerts(results_list: List[dict]) -> List[dict]:
+    alerts_to_store = []
+    for r in results_list:
+        # Format for DB
+        alert = r.copy()
+
+        # Use transaction timestamp if available, else utcnow
+        if alert.get('timestamp'):
+            try:
+                alert['created_at'] = pd.to_datetime(alert['timestamp'])
+            except:
+                alert['created_at'] = datetime.utcnow()
+        else:
+            alert['created_at'] = datetime.utcnow()
+        
+        alerts_to_store.append(alert)
+    return alerts_to_store
+
+def read_upload_context(fileobj) -> NarrativeContext:
+    """Narrative context of the whole file, from its rows cleaned like the scored batches"""
+    context = NarrativeContext()
+    reader = CsvBatchReader(fileobj, UPLOAD_CHUNK_ROWS, usecols=['amount', 'department_id', 'vendor_id'])
+    for batch, _ in reader:
+        context.add(batch)
+    return context
+
+def upload_summary(filename: str, counts: dict, top_results: List[dict], chunk_reports: List[dict]) -> dict:
+    total = counts['total']
+    return {
+        "success": True,
+        "filename": filename,
+        "total_transactions": total,
+        "fraudulent_transactions": counts['fraudulent'],
+        "high_risk_count": counts['high'],
+        "medium_risk_count": counts['medium'],
+        "low_risk_count": counts['low'],
+        "detection_rate": round(counts['fraudulent'] / total * 100, 2) if total > 0 else 0,
+        "rows_rejected": sum(r['rows_rejected'] for r in chunk_reports),
+        "rejected_by_chunk": [r for r in chunk_reports if r['rows_rejected']],
+        "results": top_results
+    }
+
+def check_upload_columns(fileobj):
+    """400 for an empty upload or one without the required columns"""
+    try:
+        columns = CsvBatchReader(fileobj).columns()
+    except pd.errors.EmptyDataError:
+        raise HTTPException(status_code=400, detail="CSV file is empty")
+    missing_cols = [col for col in UPLOAD_REQUIRED_COLUMNS if col not in columns]
+    if missing_cols:
+        raise HTTPException(status_code=400, detail=f"Missing required columns: {missing_cols}")
+
+async def process_upload(fileobj, filename: str, job=None) -> dict:
+    """
+    Score, narrate and store an uploaded CSV batch by batch: only one batch of
+    rows (plus the narrative context) is in memory at a time. Returns the upload
+    summary; progress is reported on `job` if given.
+    """
+    await executors.run(check_upload_columns, fileobj)
+    detector = get_detector() # one model for the whole file, even across a reload
+    # Narratives compare each row with the whole file, so its context is read up front
+    context = await executors.run(read_upload_context, fileobj)
+    if job is not None:
+        job.model_version = detector.get_model_info().get('model_version')
+        job.start(rows_total=context.rows)
+        await upload_jobs.persist(job, force=True)
+
+    counts = {'total': 0, 'fraudulent': 0, 'high': 0, 'medium': 0, 'low': 0}
+    chunk_reports = []
+    top = [] # (risk_score, -row, result) heap of the riskiest rows
+    seen = 0
+    batches = iter(CsvBatchReader(fileobj, UPLOAD_CHUNK_ROWS))
+    while True:
+        batch = await executors.run(next, batches, None)
+        if batch is None:
+            break
+        chunk, report = batch
+        chunk_reports.append(report)
+        if job is not None:
+            job.rows_rejected += report['rows_rejected']
+        if chunk.empty:
+            continue
+
+        results_df = await executors.score_dataframe(detector, chunk)
+        counts['total'] += len(results_df)
+        counts['fraudulent'] += int((results_df['is_fraud'] == True).sum())
+        counts['high'] += int(results_df['risk_level'].isin(['CRITICAL', 'HIGH']).sum())
+        counts['medium'] += int((results_df['risk_level'] == 'MEDIUM').sum())
+        counts['low'] += int(results_df['risk_level'].isin(['LOW', 'MINIMAL']).sum())
+
+        # Prepare for MongoDB, with narratives (AI Detective)
+        results_list = await executors.run(build_upload_results, results_df, context)
+        # Store ALL transactions for advanced analytics (Graph/Benford), accumulatively
+        await transactions_collection.insert_many(results_list)
+        # MongoDB adds _id in-place. Remove it to avoid JSON serialization error in response
+        for r in results_list:
+            r.pop('_id', None)
+        # Store ALL records regardless of score so they appear in Dashboard/History
+        alerts_to_store = await executors.run(build_upload_alerts, results_list)
+        await alerts_collection.insert_many(alerts_to_store)
+        await record_alerts(alerts_to_store)
+
+        for r in results_list:
+            entry = (r['risk_score'], -seen, r)
+            seen += 1
+            if len(top) < 50:
+                heapq.heappush(top, entry)
+            elif entry[:2] > top[0][:2]:
+                heapq.heapreplace(top, entry)
+        if job is not None:
+            job.advance(len(results_df))
+            await upload_jobs.persist(job)
+
+    top_results = [with_text(r) for _, _, r in sorted(top, key=lambda e: e[:2], reverse=True)]
+    return upload_summary(filename, counts, top_results, chunk_reports) # top 50 for the frontend
+
+async def run_upload_job(job, path: str):
+    try:
+        with open(path, 'rb') as f:
+            job.complete(await process_upload(f, job.filename, job))
+    finally:
+        os.remove(path)
 
 @app.post("/api/upload")
-async def upload_csv(file: UploadFile = File(...)):
+async def upload_csv(file: UploadFile = File(...), background: bool = False):
     if not file.filename.endswith('.csv'):
         raise HTTPException(status_code=400, detail="Only CSV files are allowed")
+
+    if background:
+        return await start_upload_job(file)
     
     try:
-        contents = await file.read()
-        df = pd.read_csv(io.StringIO(contents.decode('utf-8')), comment='#', skip_blank_lines=True)
-        
-        # Data Cleaning: Ensure amount is numeric and drop invalid rows
-        if 'amount' in df.columns:
-            df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
-            df = df.dropna(subset=['amount'])
-            
-        required_cols = ['transaction_id', 'amount', 'department_id', 'vendor_id']
-        missing_cols = [col for col in required_cols if col not in df.columns]
-        if missing_cols:
-            raise HTTPException(status_code=400, detail=f"Missing required columns: {missing_cols}")
-        
-        results_df = detector.predict_dataframe(df)
-        
-        # Stats
-        total = len(results_df)
-        fraudulent = len(results_df[results_df['is_fraud'] == True])
-        high_risk = len(results_df[results_df['risk_level'].isin(['CRITICAL', 'HIGH'])])
-        medium_risk = len(results_df[results_df['risk_level'] == 'MEDIUM'])
-        low_risk = len(results_df[results_df['risk_level'].isin(['LOW', 'MINIMAL'])])
-        
-        # Prepare for MongoDB
-        # Prepare for MongoDB
-        results_df = results_df.sort_values('risk_score', ascending=False)
-        # Use to_json to handle NaNs correctly (converts to null), then load back to dict list
-        results_list = json.loads(results_df.to_json(orient='records'))
-        
-        # [NEW] Generate Narratives (AI Detective)
-        # We pass the original df for context (averages, etc)
-        for res in results_list:
-            res['explanation'] = narrative_engine.generate_narrative(res, df)
-        
-        # Store ALL transactions for advanced analytics (Graph/Benford)
-        # [MODIFIED] Store ALL transactions accumulatively (do not clear old history)
-        # await transactions_collection.delete_many({}) 
-        if results_list:
-            await transactions_collection.insert_many(results_list)
-            # MongoDB adds _id in-place. Remove it to avoid JSON serialization error in response
-            for r in results_list:
-                r.pop('_id', None)
-        
-        # [MODIFIED] Store ALL records regardless of score so they appear in Dashboard/History
-        alerts_to_store = []
-        for r in results_list:
-            # Format for DB
-            alert = r.copy()
-            # If narrative engine didn't run (fallback), join reasons. 
-            if not alert.get('explanation') and isinstance(alert.get('reasons'), list):
-                alert['explanation'] = ' | '.join(alert['reasons'])
-
-            # Use transaction timestamp if available, else utcnow
-            if alert.get('timestamp'):
-                try:
-                    alert['created_at'] = pd.to_datetime(alert['timestamp'])
-                except:
-                    alert['created_at'] = datetime.utcnow()
-            else:
-                alert['created_at'] = datetime.utcnow()
-            
-            alerts_to_store.append(alert)
-        
-        if alerts_to_store:
-            await alerts_collection.insert_many(alerts_to_store)
-        
-        return {
-            "success": True,
-            "filename": file.filename,
-            "total_transactions": total,
-            "fraudulent_transactions": fraudulent,
-            "high_risk_count": high_risk,
-            "medium_risk_count": medium_risk,
-            "low_risk_count": low_risk,
-            "detection_rate": round(fraudulent / total * 100, 2) if total > 0 else 0,
-            "results": results_list[:50] # Return top 50 to frontend
-        }
-        
-    except pd.errors.EmptyDataError:
-        raise HTTPException(status_code=400, detail="CSV file is empty")
+        # The UploadFile is already spooled by the server; it is parsed from
+        # there in batches instead of being read into memory whole
+        return await process_upload(file.file, file.filename)
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error: {e}")
         raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
 
+async def start_upload_job(file: UploadFile):
+    """Spool the upload to disk, check its header and hand it to a background job"""
+    fd, path = tempfile.mkstemp(suffix='.csv', prefix='auditai-upload-')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                block = await file.read(1 << 20)
+                if not block:
+                    break
+                out.write(block)
+        with open(path, 'rb') as f:
+            check_upload_columns(f)
+    except BaseException:
+        os.remove(path)
+        raise
+
+    job = upload_jobs.create(file.filename)
+    upload_jobs.launch(job, lambda job: run_upload_job(job, path))
+    return {"job_id": job.id, "status": job.status, "status_url": f"/api/jobs/{job.id}"}
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = await upload_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
 @app.get("/api/alerts")
 async def get_alerts(limit: int = 100, min_score: float = 0.0, sort_by: str = "risk_score"):
     sort_field = "risk_score"
@@ -407,6 +647,10 @@ async def get_alerts(limit: int = 100, min_score: float = 0.0, sort_by: str = "r
 @app.delete("/api/alerts")
 async def clear_alerts():
     await alerts_collection.delete_many({})
+    alert_index.clear()
+    await alert_stats.reset()
+    await vendor_rollups.clear()
+    await department_rollups.clear()
     return {"success": True, "message": "All database alerts cleared."}
 
 class AlertUpdate(BaseModel):
@@ -424,50 +668,35 @@ async def update_alert_status(transaction_id: str, update: AlertUpdate, current_
 
 @app.get("/api/stats")
 async def get_statistics():
-    total = await alerts_collection.count_documents({})
-    critical = await alerts_collection.count_documents({"risk_score": {"$gte": 0.8}})
-    high = await alerts_collection.count_documents({"risk_score": {"$gte": 0.6, "$lt": 0.8}})
-    medium = await alerts_collection.count_documents({"risk_score": {"$gte": 0.4, "$lt": 0.6}})
-    
-    # Aggregation for total amount
-    pipeline = [{"$group": {"_id": None, "total": {"$sum": "$amount"}}}]
-    cursor = alerts_collection.aggregate(pipeline)
-    result = await cursor.to_list(length=1)
-    total_amount = result[0]["total"] if result else 0.0
-
-    # Monthly aggregation
-    monthly_pipeline = [
-        {"$project": {
-            "month": {"$month": "$created_at"},
-            "is_critical": {"$cond": [{"$gte": ["$risk_score", 0.8]}, 1, 0]}
-        }},
-        {"$group": {
-            "_id": "$month",
-            "count": {"$sum": 1},
-            "critical_count": {"$sum": "$is_critical"}
-        }},
-        {"$sort": {"_id": 1}}
-    ]
-    monthly_cursor = alerts_collection.aggregate(monthly_pipeline)
-    monthly_data = await monthly_cursor.to_list(length=12)
+    # One $facet pass over the alerts, or the materialized stats document (see alert_stats.py)
+    stats = await alert_stats.get()
     
     # Format monthly data for frontend (array of 12 ints)
-    monthly_counts = [0] * 12
-    for m in monthly_data:
-        idx = m["_id"] - 1 # Mongo months are 1-12
-        if 0 <= idx < 12:
-            monthly_counts[idx] = m["count"]
+    monthly_counts = [stats["monthly"].get(month, 0) for month in range(1, 13)] # Mongo months are 1-12
 
     return {
-        "total_alerts": total,
-        "critical_alerts": critical,
-        "high_risk_alerts": high,
-        "medium_risk_alerts": medium,
-        "total_flagged_amount": total_amount,
+        "total_alerts": stats["total"],
+        "critical_alerts": stats["critical"],
+        "high_risk_alerts": stats["high"],
+        "medium_risk_alerts": stats["medium"],
+        "total_flagged_amount": stats["total_flagged_amount"],
         "monthly_counts": monthly_counts,
-        "model_info": detector.get_model_info()
+        "model_info": get_detector().get_model_info()
     }
 
+@app.post("/api/admin/stats/rebuild")
+async def rebuild_statistics(admin: dict = Depends(get_admin_user)):
+    """Recount the materialized stats document from the alerts"""
+    await alert_stats.rebuild()
+    return await alert_stats.get()
+
+@app.post("/api/admin/rollups/rebuild")
+async def rebuild_vendor_rollups(admin: dict = Depends(get_admin_user)):
+    """Recompute the vendor rollups and department day buckets from the alerts"""
+    vendors = await vendor_rollups.rebuild()
+    department_days = await department_rollups.rebuild()
+    return {"success": True, "vendors": vendors, "department_days": department_days}
+
 # --- Helper: Deterministic Vendor Name Generator ---
 def generate_vendor_name(vendor_id, category="General"):
     """
@@ -524,6 +753,8 @@ async def get_entities(days: Optional[int] = None, start_date: Optional[str] = N
     Entity-First Aggregation.
     Groups alerts by Vendor to show 'Who is risky' instead of 'What is risky'.
     Supports `days` (lookback) or `start_date`/`end_date` (ISO strings).
+    Without a date filter it reads the vendor rollups (see vendor_rollups.py);
+    a date range is aggregated from the alerts.
     """
     match_stage = {}
     
@@ -557,7 +788,12 @@ async def get_entities(days: Optional[int] = None, start_date: Optional[str] = N
             "departments": {"$addToSet": "$department_id"},
             # Capture last 5 scores for Sparkline/Trend
             "recent_scores": {"$push": "$risk_score"},
-            "recent_reasons": {"$push": "$explanation"}
+            # What render_explanation needs: stored text, or codes plus the fields they quote
+            "recent_reasons": {"$push": {
+                "explanation": "$explanation", "reasons": "$reasons", "reason_codes": "$reason_codes",
+                "narrative_codes": "$narrative_codes", "risk_score": "$risk_score", "amount": "$amount",
+                "vendor_id": "$vendor_id", "department_id": "$department_id",
+            }}
         }},
         {"$project": {
             "vendor_name": 1,
@@ -578,8 +814,11 @@ async def get_entities(days: Optional[int] = None, start_date: Optional[str] = N
     # Remove None stages
     pipeline = [s for s in pipeline if s is not None]
 
-    cursor = alerts_collection.aggregate(pipeline)
-    entities = await cursor.to_list(length=100)
+    if match_stage:
+        cursor = alerts_collection.aggregate(pipeline)
+        entities = await cursor.to_list(length=100)
+    else:
+        entities = await vendor_rollups.entities(limit=100)
     
     # Post-process for "Confidence" and "Trend"
     results = []
@@ -620,44 +859,52 @@ async def get_entities(days: Optional[int] = None, start_date: Optional[str] = N
             "departments": list(e['departments']),
             "last_active": e['last_flagged'],
             "history": scores,  # For sparkline
-            "top_reasons": e['recent_reasons']
+            "top_reasons": [render_explanation(r) for r in e['recent_reasons']]
         })
         
     return results
 
     return results
 
+def parse_day(value: str, name: str) -> date:
+    """A date or ISO datetime query parameter as a day (400 if it is neither)"""
+    try:
+        return datetime.fromisoformat(value).date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{name} must be an ISO date, got {value!r}")
+
+def period_start(period: str, today: date) -> date:
+    """First day of the current month, quarter or year"""
+    if period == "month":
+        return today.replace(day=1)
+    if period == "quarter":
+        return today.replace(month=(today.month - 1) // 3 * 3 + 1, day=1)
+    if period == "year":
+        return today.replace(month=1, day=1)
+    raise HTTPException(status_code=400, detail="period must be one of month, quarter, year")
+
 @app.get("/api/departments")
-async def get_departments():
+async def get_departments(days: Optional[int] = None, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                          period: Optional[str] = None):
     """
     Departmental Oversight Aggregation.
     Answers: 'Which department is generating the most risk?'
+    Supports `period` (month/quarter/year to date), `days` (lookback) or
+    `start_date`/`end_date` (ISO dates, inclusive). Merged from the
+    per-day department buckets (see department_rollups.py).
     """
-    pipeline = [
-        {"$group": {
-            "_id": "$department_id",
-            "dept_name": {"$first": "$department_id"}, 
-            "flag_count": {"$sum": 1},
-            "total_risk_score": {"$sum": "$risk_score"},
-            "avg_risk_score": {"$avg": "$risk_score"},
-            "total_amount": {"$sum": "$amount"},
-            "unique_vendors": {"$addToSet": "$vendor_id"},
-            "top_risk_vendor_score": {"$max": "$risk_score"}
-        }},
-        {"$project": {
-            "dept_name": 1,
-            "flag_count": 1,
-            "total_risk_score": 1,
-            "avg_risk_score": 1,
-            "total_amount": 1,
-            "vendor_count": {"$size": "$unique_vendors"},
-            "top_risk_vendor_score": 1
-        }},
-        {"$sort": {"total_risk_score": -1}}
-    ]
+    today = datetime.utcnow().date()
+    start = end = None
+    if start_date:
+        start = parse_day(start_date, "start_date")
+    elif period:
+        start = period_start(period, today)
+    elif days:
+        start = today - timedelta(days=days)
+    if end_date:
+        end = parse_day(end_date, "end_date")
 
-    cursor = alerts_collection.aggregate(pipeline)
-    depts = await cursor.to_list(length=50)
+    depts = await department_rollups.departments(start, end, limit=50)
     
     results = []
     for d in depts:
@@ -675,6 +922,7 @@ async def get_departments():
             "total_amount": d['total_amount'],
             "avg_score": d['avg_risk_score'],
             "vendor_count": d['vendor_count'],
+            "amount_quartiles": d['amount_quartiles'], # q1, median, q3 (estimated)
             "status": status,
             "risk_index": d['total_risk_score'] # Composite index
         })
@@ -727,7 +975,7 @@ async def get_benford_stats():
         return {"valid": False, "error": "No data"}
         
     amounts = [t.get('amount', 0) for t in transactions]
-    return benford_analyzer.analyze(amounts)
+    return await executors.run(benford_analyzer.analyze, amounts)
 
 # ... (existing upload code) ...
 
@@ -0,0 +1,346 @@
+"""
+Out-of-core execution for AuditEngine.
+
+The ledger is never held in memory as a whole. It is streamed in fixed-size row
+batches twice, then scored one on-disk partition at a time:
+
+1. Per-category counts and sums, plus the vendors of transactions that have
+   auditor feedback.
+2. Squared deviations from those category means, in file order, so the outlier
+   statistics come out exactly as in the in-memory path. During the same pass
+   every row is spilled to a hash partition on disk: by (vendor, department)
+   for DUPLICATE, OFF_HOURS, STAT_OUTLIER and HIGH_FREQUENCY, and by project
+   for CONTRACT_SPLIT.
+3. The project partitions are scored first. Their CONTRACT_SPLIT signals are
+   routed to the (vendor, department) partition of each transaction. Each
+   (vendor, department) partition is then loaded, scored and its alerts are
+   spilled as a sorted run. The runs are merged into the final risk-ordered
+   output.
+
+Ledgers are rarely sorted by time, which is why window state is carried through
+partitions rather than across consecutive chunks. Peak memory is bounded by the
+chunk size and the largest partition, both derived from `memory_limit_mb`.
+"""
+
+import csv
+import heapq
+import itertools
+import json
+import math
+import os
+import pickle
+import resource
+import sys
+import tempfile
+import zlib
+from collections import defaultdict
+from datetime import datetime
+
+from engine import (
+    AuditEngine,
+    HIGH_FREQUENCY_WINDOW,
+    HIGH_FREQUENCY_MIN_COUNT,
+    duplicate_signal,
+    feedback_adjustments,
+    is_off_hours,
+    off_hours_signal,
+    outlier_signal,
+    high_frequency_signal,
+    contract_split_signal,
+)
+from window_engine import parse_timestamp, to_paise, forward_window_counts, forward_window_sums, DUPLICATE_WINDOW_MICROS
+
+# Rough resident cost of one row once its partition is loaded and scored (row, signals, alert)
+ROW_MEMORY_BYTES = 3072
+# Alerts per pickled block in a sorted run, so merging reads runs lazily
+RUN_BLOCK_SIZE = 1000
+
+# Spilled row layout; the timestamp is parsed once when the row is spilled
+ROW, TX_ID, TIMESTAMP, DEPT, VENDOR, CATEGORY, AMOUNT, PROJECT, EPOCH, HOUR, MINUTE, WEEKDAY, MICROS = range(13)
+
+
+def row_record(row_no, tx, parsed):
+    """Compact row tuple in the spilled layout, from a transaction and its parse_timestamp fields"""
+    epoch, micros, hour, minute, weekday = parsed[:5]
+    return (row_no, tx['transaction_id'], tx['timestamp'], tx['department_id'], tx['vendor_id'],
+            tx['vendor_category'], tx['amount'], tx.get('project_id'), epoch, hour, minute, weekday, micros)
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def _partition_of(key, partitions):
+    return zlib.crc32(key.encode('utf-8')) % partitions
+
+
+def _dump_buffers(files, buffers):
+    for k, rows in buffers.items():
+        if rows:
+            pickle.dump(rows, files[k], protocol=pickle.HIGHEST_PROTOCOL)
+    buffers.clear()
+
+
+def _load_blocks(path):
+    """Yield the pickled blocks of a spill file in write order"""
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def group_signals(rows, cat_stats):
+    """
+    DUPLICATE, OFF_HOURS, STAT_OUTLIER and HIGH_FREQUENCY signals for rows that
+    hold every transaction of their (vendor, department) groups, in file order.
+    Returns (rules, prob) keyed by row number.
+    """
+    rules = defaultdict(list)
+    prob = defaultdict(list)
+
+    # Every duplicate key lives in one shard, so file order within it is enough
+    seen = {}
+    for r in rows:
+        key = f"{r[VENDOR]}|{r[DEPT]}|{r[AMOUNT]}"
+        prev = seen.get(key)
+        if prev is not None and abs((r[EPOCH] - prev[EPOCH]) * 10**6 + r[MICROS] - prev[MICROS]) < DUPLICATE_WINDOW_MICROS:
+            rules[r[ROW]].append(duplicate_signal(r[AMOUNT], r[VENDOR], prev[TX_ID]))
+        seen[key] = r
+    seen = None
+
+    # Equal signals share one dict, so a pickled shard carries each of them once
+    off_hours = {}
+    for r in rows:
+        if is_off_hours(r[HOUR], r[WEEKDAY]):
+            clock = (r[HOUR], r[MINUTE], r[WEEKDAY])
+            sig = off_hours.get(clock)
+            if sig is None:
+                sig = off_hours[clock] = off_hours_signal(*clock)
+            rules[r[ROW]].append(sig)
+
+    for r in rows:
+        stats = cat_stats[r[CATEGORY]]
+        if stats['std'] > 0:
+            z = abs(r[AMOUNT] - stats['avg']) / stats['std']
+            if z > 2.0:
+                prob[r[ROW]].append(outlier_signal(r[AMOUNT], z, stats['avg']))
+
+    groups = defaultdict(list)
+    for r in rows:
+        groups[(r[VENDOR], r[DEPT])].append(r)
+    for (v, d), grp in groups.items():
+        keyed = sorted(((r[EPOCH] * 10**6 + r[MICROS], r[TIMESTAMP], r) for r in grp), key=lambda x: x[:2])
+        counts = forward_window_counts([x[0] for x in keyed], HIGH_FREQUENCY_WINDOW * 10**6)
+        for (_, _, r), count in zip(keyed, counts):
+            if count >= HIGH_FREQUENCY_MIN_COUNT:
+                prob[r[ROW]].append(high_frequency_signal(v, count))
+    return rules, prob
+
+
+def contract_split_signals(rows, split_window, split_min_count, split_ceiling):
+    """CONTRACT_SPLIT signals as (row, signal) pairs for rows that hold every transaction of their projects"""
+    projects = defaultdict(list)
+    for r in rows:
+        projects[r[PROJECT]].append(r)
+    flagged = []
+    split_sigs = {}
+    for pid, txs in projects.items():
+        keyed = sorted(((r[EPOCH] * 10**6 + r[MICROS], r[TIMESTAMP], r) for r in txs), key=lambda x: x[:2])
+        counts, sums = forward_window_sums(
+            [x[0] for x in keyed], [to_paise(x[2][AMOUNT]) for x in keyed], split_window * 10**6)
+        for (_, _, r), count, amount_sum in zip(keyed, counts, sums):
+            if count >= split_min_count and amount_sum < to_paise(split_ceiling):
+                sig = split_sigs.get(count)
+                if sig is None:
+                    sig = split_sigs[count] = contract_split_signal(pid, count, split_ceiling, split_window)
+                flagged.append((r, sig))
+        split_sigs.clear()
+    return flagged
+
+
+class ChunkedAuditEngine(AuditEngine):
+    """AuditEngine with bounded memory; opt in with `engine.py --backend chunked`."""
+
+    def __init__(self, data_path, feedback_path='data/auditor_feedback.json',
+                 chunk_size=50000, memory_limit_mb=512, **kwargs):
+        self.memory_limit_mb = memory_limit_mb
+        budget_rows = int(memory_limit_mb * 1024 * 1024 / ROW_MEMORY_BYTES)
+        # A chunk takes at most a quarter of the budget, a loaded partition at most half
+        self.chunk_size = max(1000, min(chunk_size, budget_rows // 4))
+        self.partition_rows = max(1000, budget_rows // 2)
+        self.row_count = 0
+        self.peak_rss_mb = None
+        super().__init__(data_path, feedback_path, **kwargs)
+
+    def load_data(self):
+        """Rows are streamed by run(); nothing is loaded up front."""
+
+    @property
+    def transaction_count(self):
+        return self.row_count
+
+    def iter_chunks(self):
+        """Yield lists of at most chunk_size rows, with the same amount filter as load_data"""
+        with open(self.data_path, mode='r') as f:
+            reader = csv.DictReader(f)
+            while True:
+                rows = list(itertools.islice(reader, self.chunk_size))
+                if not rows:
+                    return
+                chunk = []
+                for row in rows:
+                    try:
+                        row['amount'] = float(row['amount'])
+                        chunk.append(row)
+                    except (ValueError, TypeError):
+                        continue
+                yield chunk
+
+    # --- Passes 1 and 2: statistics and partitioning ---
+
+    def _collect_totals(self):
+        """Category counts and sums, row count, and the vendor of each feedback transaction"""
+        feedback_ids = {f['transaction_id'] for f in self.feedback}
+        vendor_of = {}
+        cat_n = defaultdict(int)
+        cat_sum = defaultdict(float)
+        self.row_count = 0
+        for chunk in self.iter_chunks():
+            self.row_count += len(chunk)
+            for tx in chunk:
+                cat_n[tx['vendor_category']] += 1
+                cat_sum[tx['vendor_category']] += tx['amount']
+                if tx['transaction_id'] in feedback_ids:
+                    vendor_of.setdefault(tx['transaction_id'], tx['vendor_id'])
+        return cat_n, cat_sum, vendor_of
+
+    def _spill_partitions(self, workdir, partitions, cat_avg):
+        """Second pass: squared deviations per category, and every row written to its partitions"""
+        cat_ss = defaultdict(float)
+        group_files = [open(os.path.join(workdir, f"group-{k}.pkl"), 'wb') for k in range(partitions)]
+        project_files = [open(os.path.join(workdir, f"project-{k}.pkl"), 'wb') for k in range(partitions)]
+        group_buf = defaultdict(list)
+        project_buf = defaultdict(list)
+        row_no = 0
+        try:
+            for chunk in self.iter_chunks():
+                for tx in chunk:
+                    cat = tx['vendor_category']
+                    cat_ss[cat] += (tx['amount'] - cat_avg[cat]) ** 2
+                    record = row_record(row_no, tx, parse_timestamp(tx['timestamp']))
+                    group_buf[_partition_of(f"{tx['vendor_id']}|{tx['department_id']}", partitions)].append(record)
+                    if tx.get('project_id'):
+                        project_buf[_partition_of(tx['project_id'], partitions)].append(record)
+                    row_no += 1
+                _dump_buffers(group_files, group_buf)
+                _dump_buffers(project_files, project_buf)
+        finally:
+            for f in group_files + project_files:
+                f.close()
+        return cat_ss
+
+    # --- Pass 3: per-partition scoring ---
+
+    def _route_contract_splits(self, workdir, partitions):
+        """Score each project partition and send CONTRACT_SPLIT signals to the rows' group partitions"""
+        side_files = [open(os.path.join(workdir, f"split-{k}.pkl"), 'wb') for k in range(partitions)]
+        try:
+            for k in range(partitions):
+                rows = [r for block in _load_blocks(os.path.join(workdir, f"project-{k}.pkl")) for r in block]
+                routed = defaultdict(list)
+                for r, sig in contract_split_signals(rows, self.split_window, self.split_min_count, self.split_ceiling):
+                    routed[_partition_of(f"{r[VENDOR]}|{r[DEPT]}", partitions)].append((r[ROW], sig))
+                _dump_buffers(side_files, routed)
+                os.remove(os.path.join(workdir, f"project-{k}.pkl"))
+        finally:
+            for f in side_files:
+                f.close()
+
+    def _score_partition(self, workdir, k, cat_stats, adjustments, now):
+        """Signals and composite alerts for one (vendor, department) partition"""
+        rows = [r for block in _load_blocks(os.path.join(workdir, f"group-{k}.pkl")) for r in block]
+        splits = {}
+        for block in _load_blocks(os.path.join(workdir, f"split-{k}.pkl")):
+            splits.update(block)
+        rules, prob = group_signals(rows, cat_stats)
+        for row_no, sig in splits.items():
+            prob[row_no].append(sig)
+
+        alerts = []
+        for r in rows:
+            r_sigs = rules.get(r[ROW], [])
+            p_sigs = prob.get(r[ROW], [])
+            if not r_sigs and not p_sigs:
+                continue
+            tx = {
+                'transaction_id': r[TX_ID], 'timestamp': r[TIMESTAMP], 'department_id': r[DEPT],
+                'vendor_id': r[VENDOR], 'amount': r[AMOUNT],
+            }
+            alerts.append(self.score_transaction(tx, r_sigs, p_sigs, adjustments, now))
+        return sorted(alerts, key=lambda x: x['risk_score'], reverse=True)
+
+    # --- Driver ---
+
+    def iter_alerts(self):
+        """Yield every alert in descending risk order while keeping memory bounded"""
+        cat_n, cat_sum, vendor_of = self._collect_totals()
+        adjustments = feedback_adjustments(self.feedback, vendor_of)
+        partitions = max(1, math.ceil(self.row_count / self.partition_rows))
+        cat_avg = {cat: cat_sum[cat] / n for cat, n in cat_n.items()}
+        now = datetime.now()
+
+        with tempfile.TemporaryDirectory(prefix="auditai-chunks-") as workdir:
+            cat_ss = self._spill_partitions(workdir, partitions, cat_avg)
+            cat_stats = {
+                cat: {"avg": cat_avg[cat], "std": math.sqrt(cat_ss[cat] / n) if n > 1 else 0}
+                for cat, n in cat_n.items()
+            }
+            self._route_contract_splits(workdir, partitions)
+
+            run_paths = []
+            for k in range(partitions):
+                alerts = self._score_partition(workdir, k, cat_stats, adjustments, now)
+                path = os.path.join(workdir, f"run-{k}.pkl")
+                with open(path, 'wb') as f:
+                    for i in range(0, len(alerts), RUN_BLOCK_SIZE):
+                        pickle.dump(alerts[i:i + RUN_BLOCK_SIZE], f, protocol=pickle.HIGHEST_PROTOCOL)
+                run_paths.append(path)
+                for name in (f"group-{k}.pkl", f"split-{k}.pkl"):
+                    if os.path.exists(os.path.join(workdir, name)):
+                        os.remove(os.path.join(workdir, name))
+
+            runs = [
+                (alert for block in _load_blocks(path) for alert in block)
+                for path in run_paths
+            ]
+            yield from heapq.merge(*runs, key=lambda x: -x['risk_score'])
+
+        self.peak_rss_mb = peak_rss_mb()
+
+    def run(self):
+        return list(self.iter_alerts())
+
+    def run_to_file(self, output_path):
+        """Stream alerts into a JSON array formatted like json.dump(alerts, f, indent=2)"""
+        count = 0
+        with open(output_path, "w") as f:
+            f.write("[")
+            for alert in self.iter_alerts():
+                body = json.dumps(alert, indent=2).replace("\n", "\n  ")
+                f.write((",\n  " if count else "\n  ") + body)
+                count += 1
+            f.write("\n]" if count else "]")
+        return count
+
+    def report_memory(self):
+        """Peak RSS against the configured budget"""
+        peak = self.peak_rss_mb if self.peak_rss_mb is not None else peak_rss_mb()
+        status = "within" if peak <= self.memory_limit_mb else "OVER"
+        return f"Peak RSS: {peak:.1f} MB ({status} the {self.memory_limit_mb} MB budget)"
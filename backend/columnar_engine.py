@@ -0,0 +1,304 @@
+"""
+Columnar execution backend for AuditEngine.
+
+Loads the ledger into typed columns (float64 amounts, datetime64 timestamps,
+categorical codes for the IDs) instead of one dict per row, and computes every
+rules and probabilistic signal with vectorized group operations. Only the rows
+that end up flagged are turned back into Python objects, so a million-row ledger
+runs in seconds with a fraction of the memory of the dict-based engine.
+
+Alerts match AuditEngine.calculate_composite_score (same types, explanations,
+feedback adjustments and score formula); transaction IDs are assumed unique, as
+every ledger producer in this repo guarantees.
+"""
+
+import gc
+from collections import defaultdict
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from engine import (
+    AuditEngine,
+    DUPLICATE_WINDOW_MICROS,
+    HIGH_FREQUENCY_WINDOW,
+    HIGH_FREQUENCY_MIN_COUNT,
+    duplicate_signal,
+    off_hours_signal,
+    outlier_signal,
+    high_frequency_signal,
+    contract_split_signal,
+)
+from window_engine import to_paise
+
+ID_COLUMNS = ['transaction_id', 'vendor_id', 'department_id', 'vendor_category', 'project_id']
+TZ_SUFFIX = r'(?:Z|[+-]\d{2}:?\d{2})$'
+
+
+def _group_codes(*columns):
+    """Dense group codes for a combination of categorical columns (missing values form their own group)."""
+    codes = np.zeros(len(columns[0]), dtype=np.int64)
+    for col in columns:
+        col_codes, uniques = pd.factorize(col, use_na_sentinel=False)
+        # Re-densify after every column so the combined code never overflows
+        codes = pd.factorize(codes * (len(uniques) + 1) + col_codes)[0]
+    return codes
+
+
+def _forward_windows(groups, epochs, ts_rank, window, amounts=None):
+    """
+    Vectorized forward window per group: for every row, count (and optionally sum)
+    the rows of the same group at or after it, in (epoch, timestamp) order, that
+    fall within `window` microseconds. Amounts are integer paise, so the prefix sums
+    stay exact. Returns (order, counts, sums) in sorted order.
+    """
+    order = np.lexsort((ts_rank, epochs, groups))
+    g = groups[order]
+    e = epochs[order] - epochs.min()
+    span = int(e.max()) + window + 1
+    key = g * span + e
+    right = np.searchsorted(key, key + window, side='left')
+    counts = right - np.arange(len(key))
+    sums = None
+    if amounts is not None:
+        prefix = np.concatenate(([0], np.cumsum(amounts[order], dtype=np.int64)))
+        sums = prefix[right] - prefix[np.arange(len(key))]
+    return order, counts, sums
+
+
+class ColumnarAuditEngine(AuditEngine):
+    """AuditEngine over a columnar pandas frame; opt in with `engine.py --backend columnar`."""
+
+    def load_data(self):
+        raw = pd.read_csv(self.data_path, dtype=str, keep_default_na=False)
+        amount = pd.to_numeric(raw['amount'], errors='coerce')
+        # Mirror AuditEngine.load_data: re-check what pandas could not coerce with float()
+        retry = amount.isna()
+        valid = pd.Series(True, index=raw.index)
+        if retry.any():
+            parsed = [self._to_float(v) for v in raw.loc[retry, 'amount']]
+            amount[retry] = [np.nan if v is None else v for v in parsed]
+            valid[retry] = [v is not None for v in parsed]
+        raw = raw[valid].reset_index(drop=True)
+
+        frame = pd.DataFrame({'amount': amount[valid].to_numpy(dtype=np.float64)})
+        for col in ID_COLUMNS:
+            if col in raw.columns:
+                frame[col] = raw[col].astype('category') if col != 'transaction_id' else raw[col]
+        frame['timestamp'] = raw['timestamp']
+
+        ts = raw['timestamp']
+        aware = ts.str.contains(TZ_SUFFIX, regex=True).fillna(False).to_numpy()
+        if aware.any():
+            wall = pd.to_datetime(ts.str.replace(TZ_SUFFIX, '', regex=True), format='ISO8601')
+            utc = pd.to_datetime(ts, format='ISO8601', utc=True).dt.tz_localize(None)
+        else:
+            wall = utc = pd.to_datetime(ts, format='ISO8601')
+        frame['wall_time'] = wall.astype('datetime64[us]')
+        # Exact gaps for every window, as datetime subtraction
+        frame['epoch_us'] = utc.astype('datetime64[us]').astype(np.int64)
+        frame['aware'] = aware
+        self.frame = frame
+        # First occurrence wins, as in AuditEngine.load_data
+        self.vendor_index = dict(zip(
+            frame['transaction_id'].to_numpy()[::-1].tolist(),
+            frame['vendor_id'].astype(object).to_numpy()[::-1].tolist()))
+
+    @staticmethod
+    def _to_float(value):
+        try:
+            return float(value)
+        except (ValueError, TypeError):
+            return None
+
+    @property
+    def transaction_count(self):
+        return len(self.frame)
+
+    # --- Vectorized signal masks ---
+
+    def compute_signal_columns(self):
+        """Compute every signal as per-row arrays: masks, scores and the values the descriptions need."""
+        f = self.frame
+        n = len(f)
+        amounts = f['amount'].to_numpy()
+        epochs_us = f['epoch_us'].to_numpy()
+        ts_rank = pd.factorize(f['timestamp'], sort=True)[0]
+        cols = {
+            'tx_id': f['transaction_id'].to_numpy(dtype=object),
+            'vendor': f['vendor_id'].astype(object).to_numpy(),
+            'amount': amounts,
+        }
+
+        # DUPLICATE: previous row (file order) with the same vendor|department|amount within 24h
+        dup_group = _group_codes(f['vendor_id'], f['department_id'], f['amount'])
+        prev_pos = pd.Series(np.arange(n)).groupby(dup_group, sort=False).shift(1).to_numpy()
+        has_prev = ~np.isnan(prev_pos)
+        dup = np.zeros(n, dtype=bool)
+        prev_idx = prev_pos[has_prev].astype(np.int64)
+        dup[has_prev] = np.abs(epochs_us[has_prev] - epochs_us[prev_idx]) < DUPLICATE_WINDOW_MICROS
+        cols['dup'] = dup
+        cols['dup_prev'] = np.where(has_prev, prev_pos, -1).astype(np.int64)
+
+        # OFF_HOURS: before 06:00, after 22:59 or on a weekend
+        wall = f['wall_time'].dt
+        hour = wall.hour.to_numpy()
+        weekday = wall.dayofweek.to_numpy()
+        cols['minute'] = wall.minute.to_numpy()
+        cols['hour'] = hour
+        cols['weekday'] = weekday
+        cols['off'] = (hour < 6) | (hour > 22) | (weekday >= 5)
+
+        # STAT_OUTLIER: population z-score against the vendor category
+        cat_codes = _group_codes(f['vendor_category'])
+        cat_n = np.bincount(cat_codes).astype(np.float64)
+        cat_avg = np.bincount(cat_codes, weights=amounts) / cat_n
+        avg = cat_avg[cat_codes]
+        cat_ss = np.bincount(cat_codes, weights=(amounts - avg) ** 2)
+        cat_std = np.where(cat_n > 1, np.sqrt(cat_ss / cat_n), 0.0)
+        std = cat_std[cat_codes]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z = np.where(std > 0, np.abs(amounts - avg) / std, 0.0)
+        cols['stat'] = (std > 0) & (z > 2.0)
+        cols['z'] = z
+        cols['cat_avg'] = avg
+
+        # HIGH_FREQUENCY: >= 3 payments per vendor/department within 48h
+        hf_count = np.zeros(n, dtype=np.int64)
+        if n:
+            order, counts, _ = _forward_windows(
+                _group_codes(f['vendor_id'], f['department_id']), epochs_us, ts_rank,
+                HIGH_FREQUENCY_WINDOW * 10**6)
+            hf_count[order] = counts
+        cols['hf'] = hf_count >= HIGH_FREQUENCY_MIN_COUNT
+        cols['hf_count'] = hf_count
+
+        # CONTRACT_SPLIT: rolling project window with a count floor and amount ceiling
+        cs = np.zeros(n, dtype=bool)
+        cs_count = np.zeros(n, dtype=np.int64)
+        if 'project_id' in f.columns:
+            has_project = (f['project_id'].astype(object).fillna('') != '').to_numpy()
+            idx = np.flatnonzero(has_project)
+            if len(idx):
+                order, counts, sums = _forward_windows(
+                    _group_codes(f['project_id'].iloc[idx]), epochs_us[idx], ts_rank[idx],
+                    self.split_window * 10**6,
+                    np.round(amounts[idx] * 100).astype(np.int64)) # to_paise, vectorized
+                rows = idx[order]
+                cs_count[rows] = counts
+                cs[rows] = (counts >= self.split_min_count) & (sums < to_paise(self.split_ceiling))
+        cols['cs'] = cs
+        cols['cs_count'] = cs_count
+        cols['project'] = f['project_id'].astype(object).to_numpy() if 'project_id' in f.columns else None
+        return cols
+
+    def get_rules_signals(self):
+        return self._signal_dicts(self.compute_signal_columns(), rules=True)
+
+    def get_probabilistic_signals(self):
+        return self._signal_dicts(self.compute_signal_columns(), rules=False)
+
+    def _signal_dicts(self, cols, rules):
+        """Materialize the signal maps in AuditEngine's shape (mainly for callers that inspect them)."""
+        signals = defaultdict(list)
+        flagged = (cols['dup'] | cols['off']) if rules else (cols['stat'] | cols['hf'] | cols['cs'])
+        rows = self._as_lists(cols)
+        for i in np.flatnonzero(flagged).tolist():
+            r, p = self._row_signals(rows, i)
+            signals[rows['tx_id'][i]].extend(r if rules else p)
+        return signals
+
+    @staticmethod
+    def _as_lists(cols):
+        """Plain-list view of the signal columns; indexing lists per flagged row is much cheaper than NumPy scalars."""
+        return {k: v.tolist() if isinstance(v, np.ndarray) else v for k, v in cols.items()}
+
+    def _row_signals(self, cols, i):
+        """Build the (rules, probabilistic) signal lists of one row, in AuditEngine's order."""
+        vendor = cols['vendor'][i]
+        amount = cols['amount'][i]
+        r_sigs, p_sigs = [], []
+        if cols['dup'][i]:
+            r_sigs.append(duplicate_signal(amount, vendor, cols['tx_id'][cols['dup_prev'][i]]))
+        if cols['off'][i]:
+            r_sigs.append(off_hours_signal(cols['hour'][i], cols['minute'][i], cols['weekday'][i]))
+        if cols['stat'][i]:
+            p_sigs.append(outlier_signal(amount, cols['z'][i], cols['cat_avg'][i]))
+        if cols['hf'][i]:
+            p_sigs.append(high_frequency_signal(vendor, cols['hf_count'][i]))
+        if cols['cs'][i]:
+            p_sigs.append(contract_split_signal(
+                cols['project'][i], cols['cs_count'][i], self.split_ceiling, self.split_window))
+        return r_sigs, p_sigs
+
+    def run(self):
+        """Vectorized equivalent of get_rules_signals + get_probabilistic_signals + calculate_composite_score."""
+        cols = self.compute_signal_columns()
+        f = self.frame
+        n = len(f)
+
+        rule_max = np.maximum(np.where(cols['dup'], 0.9, 0.0), np.where(cols['off'], 0.7, 0.0))
+        prob_max = np.maximum.reduce([
+            np.where(cols['stat'], np.minimum(0.95, 0.4 + cols['z'] / 10), 0.0),
+            np.where(cols['hf'], 0.8, 0.0),
+            np.where(cols['cs'], 0.85, 0.0),
+        ])
+        flagged = np.flatnonzero(cols['dup'] | cols['off'] | cols['stat'] | cols['hf'] | cols['cs'])
+
+        final = np.where(rule_max > 0, rule_max * 0.7 + prob_max * 0.3, prob_max * 0.85)
+        # Inject slight variance to prevent flat scores (User Request)
+        final = final + np.random.uniform(-0.03, 0.03, size=n)
+
+        # Apply Human Feedback Adjustment
+        adjustments = self.get_feedback_adjustments()
+        vendors = cols['vendor']
+        adjustment = np.array([adjustments.get(v, 0) for v in vendors[flagged]], dtype=np.float64)
+        scores = np.clip(final[flagged] + adjustment, 0.01, 1.0)
+
+        # Pre-payment Guard Check (Transaction in last 60 minutes); aware timestamps never compared
+        now = np.datetime64(datetime.now(), 'us')
+        is_pre = ((now - f['wall_time'].to_numpy()) < np.timedelta64(3600, 's')) & ~f['aware'].to_numpy()
+
+        rows = self._as_lists(cols)
+        timestamps = f['timestamp'].tolist()
+        departments = f['department_id'].astype(object).tolist()
+        is_pre = is_pre.tolist()
+        scores = scores.tolist()
+        adjustment = adjustment.tolist()
+
+        final_alerts = []
+        # Building one dict per alert otherwise triggers a full GC pass every few thousand rows
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self._append_alerts(final_alerts, flagged.tolist(), rows, scores, adjustment, is_pre, timestamps, departments)
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+
+        return sorted(final_alerts, key=lambda x: x['risk_score'], reverse=True)
+
+    def _append_alerts(self, final_alerts, flagged, rows, scores, adjustment, is_pre, timestamps, departments):
+        tx_ids = rows['tx_id']
+        vendors = rows['vendor']
+        amounts = rows['amount']
+        for k, i in enumerate(flagged):
+            r_sigs, p_sigs = self._row_signals(rows, i)
+            v_id = vendors[i]
+            adj = adjustment[k]
+            reasons = [s['desc'] for s in r_sigs + p_sigs]
+            if adj != 0:
+                reasons.append(f"Score adjusted by {adj:+.2f} based on historical auditor feedback for {v_id}.")
+            final_alerts.append({
+                "transaction_id": tx_ids[i],
+                "risk_score": scores[k],
+                "type": r_sigs[0]['type'] if r_sigs else p_sigs[0]['type'],
+                "explanation": " ".join(reasons),
+                "timestamp": timestamps[i],
+                "department": departments[i],
+                "vendor": v_id,
+                "amount": amounts[i],
+                "is_pre_payment": is_pre[i],
+                "evidence": [tx_ids[i]]
+            })
@@ -0,0 +1,116 @@
+"""
+Incremental CSV parsing for uploads.
+
+Reads a binary file object (an UploadFile's spooled file, or a spooled copy on
+disk) in fixed-size DataFrame batches, so only one batch of parsed rows is in
+memory at a time. Rows are cleaned the way `/api/upload` always has (amount
+coerced to a number, rows without one dropped), and every batch carries a report
+of the rows it rejected:
+
+- malformed lines (more fields than the header), which pandas' C parser would
+  raise on and fail the whole upload for;
+- rows whose amount is missing or not a number.
+
+The C parser is kept, and it has no callback for bad lines. So it is given as
+many spare columns as the header has. A row with something in a spare column is
+a malformed line, and it is counted and dropped in the batch it arrived in. A
+line with more than twice the header's fields does not fit even the spares; the
+parser skips it with a ParserWarning and it is not counted. Known columns are
+read as text in every batch, so an ID that looks numeric in one batch is not an
+int in the next, and amount is always coerced to float.
+"""
+
+import io
+from typing import Dict, Iterator, List, Tuple
+
+import pandas as pd
+
+# Rejected rows listed per batch report; the rest are only counted
+MAX_EXAMPLES = 5
+
+TEXT_COLUMNS = ['transaction_id', 'timestamp', 'amount', 'department_id', 'vendor_id', 'vendor_category',
+                'project_id', 'payment_method', 'approver_id', 'budget_code']
+SPARE_PREFIX = '__spare_'
+
+
+class CsvBatchReader:
+    def __init__(self, fileobj, chunk_rows: int = 10000, usecols=None, encoding: str = 'utf-8'):
+        self.fileobj = fileobj
+        self.chunk_rows = chunk_rows
+        self.usecols = usecols
+        self.encoding = encoding
+
+    def columns(self) -> List[str]:
+        """Header of the file (the file is rewound afterwards)"""
+        self.fileobj.seek(0)
+        try:
+            return list(pd.read_csv(self._text(), comment='#', skip_blank_lines=True, nrows=0).columns)
+        finally:
+            self.fileobj.seek(0)
+
+    def __iter__(self) -> Iterator[Tuple[pd.DataFrame, Dict]]:
+        """(cleaned batch, report) pairs from the start of the file"""
+        header = self.columns()
+        spare = [f'{SPARE_PREFIX}{i}' for i in range(len(header))]
+        dtype = {col: str for col in header + spare if col in TEXT_COLUMNS or col in spare}
+        keep = [col for col in header if self.usecols is None or col in self.usecols] + spare
+        reader = pd.read_csv(
+            self._text(), comment='#', skip_blank_lines=True, chunksize=self.chunk_rows,
+            header=None, names=header + spare, dtype=dtype, on_bad_lines='warn',
+        )
+        with reader:
+            reader.get_chunk(1) # the header line
+            for chunk_no, chunk in enumerate(reader):
+                yield self._clean(chunk_no, chunk[keep], spare)
+
+    def _text(self):
+        return io.TextIOWrapper(io.BufferedReader(_Unclosable(self.fileobj)), encoding=self.encoding, newline='')
+
+    def _clean(self, chunk_no: int, chunk: pd.DataFrame, spare: List[str]) -> Tuple[pd.DataFrame, Dict]:
+        filled = chunk[spare].notna().to_numpy()
+        malformed = filled.any(axis=1)
+        bad_lines = chunk[malformed]
+        # Fields of a malformed line: the header's, plus spares up to the last one filled
+        extra = len(spare) - filled[malformed][:, ::-1].argmax(axis=1)
+        rejected = [
+            {"reason": f"malformed line ({len(spare) + n} fields)", "fields": [_plain(v) for v in row[:3]]}
+            for n, row in zip(extra.tolist(), bad_lines.head(MAX_EXAMPLES).itertuples(index=False))
+        ]
+        chunk = chunk[~malformed].drop(columns=spare)
+        invalid = 0
+        if 'amount' in chunk.columns:
+            amounts = pd.to_numeric(chunk['amount'], errors='coerce').astype(float)
+            bad_amount = amounts.isna()
+            invalid = int(bad_amount.sum())
+            if invalid:
+                ids = chunk['transaction_id'] if 'transaction_id' in chunk.columns else pd.Series(None, index=chunk.index)
+                for tx_id, amount in zip(ids[bad_amount].head(MAX_EXAMPLES), chunk['amount'][bad_amount].head(MAX_EXAMPLES)):
+                    rejected.append({"reason": "invalid amount", "transaction_id": _plain(tx_id), "amount": _plain(amount)})
+            chunk['amount'] = amounts
+            chunk = chunk[~bad_amount]
+        report = {
+            "chunk": chunk_no,
+            "rows_accepted": len(chunk),
+            "rows_rejected": len(bad_lines) + invalid,
+            "examples": rejected[:MAX_EXAMPLES],
+        }
+        return chunk, report
+
+
+class _Unclosable(io.RawIOBase):
+    """Read-only view of a file object that TextIOWrapper may close without closing the file"""
+
+    def __init__(self, f):
+        self.f = f
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        data = self.f.read(len(b))
+        b[:len(data)] = data
+        return len(data)
+
+
+def _plain(value):
+    return None if pd.isna(value) else str(value)
@@ -1,9 +1,16 @@
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import PyMongoError
 import os
 import certifi
+from datetime import datetime
 
 from dotenv import load_dotenv
 
+from narrative_engine import render_explanation
+from vendor_rollups import COLLECTION as ROLLUPS_COLLECTION, ENTITIES_INDEX
+from department_rollups import COLLECTION as DEPARTMENT_DAYS_COLLECTION, DAY_INDEX
+
 load_dotenv()
 
 # MongoDB Connection String from User
@@ -16,6 +23,10 @@ database = client.auditai
 users_collection = database.get_collection("users")
 alerts_collection = database.get_collection("alerts")
 transactions_collection = database.get_collection("transactions")
+jobs_collection = database.get_collection("jobs")
+stats_collection = database.get_collection("stats")
+vendor_rollups_collection = database.get_collection(ROLLUPS_COLLECTION)
+department_days_collection = database.get_collection(DEPARTMENT_DAYS_COLLECTION)
 
 # Helpers needed for Pydantic models with MongoDB (Convert ObjectId to str)
 def alert_helper(alert) -> dict:
@@ -29,7 +40,8 @@ def alert_helper(alert) -> dict:
         "department_id": alert["department_id"],
         "vendor_id": alert["vendor_id"],
         "timestamp": alert.get("timestamp"),
-        "explanation": alert.get("explanation", ""),
+        "explanation": render_explanation(alert), # stored as reason/narrative codes
+        "reason_codes": alert.get("reason_codes", []),
         "ml_flag": alert.get("ml_flag", "NORMAL"),
         "status": alert.get("status", "new"),
         "created_at": alert.get("created_at")
@@ -40,4 +52,92 @@ def user_helper(user) -> dict:
         "id": str(user["_id"]),
         "email": user["email"],
         "full_name": user.get("full_name"),
+        "role": user.get("role"),
     }
+
+# --- Indexes ---
+# One index per access path of the API. Key order follows equality, sort,
+# range; a query on a prefix of a compound index is served by it too.
+INDEX_SPECS = {
+    "alerts": [
+        # Duplicate check (vendor + amount in the last 24h); its vendor_id prefix
+        # serves the repeat-offender history count
+        ([("vendor_id", ASCENDING), ("amount", ASCENDING), ("created_at", DESCENDING)], {"name": "vendor_amount_created"}),
+        # /api/alerts by score, /api/stats risk-band counts
+        ([("risk_score", DESCENDING)], {"name": "risk_score"}),
+        # /api/alerts?sort_by=latest (min_score range after the sort key), network graph, entity date filters
+        ([("created_at", DESCENDING), ("risk_score", ASCENDING)], {"name": "created_risk"}),
+        # Status updates from the investigation view
+        ([("transaction_id", ASCENDING)], {"name": "transaction_id"}),
+    ],
+    "users": [
+        ([("email", ASCENDING)], {"name": "email", "unique": True}),
+    ],
+    # /api/entities, riskiest vendors first
+    ROLLUPS_COLLECTION: [ENTITIES_INDEX],
+    # Bucket upserts and /api/departments date ranges
+    DEPARTMENT_DAYS_COLLECTION: [DAY_INDEX],
+}
+
+# The queries explain_hot_queries checks, as explain commands
+HOT_QUERIES = {
+    "duplicate_check": {"find": "alerts", "filter": {"vendor_id": "V-EXPLAIN", "amount": 0.0, "created_at": {"$gte": datetime(1970, 1, 1)}}, "limit": 1},
+    "vendor_history": {"count": "alerts", "query": {"vendor_id": "V-EXPLAIN"}},
+    "alerts_by_score": {"find": "alerts", "filter": {"risk_score": {"$gte": 0.0}}, "sort": {"risk_score": -1}, "limit": 100},
+    "alerts_latest": {"find": "alerts", "filter": {"risk_score": {"$gte": 0.0}}, "sort": {"created_at": -1}, "limit": 100},
+    "critical_count": {"count": "alerts", "query": {"risk_score": {"$gte": 0.8}}},
+    "alert_status_update": {"find": "alerts", "filter": {"transaction_id": "T-EXPLAIN"}, "limit": 1},
+    "entities": {"find": ROLLUPS_COLLECTION, "filter": {}, "sort": {"max_risk_score": -1, "flag_count": -1}, "limit": 100},
+    "department_days": {"find": DEPARTMENT_DAYS_COLLECTION, "filter": {"day": {"$gte": "1970-01-01", "$lte": "1970-03-31"}}},
+    "user_by_email": {"find": "users", "filter": {"email": "explain@auditai.gov"}, "limit": 1},
+}
+
+
+async def ensure_indexes(db=None) -> dict:
+    """
+    Create INDEX_SPECS. Idempotent: Mongo skips indexes that already exist.
+    A spec that cannot be built (e.g. duplicate emails for the unique index)
+    is reported and skipped; the API still starts.
+    """
+    db = database if db is None else db
+    created = {}
+    for collection_name, specs in INDEX_SPECS.items():
+        collection = db.get_collection(collection_name)
+        created[collection_name] = []
+        for keys, options in specs:
+            try:
+                created[collection_name].append(await collection.create_index(keys, **options))
+            except PyMongoError as e:
+                print(f"⚠️ Index {collection_name}.{options.get('name')} not created: {e}")
+    return created
+
+
+async def explain_hot_queries(db=None) -> dict:
+    """The winning plan of each HOT_QUERIES entry; `collscan` marks the ones scanning a whole collection"""
+    db = database if db is None else db
+    report = {}
+    for name, query in HOT_QUERIES.items():
+        try:
+            explained = await db.command({"explain": query, "verbosity": "queryPlanner"})
+        except PyMongoError as e:
+            report[name] = {"error": str(e)}
+            continue
+        nodes = list(_plan_nodes(explained.get("queryPlanner", {}).get("winningPlan", {})))
+        stages = [node["stage"] for node in nodes if "stage" in node]
+        report[name] = {
+            "stages": stages,
+            "index": next((node["indexName"] for node in nodes if "indexName" in node), None),
+            "collscan": "COLLSCAN" in stages,
+        }
+    return report
+
+
+def _plan_nodes(plan):
+    # Classic plans nest through inputStage/inputStages; slot-based ones wrap the tree in queryPlan
+    if not isinstance(plan, dict):
+        return
+    yield plan
+    for key in ("queryPlan", "inputStage"):
+        yield from _plan_nodes(plan.get(key))
+    for child in plan.get("inputStages", []):
+        yield from _plan_nodes(child)
@@ -0,0 +1,219 @@
+"""
+Per-department, per-day alert buckets backing `/api/departments`.
+
+`/api/departments` used to `$group` the whole alerts collection on every call,
+collecting every vendor id of a department with `$addToSet`, and could not
+be limited to a period. The `department_days` collection holds one bucket per
+department and UTC day instead, updated as the API writes alerts:
+
+- flag_count, scored_count, total_risk_score, total_amount ($inc);
+- max_risk_score ($max);
+- vendor_hll: a HyperLogLog sketch of the distinct vendors (see sketches.py),
+  updated with one `$max` per register;
+- amount_kll: a KLL sketch of the amounts. Each write `$push`es the levels of
+  its batch's sketch and `$inc`s amount_n. A bucket holding more than
+  KLL_STORED_ITEMS items is compacted: the compacted sketch is written back on
+  condition that amount_n is unchanged, so no concurrent write is lost. Reads
+  compact the buckets they merge, and a write that takes a bucket's amount_n
+  across a multiple of KLL_STORED_ITEMS re-reads and compacts that bucket, so
+  the sketches stay bounded under write-only load too.
+
+A date range is answered by merging the buckets of its days, so the cost
+depends on the number of days and departments, not of alerts. Vendor counts
+are estimates: exact or off by one for the usual tens of vendors, within a
+few percent for thousands; amount quartiles are within about 1% in rank.
+Alerts without a created_at date go to a bucket with day None that only the
+unfiltered listing includes.
+
+`rebuild()` (or `python department_rollups.py rebuild`) recomputes the buckets
+from the alerts into a scratch collection and swaps it in.
+"""
+
+import asyncio
+from collections import defaultdict
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from alert_index import as_utc, is_number
+from sketches import HyperLogLog, KllSketch, KLL_K, hll_register
+
+COLLECTION = "department_days"
+# Bucket key; a day range is a prefix scan. Also created on the scratch collection of a rebuild
+DAY_INDEX = ([("day", 1), ("department_id", 1)], {"name": "day_department", "unique": True})
+
+KLL_STORED_ITEMS = 4 * KLL_K # a compacted sketch holds at most about 3k
+
+ALERT_FIELDS = ("department_id", "vendor_id", "risk_score", "amount", "created_at")
+
+
+class DepartmentRollups:
+    def __init__(self, alerts, buckets):
+        self.alerts = alerts
+        self.buckets = buckets
+
+    async def apply(self, alerts: Iterable[Dict]):
+        """Fold newly inserted alerts into their day buckets (one update per department and day)"""
+        updates = bucket_updates(alerts)
+        if not updates:
+            return
+        await self.buckets.bulk_write([
+            UpdateOne({"department_id": department, "day": day}, update, upsert=True)
+            for (department, day), update in updates.items()
+        ], ordered=False)
+
+        # Buckets whose amount_n this write took across a multiple of KLL_STORED_ITEMS
+        added = {key: update["$inc"]["amount_n"] for key, update in updates.items() if update["$inc"].get("amount_n")}
+        if not added:
+            return
+        keys = [{"department_id": department, "day": day} for department, day in added]
+        crossed = []
+        async for bucket in self.buckets.find({"$or": keys}, {"department_id": 1, "day": 1, "amount_n": 1}):
+            n = bucket.get("amount_n", 0)
+            if (n - added[(bucket.get("department_id"), bucket.get("day"))]) // KLL_STORED_ITEMS != n // KLL_STORED_ITEMS:
+                crossed.append(bucket["_id"])
+        if crossed:
+            compactions = []
+            async for bucket in self.buckets.find({"_id": {"$in": crossed}}, {"amount_n": 1, "amount_kll": 1}):
+                _, compaction = compacted(bucket)
+                if compaction is not None:
+                    compactions.append(compaction)
+            if compactions:
+                await self.buckets.bulk_write(compactions, ordered=False)
+
+    async def departments(self, start: Optional[date] = None, end: Optional[date] = None, limit: int = 50) -> List[Dict]:
+        """
+        Departments by total risk over [start, end] (inclusive UTC days; open
+        ends are unbounded), shaped like the old /api/departments aggregation's output.
+        """
+        query = {}
+        if start is not None or end is not None:
+            query["day"] = {}
+            if start is not None:
+                query["day"]["$gte"] = start.isoformat()
+            if end is not None:
+                query["day"]["$lte"] = end.isoformat()
+
+        merged, compactions = {}, []
+        async for bucket in self.buckets.find(query, {"day": 0}):
+            department = bucket.get("department_id")
+            total = merged.get(department)
+            if total is None:
+                total = merged[department] = {
+                    "flag_count": 0, "scored_count": 0, "total_risk_score": 0, "total_amount": 0,
+                    "max_risk_score": None, "vendors": HyperLogLog(), "amounts": KllSketch(),
+                }
+            for field in ("flag_count", "scored_count", "total_risk_score", "total_amount"):
+                total[field] += bucket.get(field, 0)
+            score = bucket.get("max_risk_score")
+            if score is not None and (total["max_risk_score"] is None or score > total["max_risk_score"]):
+                total["max_risk_score"] = score
+            total["vendors"].merge_document(bucket.get("vendor_hll"))
+            amounts, compaction = compacted(bucket)
+            if compaction is not None:
+                compactions.append(compaction)
+            total["amounts"].merge_document(amounts)
+        if compactions:
+            await self.buckets.bulk_write(compactions, ordered=False)
+
+        results = [{
+            "_id": department,
+            "dept_name": department,
+            "flag_count": total["flag_count"],
+            "total_risk_score": total["total_risk_score"],
+            "avg_risk_score": total["total_risk_score"] / total["scored_count"] if total["scored_count"] else None,
+            "total_amount": total["total_amount"],
+            "vendor_count": total["vendors"].count(),
+            "top_risk_vendor_score": total["max_risk_score"],
+            "amount_quartiles": total["amounts"].quantiles([0.25, 0.5, 0.75]),
+        } for department, total in merged.items()]
+        results.sort(key=lambda d: d["total_risk_score"], reverse=True)
+        return results[:limit]
+
+    async def clear(self):
+        await self.buckets.delete_many({})
+
+    async def ensure(self):
+        """Rebuild from the alerts if there are alerts but no buckets yet (first start)"""
+        if await self.buckets.estimated_document_count() == 0 and await self.alerts.estimated_document_count() > 0:
+            await self.rebuild()
+
+    async def rebuild(self, batch_size: int = 5000) -> int:
+        """
+        Recompute every bucket from the alerts in a scratch collection that
+        replaces the live one in a single rename (see VendorRollups.rebuild).
+        """
+        scratch = self.buckets.database.get_collection(f"{self.buckets.name}_rebuild")
+        await scratch.drop()
+        keys, options = DAY_INDEX
+        await scratch.create_index(keys, **options)
+        batch = []
+        async for alert in self.alerts.find({}, {field: 1 for field in ALERT_FIELDS}):
+            batch.append(alert)
+            if len(batch) >= batch_size:
+                await DepartmentRollups(self.alerts, scratch).apply(batch)
+                batch = []
+        await DepartmentRollups(self.alerts, scratch).apply(batch)
+        buckets = await scratch.estimated_document_count()
+        if buckets:
+            await scratch.rename(self.buckets.name, dropTarget=True)
+        else:
+            await self.buckets.delete_many({})
+        return buckets
+
+
+def compacted(bucket: Dict) -> Tuple[Optional[Dict], Optional[UpdateOne]]:
+    """
+    A bucket's amount sketch, compacted if it holds more than KLL_STORED_ITEMS
+    items, and the update that stores it then (None otherwise). The update only
+    applies while amount_n is what was read, so it never drops a later `$push`.
+    """
+    amounts = bucket.get("amount_kll")
+    if not amounts or sum(map(len, amounts.values())) <= KLL_STORED_ITEMS:
+        return amounts, None
+    amounts = KllSketch.from_document(amounts).to_document()
+    return amounts, UpdateOne({"_id": bucket["_id"], "amount_n": bucket.get("amount_n")}, {"$set": {"amount_kll": amounts}})
+
+
+def bucket_updates(alerts: Iterable[Dict]) -> Dict[tuple, Dict]:
+    """The update document per (department, day) that folds these alerts into its bucket"""
+    totals = defaultdict(lambda: {"inc": defaultdict(int), "max": {}, "amounts": []})
+    for alert in alerts:
+        created_at = as_utc(alert.get("created_at"))
+        day = created_at.date().isoformat() if created_at is not None else None
+        total = totals[(alert.get("department_id"), day)]
+        inc, maxes = total["inc"], total["max"]
+        inc["flag_count"] += 1
+        score = alert.get("risk_score")
+        if is_number(score):
+            inc["scored_count"] += 1
+            inc["total_risk_score"] += score
+            maxes["max_risk_score"] = max(maxes.get("max_risk_score", score), score)
+        if is_number(alert.get("amount")):
+            inc["total_amount"] += alert["amount"]
+            inc["amount_n"] += 1
+            total["amounts"].append(alert["amount"])
+        index, rank = hll_register(alert.get("vendor_id"))
+        field = f"vendor_hll.{index}"
+        maxes[field] = max(maxes.get(field, 0), rank)
+
+    updates = {}
+    for key, total in totals.items():
+        update = {"$inc": dict(total["inc"]), "$max": total["max"]}
+        if total["amounts"]:
+            levels = KllSketch().update_many(total["amounts"]).to_document()
+            update["$push"] = {f"amount_kll.{level}": {"$each": items} for level, items in levels.items()}
+        updates[key] = update
+    return updates
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] != ["rebuild"]:
+        sys.exit("usage: python department_rollups.py rebuild")
+    from database import alerts_collection, department_days_collection
+
+    buckets = asyncio.run(DepartmentRollups(alerts_collection, department_days_collection).rebuild())
+    print(f"✅ Rebuilt {buckets} department day buckets")
@@ -1,18 +1,118 @@
 import csv
 import json
-import os
 from datetime import datetime
 from collections import defaultdict
 import math
+import random
+
+from feedback_journal import FeedbackJournal
+from window_engine import (
+    parse_timestamp, seconds_until, epoch_micros, to_paise, forward_window_counts, forward_window_sums,
+    EPOCH, HOUR, MINUTE, WEEKDAY, AWARE, DUPLICATE_WINDOW_MICROS,
+)
+
+HIGH_FREQUENCY_WINDOW = 172800 # 48h
+HIGH_FREQUENCY_MIN_COUNT = 3
+
+CONTRACT_SPLIT_WINDOW = 604800 # 7 days
+CONTRACT_SPLIT_MIN_COUNT = 4
+CONTRACT_SPLIT_CEILING = 2000000 # 20 Lakh
+
+DAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# --- Signal builders (shared by the batch, columnar and streaming paths) ---
+
+def duplicate_signal(amount, vendor_id, prev_tx_id):
+    return {
+        "type": "DUPLICATE", 
+        "score": 0.9, 
+        "desc": f"Identical payment of ₹{amount:,.2f} detected for {vendor_id} within 24h. Matches previous transaction {prev_tx_id}."
+    }
+
+def is_off_hours(hour, weekday):
+    return hour < 6 or hour > 22 or weekday >= 5
+
+def off_hours_signal(hour, minute, weekday):
+    return {
+        "type": "OFF_HOURS", 
+        "score": 0.7, 
+        "desc": f"Transaction initiated at {hour:02d}:{minute:02d} on a {DAY_NAMES[weekday]}, which is outside standard operational windows."
+    }
+
+def outlier_signal(amount, z, avg):
+    return {
+        "type": "STAT_OUTLIER", 
+        "score": min(0.95, 0.4 + (z/10)), 
+        "desc": f"Transaction amount (₹{amount:,.2f}) is significantly higher ({z:.1f}x deviation) than the category average (₹{avg:,.2f})."
+    }
+
+def high_frequency_signal(vendor_id, count):
+    return {
+        "type": "HIGH_FREQUENCY", 
+        "score": 0.8, 
+        "desc": f"Vendor {vendor_id} received {count} payments within a 48-hour window, indicating an accelerated payout pattern."
+    }
+
+def contract_split_signal(project_id, count, ceiling, window):
+    return {
+        "type": "CONTRACT_SPLIT", 
+        "score": 0.85, 
+        "desc": f"Project {project_id} flagged for potential contract splitting: {count} transactions appearing under ₹{ceiling / 100000:g}L threshold within {window / 86400:g} days."
+    }
+
+def feedback_adjustment(dismissals, escalations):
+    """Score adjustment for a vendor with the given auditor feedback counts"""
+    adjustment = 0.0
+    # Logic: If dismissed 3+ times, reduce score by 0.15
+    if dismissals >= 3:
+        adjustment -= 0.15
+    # Logic: If escalated even once, increase score baseline by 0.1
+    if escalations >= 1:
+        adjustment += 0.1
+    return adjustment
+
+def feedback_adjustments(feedback, vendor_of):
+    """Score adjustment per vendor from auditor feedback; vendor_of maps transaction_id -> vendor_id"""
+    vendor_dismissals = defaultdict(int)
+    vendor_escalations = defaultdict(int)
+    for f in feedback:
+        v_id = vendor_of.get(f['transaction_id'])
+        if v_id is not None:
+            if f['action'] == 'dismiss':
+                vendor_dismissals[v_id] += 1
+            elif f['action'] == 'escalate':
+                vendor_escalations[v_id] += 1
+
+    adjustments = defaultdict(float)
+    for v in set(vendor_dismissals) | set(vendor_escalations):
+        adjustment = feedback_adjustment(vendor_dismissals[v], vendor_escalations[v])
+        if adjustment != 0:
+            adjustments[v] = adjustment
+    return adjustments
+
+DUP_KEY = AWARE + 1
+
+def tx_record(tx):
+    """parse_timestamp fields plus the composite duplicate key (DUP_KEY), built once per transaction"""
+    return parse_timestamp(tx['timestamp']) + (f"{tx['vendor_id']}|{tx['department_id']}|{tx['amount']}",)
 
 class AuditEngine:
-    def __init__(self, data_path, feedback_path='data/auditor_feedback.json'):
+    def __init__(self, data_path, feedback_path='data/auditor_feedback.json',
+                 split_window=CONTRACT_SPLIT_WINDOW, split_min_count=CONTRACT_SPLIT_MIN_COUNT,
+                 split_ceiling=CONTRACT_SPLIT_CEILING):
         self.data_path = data_path
         self.feedback_path = feedback_path
-        self.transactions = []
+        # Contract splitting thresholds (window in seconds, ceiling in ₹)
+        self.split_window = split_window
+        self.split_min_count = split_min_count
+        self.split_ceiling = split_ceiling
+        self.transactions = [] # also resets self.records, the tx_record of each transaction
         self.feedback = []
+        self.vendor_index = {} # transaction_id -> vendor_id (first occurrence)
+        self._stream = None # incremental state, built on the first ingest()
         self.load_data()
         self.load_feedback()
+        self._index_feedback()
 
     def load_data(self):
         with open(self.data_path, mode='r') as f:
@@ -20,14 +120,54 @@ class AuditEngine:
             for row in reader:
                 try:
                     row['amount'] = float(row['amount'])
-                    self.transactions.append(row)
                 except (ValueError, TypeError):
                     continue
+                self.transactions.append(row)
+                self.records.append(tx_record(row))
+                self.vendor_index.setdefault(row['transaction_id'], row['vendor_id'])
+
+    @property
+    def transactions(self):
+        return self._transactions
+
+    @transactions.setter
+    def transactions(self, transactions):
+        self._transactions = transactions
+        self.records = [tx_record(tx) for tx in transactions]
+
+    @property
+    def transaction_count(self):
+        return len(self.transactions)
 
     def load_feedback(self):
-        if os.path.exists(self.feedback_path):
-            with open(self.feedback_path, 'r') as f:
-                self.feedback = json.load(f)
+        self.feedback_journal = FeedbackJournal(self.feedback_path)
+        self.feedback = self.feedback_journal.load()
+
+    def _index_feedback(self):
+        """Per-vendor dismissal/escalation counters for the loaded feedback"""
+        self.vendor_dismissals = defaultdict(int)
+        self.vendor_escalations = defaultdict(int)
+        self._adjustments = {}
+        self._unresolved_feedback = defaultdict(list) # transaction_id -> actions for transactions not loaded yet
+        for f in self.feedback:
+            self._count_feedback(f['transaction_id'], f['action'])
+
+    def _count_feedback(self, transaction_id, action):
+        v_id = self.vendor_index.get(transaction_id)
+        if v_id is None:
+            self._unresolved_feedback[transaction_id].append(action)
+            return
+        if action == 'dismiss':
+            self.vendor_dismissals[v_id] += 1
+        elif action == 'escalate':
+            self.vendor_escalations[v_id] += 1
+        else:
+            return
+        adjustment = feedback_adjustment(self.vendor_dismissals[v_id], self.vendor_escalations[v_id])
+        if adjustment != 0:
+            self._adjustments[v_id] = adjustment
+        else:
+            self._adjustments.pop(v_id, None)
 
     def submit_feedback(self, transaction_id, action, reason):
         """Auditor feedback submission"""
@@ -37,68 +177,31 @@ class AuditEngine:
             "reason": reason,
             "timestamp": datetime.now().isoformat()
         }
-        self.feedback.append(entry)
-        with open(self.feedback_path, 'w') as f:
-            json.dump(self.feedback, f, indent=2)
+        self.feedback.append(self.feedback_journal.append(entry))
+        self._count_feedback(transaction_id, action)
         print(f"Feedback logged for {transaction_id}: {action}")
 
     def get_feedback_adjustments(self):
-        """Calculate score adjustments based on historical feedback"""
-        adjustments = defaultdict(float)
-        # 1. Vendor dismissal count
-        vendor_dismissals = defaultdict(int)
-        vendor_escalations = defaultdict(int)
-        
-        for f in self.feedback:
-            # Find vendor for this tx
-            tx = next((t for t in self.transactions if t['transaction_id'] == f['transaction_id']), None)
-            if tx:
-                v_id = tx['vendor_id']
-                if f['action'] == 'dismiss':
-                    vendor_dismissals[v_id] += 1
-                elif f['action'] == 'escalate':
-                    vendor_escalations[v_id] += 1
-        
-        # Logic: If dismissed 3+ times, reduce score by 0.15
-        for v, count in vendor_dismissals.items():
-            if count >= 3:
-                adjustments[v] -= 0.15
-        
-        # Logic: If escalated even once, increase score baseline by 0.1
-        for v, count in vendor_escalations.items():
-            if count >= 1:
-                adjustments[v] += 0.1
-                
-        return adjustments
+        """Score adjustments based on historical feedback, kept up to date by submit_feedback"""
+        return self._adjustments
 
     def get_rules_signals(self):
         signals = defaultdict(list)
         
         seen = {}
-        for tx in self.transactions:
-            key = f"{tx['vendor_id']}|{tx['department_id']}|{tx['amount']}"
-            if key in seen:
-                prev_tx = seen[key]
-                t1 = datetime.fromisoformat(tx['timestamp'])
-                t2 = datetime.fromisoformat(prev_tx['timestamp'])
-                if abs((t1 - t2).total_seconds()) < 86400:
-                    signals[tx['transaction_id']].append({
-                        "type": "DUPLICATE", 
-                        "score": 0.9, 
-                        "desc": f"Identical payment of ₹{tx['amount']:,.2f} detected for {tx['vendor_id']} within 24h. Matches previous transaction {prev_tx['transaction_id']}."
-                    })
-            seen[key] = tx
+        for tx, rec in zip(self.transactions, self.records):
+            prev = seen.get(rec[DUP_KEY])
+            if prev is not None:
+                prev_tx, prev_rec = prev
+                # Microsecond difference, so the 24h boundary is exactly that of datetime subtraction
+                if abs(epoch_micros(rec) - epoch_micros(prev_rec)) < DUPLICATE_WINDOW_MICROS:
+                    signals[tx['transaction_id']].append(
+                        duplicate_signal(tx['amount'], tx['vendor_id'], prev_tx['transaction_id']))
+            seen[rec[DUP_KEY]] = (tx, rec)
 
-        for tx in self.transactions:
-            dt = datetime.fromisoformat(tx['timestamp'])
-            if dt.hour < 6 or dt.hour > 22 or dt.weekday() >= 5:
-                day_name = dt.strftime('%A')
-                time_str = dt.strftime('%H:%M')
-                signals[tx['transaction_id']].append({
-                    "type": "OFF_HOURS", 
-                    "score": 0.7, 
-                    "desc": f"Transaction initiated at {time_str} on a {day_name}, which is outside standard operational windows."
-                })
+        for tx, rec in zip(self.transactions, self.records):
+            if is_off_hours(rec[HOUR], rec[WEEKDAY]):
+                signals[tx['transaction_id']].append(off_hours_signal(rec[HOUR], rec[MINUTE], rec[WEEKDAY]))
 
         return signals
 
@@ -120,59 +223,38 @@ class AuditEngine:
             if stats['std'] > 0:
                 z = abs(tx['amount'] - stats['avg']) / stats['std']
                 if z > 2.0:
-                    score = min(0.95, 0.4 + (z/10))
-                    signals[tx['transaction_id']].append({
-                        "type": "STAT_OUTLIER", 
-                        "score": score, 
-                        "desc": f"Transaction amount (₹{tx['amount']:,.2f}) is significantly higher ({z:.1f}x deviation) than the category average (₹{stats['avg']:,.2f})."
-                    })
+                    signals[tx['transaction_id']].append(outlier_signal(tx['amount'], z, stats['avg']))
 
         vendor_dept_history = defaultdict(list)
-        for tx in self.transactions:
-            vendor_dept_history[(tx['vendor_id'], tx['department_id'])].append(tx)
+        for tx, rec in zip(self.transactions, self.records):
+            vendor_dept_history[(tx['vendor_id'], tx['department_id'])].append((epoch_micros(rec), tx['timestamp'], tx))
         
-        for (v, d), txs in vendor_dept_history.items():
-            txs.sort(key=lambda x: x['timestamp'])
-            for i in range(len(txs)):
-                count = 1
-                t_start = datetime.fromisoformat(txs[i]['timestamp'])
-                for j in range(i + 1, len(txs)):
-                    t_curr = datetime.fromisoformat(txs[j]['timestamp'])
-                    if (t_curr - t_start).total_seconds() < 172800: # 48h
-                        count += 1
-                if count >= 3:
-                    signals[txs[i]['transaction_id']].append({
-                        "type": "HIGH_FREQUENCY", 
-                        "score": 0.8, 
-                        "desc": f"Vendor {v} received {count} payments within a 48-hour window, indicating an accelerated payout pattern."
-                    })
+        for (v, d), keyed in vendor_dept_history.items():
+            # Timestamps were parsed at load; count forward windows with two pointers
+            keyed.sort(key=lambda x: x[:2])
+            counts = forward_window_counts([k[0] for k in keyed], HIGH_FREQUENCY_WINDOW * 10**6)
+            for (_, _, tx), count in zip(keyed, counts):
+                if count >= HIGH_FREQUENCY_MIN_COUNT:
+                    signals[tx['transaction_id']].append(high_frequency_signal(v, count))
 
         # IMPROVEMENT 3: Project Contract Splitting Detection
         project_history = defaultdict(list)
-        for tx in self.transactions:
+        for tx, rec in zip(self.transactions, self.records):
             if tx.get('project_id'):
-                project_history[tx['project_id']].append(tx)
+                project_history[tx['project_id']].append((epoch_micros(rec), tx['timestamp'], tx))
         
-        for pid, txs in project_history.items():
-            txs.sort(key=lambda x: x['timestamp'])
-            # Check for multiple payments in short duration (Contract Splitting)
-            for i in range(len(txs)):
-                count = 1
-                t_start = datetime.fromisoformat(txs[i]['timestamp'])
-                amount_sum = float(txs[i]['amount'])
-                
-                for j in range(i + 1, len(txs)):
-                    t_curr = datetime.fromisoformat(txs[j]['timestamp'])
-                    if (t_curr - t_start).total_seconds() < 604800: # 7 days
-                        count += 1
-                        amount_sum += float(txs[j]['amount'])
-                
-                if count >= 4 and amount_sum < 2000000: # Many small payments < 20 Lakh
-                   signals[txs[i]['transaction_id']].append({
-                        "type": "CONTRACT_SPLIT", 
-                        "score": 0.85, 
-                        "desc": f"Project {pid} flagged for potential contract splitting: {count} transactions appearing under ₹20L threshold within 7 days."
-                    })
+        for pid, keyed in project_history.items():
+            # Check for multiple payments in short duration (Contract Splitting):
+            # one pass per project with a rolling count and amount sum
+            keyed.sort(key=lambda x: x[:2])
+            counts, sums = forward_window_sums(
+                [k[0] for k in keyed], [to_paise(k[2]['amount']) for k in keyed], self.split_window * 10**6
+            )
+            ceiling = to_paise(self.split_ceiling)
+            for (_, _, tx), count, amount_sum in zip(keyed, counts, sums):
+                if count >= self.split_min_count and amount_sum < ceiling: # Many small payments under the ceiling
+                    signals[tx['transaction_id']].append(
+                        contract_split_signal(pid, count, self.split_ceiling, self.split_window))
 
         return signals
 
@@ -181,73 +263,141 @@ class AuditEngine:
         adjustments = self.get_feedback_adjustments()
         now = datetime.now()
         
-        for tx in self.transactions:
+        for tx, rec in zip(self.transactions, self.records):
             tx_id = tx['transaction_id']
-            v_id = tx['vendor_id']
             r_sigs = rules.get(tx_id, [])
             p_sigs = prob.get(tx_id, [])
             
             if not r_sigs and not p_sigs:
                 continue
 
-            max_rule_score = max([s['score'] for s in r_sigs]) if r_sigs else 0
-            max_prob_score = max([s['score'] for s in p_sigs]) if p_sigs else 0
-            
-            if max_rule_score > 0:
-                final_score = (max_rule_score * 0.7 + max_prob_score * 0.3)
-            else:
-                final_score = max_prob_score * 0.85
-            
-            # Inject slight variance to prevent flat scores (User Request)
-            import random
-            variance = random.uniform(-0.03, 0.03)
-            final_score += variance
-            
-            # Apply Human Feedback Adjustment
-            adjustment = adjustments.get(v_id, 0)
-            final_score = max(0.01, min(1.0, final_score + adjustment))
-            
-            reasons = [s['desc'] for s in r_sigs + p_sigs]
-            if adjustment != 0:
-                reasons.append(f"Score adjusted by {adjustment:+.2f} based on historical auditor feedback for {v_id}.")
-            
-            # Pre-payment Guard Check (Transaction in last 60 minutes)
-            try:
-                tx_time = datetime.fromisoformat(tx['timestamp'])
-                is_pre_payment = (now - tx_time).total_seconds() < 3600
-            except:
-                is_pre_payment = False
-
-            final_alerts.append({
-                "transaction_id": tx_id,
-                "risk_score": final_score,
-                "type": r_sigs[0]['type'] if r_sigs else p_sigs[0]['type'],
-                "explanation": " ".join(reasons),
-                "timestamp": tx['timestamp'],
-                "department": tx['department_id'],
-                "vendor": tx['vendor_id'],
-                "amount": tx['amount'],
-                "is_pre_payment": is_pre_payment,
-                "evidence": [tx_id]
-            })
+            final_alerts.append(self.score_transaction(tx, r_sigs, p_sigs, adjustments, now, rec))
         
         return sorted(final_alerts, key=lambda x: x['risk_score'], reverse=True)
 
+    def score_transaction(self, tx, r_sigs, p_sigs, adjustments, now, record=None):
+        """Composite alert for one transaction with at least one signal (record: its tx_record, if built)"""
+        tx_id = tx['transaction_id']
+        v_id = tx['vendor_id']
+        max_rule_score = max([s['score'] for s in r_sigs]) if r_sigs else 0
+        max_prob_score = max([s['score'] for s in p_sigs]) if p_sigs else 0
+        
+        if max_rule_score > 0:
+            final_score = (max_rule_score * 0.7 + max_prob_score * 0.3)
+        else:
+            final_score = max_prob_score * 0.85
+        
+        # Inject slight variance to prevent flat scores (User Request)
+        variance = random.uniform(-0.03, 0.03)
+        final_score += variance
+        
+        # Apply Human Feedback Adjustment
+        adjustment = adjustments.get(v_id, 0)
+        final_score = max(0.01, min(1.0, final_score + adjustment))
+        
+        reasons = [s['desc'] for s in r_sigs + p_sigs]
+        if adjustment != 0:
+            reasons.append(f"Score adjusted by {adjustment:+.2f} based on historical auditor feedback for {v_id}.")
+        
+        # Pre-payment Guard Check (Transaction in last 60 minutes)
+        try:
+            if record is None:
+                record = parse_timestamp(tx['timestamp'])
+            # A timezone-aware timestamp cannot be compared with the naive clock
+            is_pre_payment = not record[AWARE] and seconds_until(record, now) < 3600
+        except:
+            is_pre_payment = False
+
+        return {
+            "transaction_id": tx_id,
+            "risk_score": final_score,
+            "type": r_sigs[0]['type'] if r_sigs else p_sigs[0]['type'],
+            "explanation": " ".join(reasons),
+            "timestamp": tx['timestamp'],
+            "department": tx['department_id'],
+            "vendor": tx['vendor_id'],
+            "amount": tx['amount'],
+            "is_pre_payment": is_pre_payment,
+            "evidence": [tx_id]
+        }
+
+    def ingest(self, tx):
+        """
+        Score one new transaction without re-running the whole ledger.
+        Returns the alerts that changed: the new transaction's own alert plus any
+        earlier transaction whose window signals moved. An earlier transaction
+        that lost its last signal comes back as {"transaction_id": ..., "retracted": True}.
+        """
+        if self._stream is None:
+            from stream_engine import StreamingState
+            self._stream = StreamingState(self.split_window, self.split_min_count, self.split_ceiling)
+            self._stream.warm(self.transactions, self.records, self.get_rules_signals(), self.get_probabilistic_signals())
+
+        tx = dict(tx)
+        tx['amount'] = float(tx['amount'])
+        record = tx_record(tx)
+        self.transactions.append(tx)
+        self.records.append(record)
+        if tx['transaction_id'] not in self.vendor_index:
+            self.vendor_index[tx['transaction_id']] = tx['vendor_id']
+            for action in self._unresolved_feedback.pop(tx['transaction_id'], []):
+                self._count_feedback(tx['transaction_id'], action)
+        changed = self._stream.ingest(tx, record)
+
+        now = datetime.now()
+        alerts_delta = []
+        for tx_id in changed:
+            live_tx, live_rec, r_sigs, p_sigs = self._stream.signals_for(tx_id)
+            if r_sigs or p_sigs:
+                alerts_delta.append(self.score_transaction(live_tx, r_sigs, p_sigs, self.get_feedback_adjustments(), now, live_rec))
+            else:
+                alerts_delta.append({"transaction_id": tx_id, "retracted": True})
+        return sorted(alerts_delta, key=lambda x: x.get('risk_score', 0), reverse=True)
+
     def run(self):
         rules = self.get_rules_signals()
         prob = self.get_probabilistic_signals()
         return self.calculate_composite_score(rules, prob)
 
 if __name__ == "__main__":
-    import sys
-    input_f = sys.argv[1] if len(sys.argv) > 1 else 'data/transactions_cleaned.csv'
-    output_f = sys.argv[2] if len(sys.argv) > 2 else '../frontend/src/alerts.json'
+    import argparse
+    parser = argparse.ArgumentParser(description="AuditAI risk engine")
+    parser.add_argument("input", nargs="?", default='data/transactions_cleaned.csv')
+    parser.add_argument("output", nargs="?", default='../frontend/src/alerts.json')
+    parser.add_argument("--backend", choices=["python", "columnar", "chunked"], default="python",
+                        help="columnar runs the vectorized NumPy/pandas backend; "
+                             "chunked streams the ledger with bounded memory")
+    parser.add_argument("--chunk-size", type=int, default=50000,
+                        help="rows per batch for the chunked backend")
+    parser.add_argument("--memory-limit-mb", type=int, default=512,
+                        help="memory budget for the chunked backend")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="compute signals in N processes (python backend)")
+    args = parser.parse_args()
+    if args.workers > 1 and args.backend != "python":
+        parser.error("--workers applies to the python backend only")
+
+    if args.backend == "chunked":
+        from chunked_engine import ChunkedAuditEngine
+        engine = ChunkedAuditEngine(args.input, chunk_size=args.chunk_size, memory_limit_mb=args.memory_limit_mb)
+        alert_count = engine.run_to_file(args.output)
+        print(f"Engine processed {engine.transaction_count} transactions.")
+        print(f"Generated {alert_count} risk alerts with enhanced explainability.")
+        print(engine.report_memory())
+        raise SystemExit(0)
 
-    engine = AuditEngine(input_f)
+    if args.backend == "columnar":
+        from columnar_engine import ColumnarAuditEngine
+        engine = ColumnarAuditEngine(args.input)
+    elif args.workers > 1:
+        from parallel_engine import ParallelAuditEngine
+        engine = ParallelAuditEngine(args.input, workers=args.workers)
+    else:
+        engine = AuditEngine(args.input)
     results = engine.run()
     
-    with open(output_f, "w") as f:
+    with open(args.output, "w") as f:
         json.dump(results, f, indent=2)
     
-    print(f"Engine processed {len(engine.transactions)} transactions.")
+    print(f"Engine processed {engine.transaction_count} transactions.")
     print(f"Generated {len(results)} risk alerts with enhanced explainability.")
@@ -0,0 +1,108 @@
+"""
+Executor layer that keeps CPU-bound work off the API's event loop.
+
+- A thread pool runs light blocking work (CSV parsing, narratives, Benford
+  analysis). pandas and numpy release the GIL for much of it, and the event loop
+  gets the GIL back at least every switch interval.
+- A process pool scores large uploads. Each worker loads the detector once when
+  it starts, so a batch only ships its DataFrame chunk; the event loop's process
+  keeps its core for other requests. Uploads below `process_min_rows` are scored
+  in the thread pool, where pickling the frame would cost more than it saves.
+
+Configured with AUDITAI_THREAD_WORKERS, AUDITAI_PROCESS_WORKERS (0 disables the
+process pool) and AUDITAI_PROCESS_MIN_ROWS.
+"""
+
+import asyncio
+import functools
+import multiprocessing
+import os
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from fraud_detector import FraudDetector, RESULT_COLUMNS
+
+THREAD_WORKERS = int(os.getenv("AUDITAI_THREAD_WORKERS", "4"))
+PROCESS_WORKERS = int(os.getenv("AUDITAI_PROCESS_WORKERS", str(min(4, os.cpu_count() or 1))))
+PROCESS_MIN_ROWS = int(os.getenv("AUDITAI_PROCESS_MIN_ROWS", "20000"))
+
+
+# Detector of a process-pool worker, loaded once by the pool initializer
+_worker_detector = None
+
+
+def _init_worker(model_path):
+    global _worker_detector
+    _worker_detector = FraudDetector(model_path)
+
+
+def _worker_ready():
+    return _worker_detector is not None and _worker_detector.model_loaded
+
+
+def _score_chunk(df):
+    return _worker_detector.predict_dataframe(df)
+
+
+class Executors:
+    def __init__(self, model_path, thread_workers=THREAD_WORKERS, process_workers=PROCESS_WORKERS,
+                 process_min_rows=PROCESS_MIN_ROWS):
+        self.model_path = model_path
+        self.process_workers = process_workers
+        self.process_min_rows = process_min_rows
+        self.threads = ThreadPoolExecutor(max_workers=thread_workers, thread_name_prefix="auditai")
+        self._processes = None
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) in the thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.threads, functools.partial(fn, *args, **kwargs))
+
+    async def score_dataframe(self, detector, df):
+        """detector.predict_dataframe(df), off the event loop"""
+        if self.process_workers < 1 or len(df) < self.process_min_rows or detector.model_path != self.model_path:
+            # A detector that is not the pool's model (e.g. mid-reload) is scored in-process
+            return await self.run(detector.predict_dataframe, df)
+
+        loop = asyncio.get_running_loop()
+        pool = self.processes()
+        bounds = np.linspace(0, len(df), self.process_workers + 1, dtype=int)
+        chunks = [df.iloc[start:end] for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+        results = await asyncio.gather(*(loop.run_in_executor(pool, _score_chunk, chunk) for chunk in chunks))
+        return pd.concat(results, ignore_index=True) if results else pd.DataFrame(columns=RESULT_COLUMNS)
+
+    def processes(self):
+        """The process pool, started on first use with every worker holding a loaded detector"""
+        if self._processes is None:
+            # spawn: forking a process that runs an event loop and a thread pool is unsafe
+            self._processes = ProcessPoolExecutor(
+                max_workers=self.process_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model_path,),
+            )
+        return self._processes
+
+    def warm(self):
+        """Start the process pool and load the detector in every worker (blocking)"""
+        if self.process_workers < 1:
+            return
+        pool = self.processes()
+        futures = [pool.submit(_worker_ready) for _ in range(self.process_workers)]
+        if not all(f.result() for f in futures):
+            raise RuntimeError(f"process pool workers could not load {self.model_path}")
+
+    def reload(self, model_path):
+        """Point the process pool at a new model; workers restart on the next large batch"""
+        old, self._processes = self._processes, None
+        self.model_path = model_path
+        if old is not None:
+            old.shutdown(wait=False) # chunks already queued finish on the old model
+
+    def shutdown(self):
+        self.threads.shutdown(wait=False)
+        if self._processes is not None:
+            self._processes.shutdown(wait=False)
+            self._processes = None
@@ -0,0 +1,190 @@
+"""
+Append-only storage for auditor feedback.
+
+The snapshot stays where it always was (`data/auditor_feedback.json`, a JSON
+array), so existing files are read as-is. New entries go to a JSONL journal next
+to it (`auditor_feedback.json.journal`), one line per submission, instead of
+rewriting the whole array on every click. Loading replays snapshot + journal;
+compaction folds the journal back into a fresh snapshot.
+
+- Appends and compaction hold an exclusive flock on the journal, so concurrent
+  auditors (threads or processes) never interleave partial lines.
+- Lines are flushed on every append and fsynced in batches (every
+  `fsync_every` entries or `fsync_interval` seconds): a process crash loses
+  nothing, a power loss at most the last unsynced batch.
+- A torn line from a crash mid-write is sealed by the next append and skipped
+  on replay.
+- Every journal entry carries an `entry_id`, so entries that were already folded
+  into the snapshot (crash between snapshot replace and journal truncate) are
+  not counted twice.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+
+try:
+    import fcntl
+except ImportError: # Windows: fall back to the in-process lock only
+    fcntl = None
+
+JOURNAL_SUFFIX = ".journal"
+
+
+class FeedbackJournal:
+    def __init__(self, snapshot_path, fsync_every=32, fsync_interval=1.0, compact_every=1000):
+        self.snapshot_path = snapshot_path
+        self.journal_path = snapshot_path + JOURNAL_SUFFIX
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.compact_every = compact_every
+        self._lock = threading.Lock()
+        self._file = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._journal_entries = 0
+
+    # --- Reading ---
+
+    def load(self):
+        """All feedback entries: the snapshot followed by the journal tail"""
+        with self._lock:
+            if not os.path.exists(self.journal_path):
+                return self._read_all()
+            with self._locked_journal():
+                return self._read_all()
+
+    def _read_all(self):
+        entries = []
+        seen = set()
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'r') as f:
+                entries = json.load(f)
+            seen = {e['entry_id'] for e in entries if 'entry_id' in e}
+
+        self._journal_entries = 0
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, 'r') as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        continue # torn write from a crash; never acknowledged
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self._journal_entries += 1
+                    entry_id = entry.get('entry_id')
+                    if entry_id is not None:
+                        # Lines without an id (hand-appended) cannot be told apart; keep them all
+                        if entry_id in seen:
+                            continue
+                        seen.add(entry_id)
+                    entries.append(entry)
+        return entries
+
+    # --- Writing ---
+
+    def append(self, entry):
+        """Journal one entry (an entry_id is added if missing) and return it"""
+        entry = dict(entry)
+        entry.setdefault('entry_id', uuid.uuid4().hex)
+        line = json.dumps(entry) + "\n"
+        with self._lock:
+            with self._locked_journal() as f:
+                if not self._ends_with_newline(f):
+                    line = "\n" + line # seal a torn line left by a crashed writer
+                f.write(line)
+                f.flush()
+                self._unsynced += 1
+                self._journal_entries += 1
+                if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+                    self._sync()
+            if self._journal_entries >= self.compact_every:
+                self._compact()
+        return entry
+
+    def sync(self):
+        """Force every appended entry to disk"""
+        with self._lock:
+            self._sync()
+
+    def compact(self):
+        """Fold the journal into a new snapshot and truncate it"""
+        with self._lock:
+            self._compact()
+
+    def close(self):
+        with self._lock:
+            self._sync()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _compact(self):
+        with self._locked_journal():
+            # Re-read from disk: other processes may have journaled entries this one never saw
+            entries = self._read_all()
+            tmp_path = self.snapshot_path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(entries, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            self._fsync_dir()
+            # Entry IDs make a crash before this truncate harmless on replay
+            self._journal_file().truncate(0)
+            self._sync()
+            self._journal_entries = 0
+
+    def _journal_file(self):
+        if self._file is None:
+            self._file = open(self.journal_path, 'a+')
+        return self._file
+
+    @staticmethod
+    def _ends_with_newline(f):
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return True
+        # seek + read rather than os.pread, which Windows lacks; writes still go to the end ('a' mode)
+        f.seek(size - 1)
+        try:
+            return f.read(1) == "\n"
+        except UnicodeDecodeError:
+            return False # the last byte is inside a torn multi-byte character
+
+    def _sync(self):
+        if self._file is not None and self._unsynced:
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _fsync_dir(self):
+        if not hasattr(os, 'O_DIRECTORY'):
+            return
+        fd = os.open(os.path.dirname(os.path.abspath(self.snapshot_path)), os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def _locked_journal(self):
+        return _JournalLock(self._journal_file())
+
+
+class _JournalLock:
+    """Exclusive flock on the open journal, shared by every process appending to it"""
+
+    def __init__(self, f):
+        self.f = f
+
+    def __enter__(self):
+        if fcntl is not None:
+            fcntl.flock(self.f.fileno(), fcntl.LOCK_EX)
+        return self.f
+
+    def __exit__(self, *exc):
+        if fcntl is not None:
+            fcntl.flock(self.f.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,168 @@
+"""
+Compiles the amount-only IsolationForest into a 1-D lookup table.
+
+The forest `ml_model.py` trains sees a single feature, so every tree splits the
+amount axis at its own thresholds and the forest's score is constant between
+consecutive thresholds of all trees together. Compiling walks each tree once per
+interval, sums the path lengths in estimator order exactly as sklearn does, and
+keeps only the breakpoints where the score changes. Scoring is then a binary
+search instead of 100 tree walks, with bit-identical results:
+
+- sklearn scores the float32 cast of the input and sends x <= threshold left;
+  the lookup casts the same way and searches with side='left'.
+- NaN follows each node's missing-value branch, like tree.apply does, and gets
+  its own precomputed score.
+"""
+
+import bisect
+
+import numpy as np
+
+
+class CompiledIsolationForest:
+    """Drop-in for IsolationForest.score_samples/decision_function/predict on one feature."""
+
+    def __init__(self, breakpoints, scores, nan_score, offset):
+        self.breakpoints = np.asarray(breakpoints, dtype=np.float64)
+        self.scores = np.asarray(scores, dtype=np.float64)
+        self.nan_score = float(nan_score)
+        self.offset_ = float(offset)
+        if len(self.scores) != len(self.breakpoints) + 1:
+            raise ValueError("need one score per interval: len(scores) == len(breakpoints) + 1")
+        # Python lists for the per-transaction path: bisect on a list beats numpy on one value
+        self._breakpoint_list = self.breakpoints.tolist()
+        self._score_list = self.scores.tolist()
+
+    @classmethod
+    def from_forest(cls, forest):
+        """Compile a fitted single-feature sklearn IsolationForest"""
+        # Imported here: scoring a compiled table (e.g. from a model artifact) needs no sklearn
+        from sklearn.ensemble._iforest import _average_path_length
+
+        if getattr(forest, 'n_features_in_', None) != 1:
+            raise ValueError("only IsolationForests fitted on a single feature can be compiled")
+
+        trees = [estimator.tree_ for estimator in forest.estimators_]
+        breakpoints = np.unique(np.concatenate([t.threshold[t.children_left != -1] for t in trees]))
+        # Interval i is (breakpoints[i-1], breakpoints[i]]; its right end stands for all of it
+        points = np.append(breakpoints, np.inf)
+
+        depths = np.zeros(len(points))
+        nan_depth = np.zeros(1)
+        path_lengths = getattr(forest, '_decision_path_lengths', None) or [t.compute_node_depths() for t in trees]
+        avg_lengths = getattr(forest, '_average_path_length_per_tree', None) or [_average_path_length(t.n_node_samples) for t in trees]
+        for tree, tree_path_lengths, tree_avg_lengths in zip(trees, path_lengths, avg_lengths):
+            leaves = _apply(tree, points)
+            depths += tree_path_lengths[leaves] + tree_avg_lengths[leaves] - 1.0
+            nan_leaf = _apply_nan(tree)
+            nan_depth += tree_path_lengths[nan_leaf] + tree_avg_lengths[nan_leaf] - 1.0
+
+        denominator = len(trees) * _average_path_length([forest._max_samples])
+        scores = _to_scores(depths, denominator)
+        nan_score = _to_scores(nan_depth, denominator)[0]
+
+        # Drop breakpoints that separate two intervals with the same score
+        keep = scores[:-1] != scores[1:]
+        return cls(breakpoints[keep], np.append(scores[0], scores[1:][keep]), nan_score, forest.offset_)
+
+    # --- Scoring ---
+
+    def score_one(self, amount):
+        """score_samples([[amount]])[0] for a single value"""
+        x = float(np.float32(amount))
+        if x != x:
+            return self.nan_score
+        return self._score_list[bisect.bisect_left(self._breakpoint_list, x)]
+
+    def predict_one(self, amount):
+        return -1 if self.score_one(amount) - self.offset_ < 0 else 1
+
+    def score_samples(self, X):
+        x = _column(X)
+        scores = self.scores[np.searchsorted(self.breakpoints, x, side='left')]
+        scores[np.isnan(x)] = self.nan_score
+        return scores
+
+    def decision_function(self, X):
+        return self.score_samples(X) - self.offset_
+
+    def predict(self, X):
+        return np.where(self.decision_function(X) < 0, -1, 1)
+
+    def verify(self, forest, X):
+        """
+        Check the compiled scores against forest.score_samples on X (e.g. the
+        training data); raises AssertionError naming the first mismatch.
+        """
+        x = _column(X)
+        expected = forest.score_samples(x.reshape(-1, 1))
+        actual = self.score_samples(x)
+        mismatches = np.flatnonzero(actual != expected)
+        if len(mismatches):
+            i = mismatches[0]
+            raise AssertionError(
+                f"{len(mismatches)} of {len(x)} scores differ from sklearn; "
+                f"first at amount={x[i]!r}: {actual[i]!r} != {expected[i]!r}"
+            )
+        if not np.array_equal(self.predict(x), forest.predict(x.reshape(-1, 1))):
+            raise AssertionError("compiled predict() differs from sklearn")
+        return len(x)
+
+
+def _column(X):
+    """The single feature as float64 values of its float32 cast, the precision sklearn scores at"""
+    x = np.asarray(X, dtype=np.float32)
+    if x.ndim == 2:
+        if x.shape[1] != 1:
+            raise ValueError(f"expected a single feature, got {x.shape[1]}")
+        x = x[:, 0]
+    return x.astype(np.float64)
+
+
+def _apply(tree, points):
+    """Leaf index of every point (x <= threshold goes left)"""
+    left, right, threshold = tree.children_left, tree.children_right, tree.threshold
+    nodes = np.zeros(len(points), dtype=np.intp)
+    for _ in range(tree.max_depth):
+        is_split = left[nodes] != -1
+        go_left = points <= threshold[nodes]
+        nodes = np.where(is_split, np.where(go_left, left[nodes], right[nodes]), nodes)
+    return nodes
+
+
+def _apply_nan(tree):
+    node = 0
+    go_left = getattr(tree, 'missing_go_to_left', None)
+    while tree.children_left[node] != -1:
+        node = tree.children_left[node] if go_left is not None and go_left[node] else tree.children_right[node]
+    return np.array([node])
+
+
+def _to_scores(depths, denominator):
+    """IsolationForest.score_samples from summed depths, with sklearn's exact expression"""
+    return -(2 ** (
+        -np.divide(depths, denominator, out=np.ones_like(depths), where=denominator != 0)
+    ))
+
+
+if __name__ == "__main__":
+    import argparse
+    import pickle
+    import time
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Compile trained_model.pkl's IsolationForest and check it against sklearn")
+    parser.add_argument("model", nargs="?", default="trained_model.pkl")
+    parser.add_argument("--verify", default="training_transactions.csv",
+                        help="CSV whose amount column the compiled scores must match exactly")
+    args = parser.parse_args()
+
+    with open(args.model, 'rb') as f:
+        forest = pickle.load(f)['iso_model']
+    start = time.perf_counter()
+    compiled = CompiledIsolationForest.from_forest(forest)
+    print(f"Compiled {len(forest.estimators_)} trees into {len(compiled.breakpoints)} breakpoints "
+          f"in {time.perf_counter() - start:.3f}s")
+
+    amounts = pd.read_csv(args.verify)['amount'].dropna()
+    print(f"Verified {compiled.verify(forest, amounts.to_numpy())} amounts from {args.verify}: identical to sklearn")
@@ -3,47 +3,118 @@ AuditAI Fraud Detector - ML-powered fraud detection using trained_model.pkl
 Enterprise-ready fraud detection for government spending analysis
 """
 
+import hashlib
 import pickle
+import threading
+import time
+from datetime import datetime, timezone
 import pandas as pd
 import numpy as np
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
-from datetime import datetime
+
+from window_engine import parse_timestamp, HOUR, MINUTE, WEEKDAY
+from forest_compiler import CompiledIsolationForest
+from model_artifact import is_artifact, load_artifact, DEPT_COLUMNS
+from model_registry import ModelRegistry
+from reason_codes import (reason, render_reasons, Z_EXTREME, Z_SIGNIFICANT, IQR_OUTLIER, ML_ANOMALY,
+                          WEEKEND, OFF_HOURS, ROUND_AMOUNT)
+
+# get_detector() serves the registry's active version if there is one, else the
+# first of these that exists: the pickle-free artifact (see model_artifact.py)
+# skips importing scikit-learn on cold start
+DEFAULT_MODEL_PATHS = ["model_artifact", "trained_model.pkl"]
+
+# Columns of predict_single's result, in order; predict_dataframe returns the same frame
+RESULT_COLUMNS = ["transaction_id", "is_fraud", "risk_score", "risk_level", "reason_codes", "amount",
+                  "department_id", "vendor_id", "z_score", "ml_flag"]
+
+# Timestamps the batch off-hours check reads without datetime.fromisoformat: the
+# wall-clock date, hour and minute, with an optional offset that does not move them
+ISO_TIMESTAMP = (r'^(?P<date>\d{4}-\d{2}-\d{2})[T ](?P<hour>\d{2}):(?P<minute>\d{2})'
+                 r'(?::(?P<second>\d{2})(?:\.\d{3}|\.\d{6})?)?'
+                 r'(?:Z|[+-](?P<offset_hour>\d{2}):(?P<offset_minute>\d{2}))?\Z')
 
 class FraudDetector:
     """
     ML-powered fraud detection using Isolation Forest + Statistical Analysis.
-    Uses trained_model.pkl containing department baselines and Isolation Forest model.
+    Uses trained_model.pkl (or a model artifact directory) containing department
+    baselines and Isolation Forest model. With lazy=True nothing is read until the
+    first prediction or model_loaded check.
     """
     
-    def __init__(self, model_path: str = "trained_model.pkl"):
+    def __init__(self, model_path: str = "trained_model.pkl", lazy: bool = False):
         self.model_path = model_path
         self.dept_stats = None
-        self.iso_model = None
-        self.model_loaded = False
-        self._load_model()
+        self.iso_model = None # only set when loaded from a pickle
+        self.forest = None # iso_model compiled to a lookup table; scores identically
+        self.model_version = None
+        self.contamination = None
+        self.loaded_at = None
+        self.load_seconds = None
+        self._dept_rows = {} # department -> row of _baselines, for predict_batch
+        self._baselines = None
+        self._model_loaded = False
+        self._load_attempted = False
+        self._load_lock = threading.Lock()
+        if not lazy:
+            self._ensure_loaded()
+
+    @property
+    def model_loaded(self) -> bool:
+        self._ensure_loaded()
+        return self._model_loaded
+
+    def _ensure_loaded(self) -> None:
+        if self._load_attempted:
+            return
+        with self._load_lock:
+            if not self._load_attempted:
+                self._load_model()
+                self._load_attempted = True
     
     def _load_model(self) -> None:
         """Load the trained Isolation Forest model and department statistics"""
+        start = time.perf_counter()
         try:
             model_file = Path(self.model_path)
             if not model_file.exists():
                 # Try relative to this file's directory
                 model_file = Path(__file__).parent / self.model_path
             
-            with open(model_file, 'rb') as f:
-                model_data = pickle.load(f)
-            
-            self.dept_stats = model_data['dept_stats']
-            self.iso_model = model_data['iso_model']
-            self.model_loaded = True
+            if is_artifact(model_file):
+                self._load_artifact(model_file)
+            else:
+                with open(model_file, 'rb') as f:
+                    raw = f.read()
+                model_data = pickle.loads(raw)
+                self.model_version = hashlib.sha256(raw).hexdigest()[:12]
+
+                self.dept_stats = model_data['dept_stats']
+                self.iso_model = model_data['iso_model']
+                self.forest = CompiledIsolationForest.from_forest(self.iso_model)
+                self.contamination = getattr(self.iso_model, 'contamination', None)
+            self._dept_rows = {dept: i for i, dept in enumerate(self.dept_stats.index)}
+            self._baselines = self.dept_stats[['mean', 'std', 'q3', 'iqr']].to_numpy(dtype=float)
+            self.loaded_at = datetime.now(timezone.utc).isoformat()
+            self.load_seconds = round(time.perf_counter() - start, 4)
+            self._model_loaded = True
             print(f"✅ Fraud detection model loaded successfully")
         except FileNotFoundError:
             print(f"⚠️ Model file not found: {self.model_path}")
-            self.model_loaded = False
+            self._model_loaded = False
         except Exception as e:
             print(f"❌ Error loading model: {e}")
-            self.model_loaded = False
+            self._model_loaded = False
+
+    def _load_artifact(self, path: Path) -> None:
+        manifest, dept_table, departments, forest = load_artifact(path)
+        self.dept_stats = pd.DataFrame(
+            dept_table, index=pd.Index(departments, name='department_id'), columns=DEPT_COLUMNS, copy=False
+        )
+        self.forest = forest
+        self.model_version = manifest['model_version']
+        self.contamination = manifest['forest'].get('contamination')
     
     def predict_single(self, transaction: Dict) -> Dict:
         """
@@ -53,14 +124,15 @@ class FraudDetector:
             transaction: Dictionary with keys like 'amount', 'department_id', 'vendor_id', etc.
             
         Returns:
-            Dictionary with risk_score, is_fraud, reasons, and transaction details
+            Dictionary with risk_score, is_fraud, reason_codes (see reason_codes.py)
+            and transaction details
         """
         if not self.model_loaded:
             return {
                 "error": "Model not loaded",
                 "is_fraud": False,
                 "risk_score": 0,
-                "reasons": []
+                "reason_codes": []
             }
         
         amount = float(transaction.get('amount', 0))
@@ -73,23 +145,23 @@ class FraudDetector:
         z_score = self._compute_z_score(amount, dept_id)
         if z_score is not None and abs(z_score) > 3:
             risk_score += 30
-            reasons.append(f"Extreme deviation from department average (z-score: {z_score:.2f})")
+            reasons.append(reason(Z_EXTREME, z=float(z_score)))
         elif z_score is not None and abs(z_score) > 2:
             risk_score += 15
-            reasons.append(f"Significant deviation from department average (z-score: {z_score:.2f})")
+            reasons.append(reason(Z_SIGNIFICANT, z=float(z_score)))
         
         # 2. IQR-based outlier detection
         is_iqr_outlier = self._check_iqr_outlier(amount, dept_id)
         if is_iqr_outlier:
             risk_score += 25
-            reasons.append("Amount outside normal IQR range for this department")
+            reasons.append(reason(IQR_OUTLIER))
         
         # 3. Isolation Forest ML prediction
-        ml_flag = self.iso_model.predict([[amount]])[0]
+        ml_score = self.forest.score_one(amount)
+        ml_flag = -1 if ml_score - self.forest.offset_ < 0 else 1
         if ml_flag == -1:  # Anomaly
             risk_score += 30
-            ml_score = self.iso_model.score_samples([[amount]])[0]
-            reasons.append(f"ML model detected rare statistical pattern (anomaly score: {ml_score:.3f})")
+            reasons.append(reason(ML_ANOMALY, score=ml_score))
         
         # 4. Off-hours check
         timestamp = transaction.get('timestamp')
@@ -103,7 +175,7 @@ class FraudDetector:
         # Fraudulent amounts are often perfectly round numbers (e.g., 50000.00)
         if amount > 1000 and amount % 1000 == 0:
             risk_score += 10
-            reasons.append("Suspiciously round amount (multiple of ₹1,000)")
+            reasons.append(reason(ROUND_AMOUNT))
         
         # Normalize to 0-1 scale
         normalized_score = min(risk_score / 100, 1.0)
@@ -113,7 +185,7 @@ class FraudDetector:
             "is_fraud": normalized_score > 0.5,
             "risk_score": round(normalized_score, 3),
             "risk_level": self._get_risk_level(normalized_score),
-            "reasons": reasons,
+            "reason_codes": reasons,
             "amount": amount,
             "department_id": dept_id,
             "vendor_id": transaction.get('vendor_id', 'UNKNOWN'),
@@ -122,34 +194,181 @@ class FraudDetector:
         }
     
     def predict_batch(self, transactions: List[Dict]) -> List[Dict]:
-        """Batch prediction for multiple transactions"""
-        return [self.predict_single(tx) for tx in transactions]
-    
+        """Batch prediction for multiple transactions: predict_single's result for each, scored together in one _score_arrays call"""
+        if not self.model_loaded or not transactions:
+            return [self.predict_single(tx) for tx in transactions]
+        # Small batches (the API's micro-batches) skip pandas: dict lookups into the baseline table
+        n = len(transactions)
+        amounts = np.array([float(tx.get('amount', 0)) for tx in transactions], dtype=float)
+        dept_ids = [tx.get('department_id', 'UNKNOWN') for tx in transactions]
+        baselines = np.full((n, 4), np.nan)
+        for i, dept_id in enumerate(dept_ids):
+            row = self._dept_rows.get(dept_id)
+            if row is not None:
+                baselines[i] = self._baselines[row]
+        off_hours_reasons = []
+        for tx in transactions:
+            timestamp = tx.get('timestamp')
+            off_hours_reasons.append(self._check_off_hours(timestamp)[1] if timestamp else None)
+
+        z_scores, ml_anomaly, normalized, reasons = self._score_arrays(amounts, *baselines.T, off_hours_reasons)
+        results = []
+        for i, tx in enumerate(transactions):
+            score = float(normalized[i])
+            z = z_scores[i]
+            results.append({
+                "transaction_id": tx.get('transaction_id', 'UNKNOWN'),
+                "is_fraud": score > 0.5,
+                "risk_score": round(score, 3),
+                "risk_level": self._get_risk_level(score),
+                "reason_codes": reasons[i],
+                "amount": float(amounts[i]),
+                "department_id": dept_ids[i],
+                "vendor_id": tx.get('vendor_id', 'UNKNOWN'),
+                "z_score": 0.0 if np.isnan(z) else float(z),
+                "ml_flag": "ANOMALY" if ml_anomaly[i] else "NORMAL"
+            })
+        return results
+
     def predict_dataframe(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Predict fraud for an entire DataFrame of transactions.
+
+        Same rows as predict_single on every record, computed column-wise: the
+        department baselines are joined once and the Isolation Forest scores the
+        whole amount column in one call.
         
         Args:
             df: DataFrame with transaction data
             
         Returns:
-            DataFrame with added risk_score, is_fraud, reasons columns
+            DataFrame with one predict_single result per row (RESULT_COLUMNS)
         """
         if not self.model_loaded:
             df['risk_score'] = 0
             df['is_fraud'] = False
-            df['reasons'] = ''
+            df['reason_codes'] = [[] for _ in range(len(df))]
             df['risk_level'] = 'LOW'
             return df
         
-        results = []
-        for _, row in df.iterrows():
-            tx_dict = row.to_dict()
-            result = self.predict_single(tx_dict)
-            results.append(result)
-        
-        results_df = pd.DataFrame(results)
-        return results_df
+        if len(df) == 0:
+            return pd.DataFrame(columns=RESULT_COLUMNS)
+
+        n = len(df)
+        amounts = df['amount'].to_numpy(dtype=float) if 'amount' in df.columns else np.zeros(n)
+        dept_ids = df['department_id'] if 'department_id' in df.columns else pd.Series(['UNKNOWN'] * n, index=df.index)
+
+        # 1-2. One join against the department baselines
+        stats = self.dept_stats.reindex(dept_ids.to_numpy())
+        baselines = [stats[col].to_numpy(dtype=float) for col in ('mean', 'std', 'q3', 'iqr')]
+
+        # 4. Off-hours check
+        off_hours_reasons = self._off_hours_reasons(df['timestamp']) if 'timestamp' in df.columns else [None] * n
+
+        z_scores, ml_anomaly, normalized, reasons = self._score_arrays(amounts, *baselines, off_hours_reasons)
+
+        # The score only takes a handful of distinct values; round each once with Python's round()
+        rounded = {score: round(score, 3) for score in set(normalized.tolist())}
+        return pd.DataFrame({
+            "transaction_id": df['transaction_id'].to_numpy() if 'transaction_id' in df.columns else 'UNKNOWN',
+            "is_fraud": normalized > 0.5,
+            "risk_score": [rounded[score] for score in normalized.tolist()],
+            "risk_level": [self._get_risk_level(score) for score in normalized.tolist()],
+            "reason_codes": reasons,
+            "amount": amounts,
+            "department_id": dept_ids.to_numpy(),
+            "vendor_id": df['vendor_id'].to_numpy() if 'vendor_id' in df.columns else 'UNKNOWN',
+            "z_score": np.nan_to_num(z_scores, nan=0.0),
+            "ml_flag": np.where(ml_anomaly, "ANOMALY", "NORMAL"),
+        }, columns=RESULT_COLUMNS)
+
+    def _score_arrays(self, amounts, mean, std, q3, iqr, off_hours_reasons):
+        """
+        predict_single's checks over arrays: amounts and their department's
+        baselines (NaN for unknown departments) plus each row's off-hours reason
+        (None in business hours). Returns (z_scores, ml_anomaly, normalized
+        score, reason codes per row).
+        """
+        n = len(amounts)
+
+        # 1. Z-score analysis
+        has_z = ~np.isnan(std) & (std != 0)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z_scores = np.where(has_z, (amounts - mean) / std, np.nan)
+        abs_z = np.abs(z_scores)
+        extreme = abs_z > 3
+        significant = ~extreme & (abs_z > 2)
+
+        # 2. IQR-based outlier detection (unknown departments compare against NaN: never an outlier)
+        iqr_outlier = amounts > q3 + 1.5 * iqr
+
+        # 3. Isolation Forest: score once, then apply predict()'s own threshold
+        ml_scores = self.forest.score_samples(amounts)
+        ml_anomaly = ml_scores - self.forest.offset_ < 0
+
+        # 5. Round Number Check (Human Bias Heuristic)
+        round_amount = (amounts > 1000) & (np.mod(amounts, 1000) == 0)
+
+        off_hours = np.fromiter((r is not None for r in off_hours_reasons), dtype=bool, count=n)
+        risk_scores = 30 * extreme + 15 * significant + 25 * iqr_outlier + 30 * ml_anomaly + 15 * off_hours + 10 * round_amount
+        normalized = np.minimum(risk_scores / 100, 1.0)
+
+        reasons = []
+        for z, is_extreme, is_significant, is_iqr, is_ml, ml_score, off_reason, is_round in zip(
+                z_scores.tolist(), extreme.tolist(), significant.tolist(), iqr_outlier.tolist(),
+                ml_anomaly.tolist(), ml_scores.tolist(), off_hours_reasons, round_amount.tolist()):
+            row_reasons = []
+            if is_extreme:
+                row_reasons.append(reason(Z_EXTREME, z=z))
+            elif is_significant:
+                row_reasons.append(reason(Z_SIGNIFICANT, z=z))
+            if is_iqr:
+                row_reasons.append(reason(IQR_OUTLIER))
+            if is_ml:
+                row_reasons.append(reason(ML_ANOMALY, score=ml_score))
+            if off_reason is not None:
+                row_reasons.append(off_reason)
+            if is_round:
+                row_reasons.append(reason(ROUND_AMOUNT))
+            reasons.append(row_reasons)
+        return z_scores, ml_anomaly, normalized, reasons
+
+    def _off_hours_reasons(self, timestamps: pd.Series) -> List[Optional[Dict]]:
+        """
+        _check_off_hours over a whole column: the reason per row, None when the
+        transaction is in business hours. Plain ISO-8601 strings are split with
+        one regex; anything else goes through the per-row parser.
+        """
+        try:
+            parts = timestamps.str.extract(ISO_TIMESTAMP)
+        except AttributeError: # not a string column (e.g. already parsed datetimes)
+            parts = None
+        if parts is None:
+            return [self._check_off_hours(ts)[1] if ts else None for ts in timestamps]
+
+        dates = pd.to_datetime(parts['date'], format='%Y-%m-%d', errors='coerce')
+        hours = pd.to_numeric(parts['hour']).to_numpy()
+        minutes = pd.to_numeric(parts['minute']).to_numpy()
+        seconds = pd.to_numeric(parts['second']).fillna(0).to_numpy()
+        offset_hours = pd.to_numeric(parts['offset_hour']).fillna(0).to_numpy()
+        offset_minutes = pd.to_numeric(parts['offset_minute']).fillna(0).to_numpy()
+        valid = (dates.notna().to_numpy() & (hours <= 23) & (minutes <= 59) & (seconds <= 59)
+                 & (offset_hours <= 23) & (offset_minutes <= 59))
+        weekdays = dates.dt.weekday.to_numpy()
+
+        reasons = []
+        for ts, ok, weekday, hour, hh, mm in zip(
+                timestamps.tolist(), valid.tolist(), weekdays.tolist(), hours.tolist(),
+                parts['hour'].tolist(), parts['minute'].tolist()):
+            if not ok:
+                reasons.append(self._check_off_hours(ts)[1] if ts else None)
+            elif weekday >= 5:
+                reasons.append(reason(WEEKEND, weekday=int(weekday)))
+            elif hour < 6 or hour > 22:
+                reasons.append(reason(OFF_HOURS, hour=int(hh), minute=int(mm)))
+            else:
+                reasons.append(None)
+        return reasons
     
     def _compute_z_score(self, amount: float, dept_id: str) -> Optional[float]:
         """Compute z-score based on department statistics"""
@@ -177,21 +396,21 @@ class FraudDetector:
         upper_bound = q3 + 1.5 * iqr
         return amount > upper_bound
     
-    def _check_off_hours(self, timestamp: str) -> Tuple[bool, str]:
-        """Check if transaction occurred during off-hours"""
+    def _check_off_hours(self, timestamp: str) -> Tuple[bool, Optional[Dict]]:
+        """Check if transaction occurred during off-hours (and the reason code if so)"""
         try:
-            dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-            hour = dt.hour
-            weekday = dt.weekday()
+            parsed = parse_timestamp(timestamp)
+            hour = parsed[HOUR]
+            weekday = parsed[WEEKDAY]
             
             if weekday >= 5:  # Weekend
-                return True, f"Transaction on {dt.strftime('%A')} (weekend)"
+                return True, reason(WEEKEND, weekday=weekday)
             if hour < 6 or hour > 22:
-                return True, f"Transaction at {dt.strftime('%H:%M')} (outside business hours)"
+                return True, reason(OFF_HOURS, hour=hour, minute=parsed[MINUTE])
             
-            return False, ""
+            return False, None
         except:
-            return False, ""
+            return False, None
     
     def _get_risk_level(self, score: float) -> str:
         """Convert risk score to human-readable level"""
@@ -215,22 +434,52 @@ class FraudDetector:
             "status": "loaded",
             "departments_tracked": len(self.dept_stats) if self.dept_stats is not None else 0,
             "model_type": "IsolationForest",
+            "compiled_breakpoints": len(self.forest.breakpoints),
             "features": ["amount"],
-            "contamination": getattr(self.iso_model, 'contamination', 'unknown')
+            "contamination": self.contamination if self.contamination is not None else 'unknown',
+            "model_version": self.model_version,
+            "model_path": str(self.model_path),
+            "loaded_at": self.loaded_at,
+            "load_seconds": self.load_seconds
         }
 
 
 # Export singleton for easy import
 _detector_instance = None
 
-def get_detector(model_path: str = "trained_model.pkl") -> FraudDetector:
-    """Get or create a FraudDetector singleton"""
+def get_detector(model_path: Optional[str] = None) -> FraudDetector:
+    """Get or create a FraudDetector singleton; the model loads on first use"""
     global _detector_instance
     if _detector_instance is None:
-        _detector_instance = FraudDetector(model_path)
+        if model_path is None:
+            model_path = default_model_path()
+        _detector_instance = FraudDetector(model_path, lazy=True)
     return _detector_instance
 
 
+def default_model_path() -> str:
+    active = ModelRegistry().active_path()
+    if active is not None:
+        return active
+    return next(
+        (p for p in DEFAULT_MODEL_PATHS if Path(p).exists() or (Path(__file__).parent / p).exists()),
+        DEFAULT_MODEL_PATHS[-1],
+    )
+
+
+def reload_detector(model_path: str) -> FraudDetector:
+    """
+    Load model_path into a new FraudDetector and make it the singleton. The old
+    instance is left untouched, so callers still holding it finish on the old
+    model; raises RuntimeError (keeping the old model) if the new one fails to load.
+    """
+    global _detector_instance
+    detector = FraudDetector(model_path)
+    if not detector.model_loaded:
+        raise RuntimeError(f"could not load model from {model_path}")
+    _detector_instance = detector # one reference assignment: atomic under the GIL
+    return detector
+
 if __name__ == "__main__":
     # Quick test
     detector = FraudDetector()
@@ -252,5 +501,5 @@ if __name__ == "__main__":
     print(f"   Is Fraud: {result['is_fraud']}")
     print(f"   ML Flag: {result['ml_flag']}")
     print(f"   Reasons:")
-    for reason in result['reasons']:
-        print(f"     - {reason}")
+    for text in render_reasons(result['reason_codes']):
+        print(f"     - {text}")
@@ -0,0 +1,151 @@
+"""
+Background jobs with progress reporting, used by `/api/upload?background=true`.
+
+A job lives in this process's JobStore while it runs. If a Mongo collection is
+given, the store also mirrors every job to it: on start, at most once per
+`persist_interval` seconds while it makes progress, and when it finishes. So
+`/api/jobs/{id}` answers from any API worker, and after a restart.
+
+Finished jobs stay in memory until `max_finished` newer ones have finished;
+older ones are then answered from the collection only.
+"""
+
+import asyncio
+import time
+import traceback
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Dict, Optional
+
+QUEUED, RUNNING, COMPLETED, FAILED = "queued", "running", "completed", "failed"
+
+
+class UploadJob:
+    def __init__(self, filename: str, job_id: Optional[str] = None):
+        self.id = job_id or uuid.uuid4().hex
+        self.filename = filename
+        self.status = QUEUED
+        self.rows_total = None
+        self.rows_processed = 0
+        self.rows_rejected = 0
+        self.chunks_processed = 0
+        self.model_version = None
+        self.created_at = datetime.utcnow()
+        self.started_at = None
+        self.finished_at = None
+        self.error = None
+        self.summary = None
+        self._started = None # perf_counter at start, for throughput
+
+    def start(self, rows_total: Optional[int] = None):
+        self.status = RUNNING
+        self.rows_total = rows_total
+        self.started_at = datetime.utcnow()
+        self._started = time.perf_counter()
+
+    def advance(self, rows: int):
+        self.rows_processed += rows
+        self.chunks_processed += 1
+
+    def complete(self, summary: Dict):
+        self.status = COMPLETED
+        self.summary = summary
+        self.finished_at = datetime.utcnow()
+
+    def fail(self, error: str):
+        self.status = FAILED
+        self.error = error
+        self.finished_at = datetime.utcnow()
+
+    def progress(self) -> Dict:
+        elapsed = time.perf_counter() - self._started if self._started is not None else 0.0
+        if self.status != RUNNING and self.started_at and self.finished_at:
+            elapsed = (self.finished_at - self.started_at).total_seconds()
+        throughput = self.rows_processed / elapsed if elapsed > 0 else 0.0
+        eta = None
+        if self.status == RUNNING and self.rows_total is not None and throughput > 0:
+            eta = round(max(self.rows_total - self.rows_processed, 0) / throughput, 1)
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "rows_total": self.rows_total,
+            "rows_processed": self.rows_processed,
+            "rows_rejected": self.rows_rejected,
+            "chunks_processed": self.chunks_processed,
+            "percent": round(self.rows_processed / self.rows_total * 100, 1) if self.rows_total else None,
+            "throughput_rows_per_sec": round(throughput, 1),
+            "elapsed_seconds": round(elapsed, 1),
+            "eta_seconds": eta,
+            "model_version": self.model_version,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "summary": self.summary,
+        }
+
+
+class JobStore:
+    def __init__(self, collection=None, persist_interval: float = 1.0, max_finished: int = 256):
+        self.collection = collection
+        self.persist_interval = persist_interval
+        self.max_finished = max_finished
+        self.jobs: Dict[str, UploadJob] = {}
+        self._tasks = set()
+        self._last_persist = {}
+        self._finished = deque() # job IDs in the order they finished
+
+    def create(self, filename: str) -> UploadJob:
+        job = UploadJob(filename)
+        self.jobs[job.id] = job
+        return job
+
+    def launch(self, job: UploadJob, run):
+        """Run `await run(job)` as a background task; its failure marks the job failed"""
+        async def runner():
+            try:
+                await self.persist(job, force=True)
+                await run(job)
+            except Exception as e:
+                traceback.print_exc()
+                job.fail(str(e))
+            finally:
+                await self.persist(job, force=True)
+                self.retire(job)
+
+        task = asyncio.get_running_loop().create_task(runner())
+        self._tasks.add(task) # keep a reference until it finishes
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    def retire(self, job: UploadJob):
+        """Forget a finished job's persist throttle, and evict the oldest finished jobs over the cap"""
+        self._last_persist.pop(job.id, None)
+        self._finished.append(job.id)
+        while len(self._finished) > self.max_finished:
+            self.jobs.pop(self._finished.popleft(), None)
+
+    async def persist(self, job: UploadJob, force: bool = False):
+        if self.collection is None:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_persist.get(job.id, 0.0) < self.persist_interval:
+            return
+        self._last_persist[job.id] = now
+        try:
+            await self.collection.replace_one({"_id": job.id}, dict(job.progress(), _id=job.id), upsert=True)
+        except Exception as e:
+            print(f"⚠️ Could not persist job {job.id}: {e}")
+
+    async def get(self, job_id: str) -> Optional[Dict]:
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job.progress()
+        if self.collection is None:
+            return None
+        doc = await self.collection.find_one({"_id": job_id})
+        if doc is not None:
+            doc.pop("_id", None)
+        return doc
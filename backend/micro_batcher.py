@@ -0,0 +1,136 @@
+"""
+Request micro-batching for the real-time scoring endpoints.
+
+Concurrent /api/predict and /api/transaction calls each need one row scored.
+Scoring them one at a time pays the detector's per-call overhead for every
+request; the batcher instead holds each request for at most `max_wait_ms` (or
+until `max_batch_size` requests are waiting), scores the whole batch with one
+vectorized call, and resolves every request's future with its own result.
+
+The queue lives on the event loop: submit() only appends to a list and arms a
+timer, and the timer callback takes the batch off it, so no locks are needed.
+The batch itself is scored by `run` (the API passes Executors.run, its thread
+pool; by default the loop's default executor) and the futures are resolved
+back on the loop when it completes, so scoring never blocks other requests.
+Batches may score concurrently when requests keep arriving during a call.
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# Batch-size histogram buckets: a batch of n items is counted under the first bound >= n
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32, 64, 128, 256]
+
+
+class MicroBatcher:
+    def __init__(self, score_batch: Callable[[List[Any]], List[Any]], max_batch_size: int = 64, max_wait_ms: float = 2.0,
+                 run: Optional[Callable[..., Awaitable[Any]]] = None):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.score_batch = score_batch
+        self.run = run or _run_in_default_executor
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._pending = [] # (item, future, enqueued_at)
+        self._timer = None
+        self._scoring = set() # in-flight batch tasks, referenced until they finish
+
+        self.batches = 0
+        self.items = 0
+        self.errors = 0
+        self.flushes_full = 0
+        self.flushes_timer = 0
+        self.last_batch_size = 0
+        self.largest_batch = 0
+        self.max_queue_depth = 0
+        self.total_wait_seconds = 0.0
+        self.total_score_seconds = 0.0
+        self.batch_size_histogram = {bound: 0 for bound in BATCH_SIZE_BUCKETS}
+        self.batch_size_histogram["inf"] = 0
+
+    async def submit(self, item):
+        """Queue one item and wait for its result from the next batch"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future, time.perf_counter()))
+        self.max_queue_depth = max(self.max_queue_depth, len(self._pending))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush(full=True)
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000, self._flush)
+        return await future
+
+    def _flush(self, full=False):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch = self._pending[:self.max_batch_size]
+        self._pending = self._pending[self.max_batch_size:]
+        if self._pending:
+            # Leftovers from a burst go out on the next loop iteration, not after another wait
+            self._timer = asyncio.get_running_loop().call_soon(self._flush)
+        # Requests whose client went away are dropped before scoring
+        batch = [entry for entry in batch if not entry[1].done()]
+        if not batch:
+            return
+        task = asyncio.get_running_loop().create_task(self._score(batch, full))
+        self._scoring.add(task)
+        task.add_done_callback(self._scoring.discard)
+
+    async def _score(self, batch, full):
+        started = time.perf_counter()
+        try:
+            results = await self.run(self.score_batch, [item for item, _, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"score_batch returned {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            self.errors += 1
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future, _), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+        finished = time.perf_counter()
+        self._record(batch, full, started, finished)
+
+    def _record(self, batch, full, started, finished):
+        size = len(batch)
+        self.batches += 1
+        self.items += size
+        self.last_batch_size = size
+        self.largest_batch = max(self.largest_batch, size)
+        if full:
+            self.flushes_full += 1
+        else:
+            self.flushes_timer += 1
+        self.total_wait_seconds += sum(started - enqueued_at for _, _, enqueued_at in batch)
+        self.total_score_seconds += finished - started
+        bucket = next((bound for bound in BATCH_SIZE_BUCKETS if size <= bound), "inf")
+        self.batch_size_histogram[bucket] += 1
+
+    def metrics(self) -> Dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "queue_depth": len(self._pending),
+            "batches_in_flight": len(self._scoring),
+            "max_queue_depth": self.max_queue_depth,
+            "batches": self.batches,
+            "items": self.items,
+            "errors": self.errors,
+            "flushes_full": self.flushes_full,
+            "flushes_timer": self.flushes_timer,
+            "last_batch_size": self.last_batch_size,
+            "largest_batch": self.largest_batch,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+            "avg_queue_wait_ms": round(self.total_wait_seconds / self.items * 1000, 3) if self.items else 0.0,
+            "avg_score_ms": round(self.total_score_seconds / self.batches * 1000, 3) if self.batches else 0.0,
+            "batch_size_histogram": {str(bound): count for bound, count in self.batch_size_histogram.items()},
+        }
+
+
+async def _run_in_default_executor(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
@@ -1,7 +1,14 @@
+import os
 import pandas as pd
 import numpy as np
 import pickle
 from sklearn.ensemble import IsolationForest
+from forest_compiler import CompiledIsolationForest
+from model_artifact import save_artifact
+from sketches import KllSketch
+
+# "exact" (default) or "sketch": how the department q1/q3 baselines are computed
+BASELINE_QUANTILES = os.getenv("AUDITAI_BASELINE_QUANTILES", "exact")
 
 print("Loading data...")
 
@@ -17,12 +24,23 @@ df["amount"] = df["amount"].fillna(df["amount"].median())
 # 3️⃣ Baseline Statistics (Department level)
 print("Calculating baselines...")
 
-dept_stats = df.groupby("department_id")["amount"].agg(
-    mean="mean",
-    std="std",
-    q1=lambda x: x.quantile(0.25),
-    q3=lambda x: x.quantile(0.75)
-)
+if BASELINE_QUANTILES == "sketch":
+    # Quartiles from one KLL sketch per department (sketches.py, ~1% rank error);
+    # the sketches merge, so baselines can be built chunk by chunk or per shard
+    dept_stats = df.groupby("department_id")["amount"].agg(mean="mean", std="std")
+    quartiles = {
+        dept: KllSketch().update_many(amounts).quantiles([0.25, 0.75])
+        for dept, amounts in df.groupby("department_id")["amount"]
+    }
+    dept_stats["q1"] = [quartiles[dept][0] for dept in dept_stats.index]
+    dept_stats["q3"] = [quartiles[dept][1] for dept in dept_stats.index]
+else:
+    dept_stats = df.groupby("department_id")["amount"].agg(
+        mean="mean",
+        std="std",
+        q1=lambda x: x.quantile(0.25),
+        q3=lambda x: x.quantile(0.75)
+    )
 
 dept_stats["iqr"] = dept_stats["q3"] - dept_stats["q1"]
 
@@ -36,6 +54,11 @@ iso_model = IsolationForest(
 
 iso_model.fit(df[["amount"]])
 
+# FraudDetector scores through the compiled lookup table; it must agree with sklearn
+compiled = CompiledIsolationForest.from_forest(iso_model)
+compiled.verify(iso_model, df["amount"].to_numpy())
+print("Compiled forest verified:", len(compiled.breakpoints), "breakpoints")
+
 # 5️⃣ Save trained objects
 print("Saving trained model...")
 
@@ -48,4 +71,8 @@ with open("trained_model.pkl", "wb") as f:
         f
     )
 
+# Pickle-free copy that the API loads without scikit-learn
+manifest = save_artifact("model_artifact", dept_stats, compiled, contamination=iso_model.contamination)
+print("Model artifact written:", manifest["model_version"])
+
 print("Training completed successfully!")
\ No newline at end of file
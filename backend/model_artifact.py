@@ -0,0 +1,148 @@
+"""
+Pickle-free on-disk format for the fraud model.
+
+`trained_model.pkl` needs pandas and scikit-learn to unpickle, and importing
+scikit-learn dominates an API worker's cold start. An artifact directory holds
+the same model as plain arrays:
+
+    manifest.json     format and model version, department names, forest
+                      constants and the sha256 of every array file
+    dept_stats.npy    float64 (departments x DEPT_COLUMNS) baseline table
+    breakpoints.npy   CompiledIsolationForest breakpoints
+    scores.npy        CompiledIsolationForest score per interval
+
+Arrays are memory-mapped on load and checked against the manifest checksums.
+`python model_artifact.py trained_model.pkl model_artifact` exports a pickle.
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+from forest_compiler import CompiledIsolationForest
+
+FORMAT_VERSION = 1
+MANIFEST = "manifest.json"
+DEPT_COLUMNS = ["mean", "std", "q1", "q3", "iqr"]
+ARRAY_FILES = ["dept_stats.npy", "breakpoints.npy", "scores.npy"]
+
+
+class ArtifactError(Exception):
+    """The artifact is missing files, corrupt, or in a format this code cannot read"""
+
+
+def is_artifact(path):
+    return os.path.isfile(os.path.join(path, MANIFEST))
+
+
+def save_artifact(path, dept_stats, forest, model_version=None, contamination=None):
+    """
+    Write dept_stats (DataFrame indexed by department, DEPT_COLUMNS) and a
+    CompiledIsolationForest to the artifact directory `path`; returns the manifest.
+    The manifest is written last, so a crashed export never looks complete.
+    """
+    os.makedirs(path, exist_ok=True)
+    arrays = {
+        "dept_stats.npy": dept_stats[DEPT_COLUMNS].to_numpy(dtype=np.float64),
+        "breakpoints.npy": forest.breakpoints,
+        "scores.npy": forest.scores,
+    }
+    checksums = {}
+    for name, array in arrays.items():
+        np.save(os.path.join(path, name), np.ascontiguousarray(array))
+        checksums[name] = _sha256(os.path.join(path, name))
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        # Content-addressed unless the caller names the version
+        "model_version": model_version or _combined_checksum(checksums)[:12],
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "departments": [str(d) for d in dept_stats.index],
+        "dept_columns": DEPT_COLUMNS,
+        "forest": {
+            "nan_score": forest.nan_score,
+            "offset": forest.offset_,
+            "contamination": contamination,
+        },
+        "sha256": checksums,
+    }
+    tmp_path = os.path.join(path, MANIFEST + ".tmp")
+    with open(tmp_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, os.path.join(path, MANIFEST))
+    return manifest
+
+
+def load_artifact(path, verify=True):
+    """
+    (manifest, dept_table, departments, forest) from an artifact directory.
+    dept_table is a read-only memory-mapped (departments x DEPT_COLUMNS) array.
+    """
+    try:
+        with open(os.path.join(path, MANIFEST), 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ArtifactError(f"cannot read {MANIFEST} in {path}: {e}")
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ArtifactError(f"unsupported artifact format {manifest.get('format_version')!r} (expected {FORMAT_VERSION})")
+    if manifest.get("dept_columns") != DEPT_COLUMNS:
+        raise ArtifactError(f"unexpected department columns {manifest.get('dept_columns')!r}")
+
+    arrays = {}
+    for name in ARRAY_FILES:
+        file_path = os.path.join(path, name)
+        if verify and _sha256(file_path) != manifest["sha256"].get(name):
+            raise ArtifactError(f"checksum mismatch for {name}")
+        arrays[name] = np.load(file_path, mmap_mode='r')
+
+    dept_table = arrays["dept_stats.npy"]
+    departments = manifest["departments"]
+    if dept_table.shape != (len(departments), len(DEPT_COLUMNS)):
+        raise ArtifactError(f"dept_stats.npy has shape {dept_table.shape}, manifest lists {len(departments)} departments")
+    forest = CompiledIsolationForest(
+        arrays["breakpoints.npy"], arrays["scores.npy"],
+        manifest["forest"]["nan_score"], manifest["forest"]["offset"],
+    )
+    return manifest, dept_table, departments, forest
+
+
+def export_pickle(pickle_path, path, model_version=None):
+    """Convert a trained_model.pkl into an artifact directory (needs scikit-learn)"""
+    import pickle
+    with open(pickle_path, 'rb') as f:
+        model_data = pickle.load(f)
+    iso_model = model_data['iso_model']
+    return save_artifact(
+        path, model_data['dept_stats'], CompiledIsolationForest.from_forest(iso_model),
+        model_version=model_version, contamination=getattr(iso_model, 'contamination', None),
+    )
+
+
+def _sha256(file_path):
+    digest = hashlib.sha256()
+    try:
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    except OSError as e:
+        raise ArtifactError(f"cannot read {file_path}: {e}")
+    return digest.hexdigest()
+
+
+def _combined_checksum(checksums):
+    return hashlib.sha256("".join(checksums[name] for name in sorted(checksums)).encode()).hexdigest()
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Export trained_model.pkl to the pickle-free artifact format")
+    parser.add_argument("pickle_path", nargs="?", default="trained_model.pkl")
+    parser.add_argument("path", nargs="?", default="model_artifact")
+    parser.add_argument("--model-version", default=None)
+    args = parser.parse_args()
+
+    manifest = export_pickle(args.pickle_path, args.path, model_version=args.model_version)
+    print(f"Exported model {manifest['model_version']} to {args.path} ({len(manifest['departments'])} departments)")
@@ -0,0 +1,137 @@
+"""
+Versioned model registry for the running API.
+
+    models/
+        ACTIVE              name of the version the API should serve
+        <version>/          one model artifact per version (see model_artifact.py)
+
+Publishing exports (or copies) the model into a temporary directory and renames
+it into place, and ACTIVE is replaced atomically, so a reader never sees a
+half-written version. The API picks up a change through POST
+/api/admin/models/reload, which loads the new version in a worker thread and
+then swaps the detector singleton (fraud_detector.reload_detector).
+"""
+
+import json
+import os
+import re
+import shutil
+import tempfile
+from pathlib import Path
+
+from model_artifact import is_artifact, export_pickle, load_artifact, MANIFEST
+
+DEFAULT_ROOT = Path(__file__).parent / "models"
+ACTIVE = "ACTIVE"
+VERSION_NAME = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]*$')
+
+
+class ModelRegistry:
+    def __init__(self, root=DEFAULT_ROOT):
+        self.root = Path(root)
+
+    def versions(self):
+        """Published versions with their manifest metadata, oldest first"""
+        if not self.root.is_dir():
+            return []
+        versions = []
+        for path in self.root.iterdir():
+            if path.is_dir() and is_artifact(path):
+                with open(path / MANIFEST) as f:
+                    manifest = json.load(f)
+                versions.append({
+                    "version": path.name,
+                    "model_version": manifest.get("model_version"),
+                    "created_at": manifest.get("created_at"),
+                    "departments": len(manifest.get("departments", [])),
+                })
+        return sorted(versions, key=lambda v: (v["created_at"] or "", v["version"]))
+
+    def path(self, version):
+        """Directory of a published version; KeyError if it does not exist"""
+        if not VERSION_NAME.match(version or "") or not is_artifact(self.root / version):
+            raise KeyError(f"unknown model version: {version!r}")
+        return str(self.root / version)
+
+    def active_version(self):
+        try:
+            with open(self.root / ACTIVE) as f:
+                version = f.read().strip()
+        except FileNotFoundError:
+            return None
+        return version or None
+
+    def active_path(self):
+        """Directory of the active version, or None when nothing is active"""
+        version = self.active_version()
+        if version is None:
+            return None
+        try:
+            return self.path(version)
+        except KeyError:
+            return None
+
+    def publish(self, source, version=None, activate=False):
+        """
+        Add a model to the registry: `source` is a trained_model.pkl or an
+        artifact directory. Returns the version name (the model's content
+        version unless one is given).
+        """
+        self.root.mkdir(parents=True, exist_ok=True)
+        staging = tempfile.mkdtemp(prefix=".publish-", dir=self.root)
+        try:
+            if is_artifact(source):
+                shutil.rmtree(staging)
+                shutil.copytree(source, staging)
+                manifest = load_artifact(staging)[0] # checks the copy against its checksums
+            else:
+                manifest = export_pickle(source, staging, model_version=version)
+            version = version or manifest["model_version"]
+            if not VERSION_NAME.match(version):
+                raise ValueError(f"invalid version name: {version!r}")
+            if (self.root / version).exists():
+                raise ValueError(f"version {version} is already published")
+            os.rename(staging, self.root / version)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+        if activate:
+            self.activate(version)
+        return version
+
+    def activate(self, version):
+        """Point ACTIVE at a published version"""
+        self.path(version)
+        tmp_path = self.root / (ACTIVE + ".tmp")
+        with open(tmp_path, 'w') as f:
+            f.write(version + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.root / ACTIVE)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Manage the AuditAI model registry")
+    parser.add_argument("--root", default=str(DEFAULT_ROOT))
+    commands = parser.add_subparsers(dest="command", required=True)
+    publish = commands.add_parser("publish", help="add a trained_model.pkl or model artifact as a new version")
+    publish.add_argument("source")
+    publish.add_argument("--version", default=None)
+    publish.add_argument("--activate", action="store_true")
+    activate = commands.add_parser("activate", help="make a published version the active one")
+    activate.add_argument("version")
+    commands.add_parser("list", help="list published versions")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.root)
+    if args.command == "publish":
+        print(f"Published {registry.publish(args.source, version=args.version, activate=args.activate)}")
+    elif args.command == "activate":
+        registry.activate(args.version)
+        print(f"Active version: {args.version} (POST /api/admin/models/reload to serve it)")
+    else:
+        active = registry.active_version()
+        for v in registry.versions():
+            marker = "*" if v["version"] == active else " "
+            print(f"{marker} {v['version']}  {v['created_at']}  {v['departments']} departments")
@@ -2,11 +2,23 @@ import csv
 import time
 import random
 import os
-import subprocess
 import json
 from datetime import datetime
 
+from engine import AuditEngine
+from processor import DataProcessor, CLEANED_COLUMNS
+
 STATUS_FILE = '../frontend/public/status.json'
+ALERTS_FILE = '../frontend/src/alerts.json'
+TX_FILE = 'data/transactions.csv'
+CLEANED_FILE = 'data/transactions_cleaned.csv'
+
+# Long-lived engine and processor: each new event is cleaned, linked and scored on
+# its own instead of re-running processor.py and engine.py over the whole ledger
+engine = None
+processor = None
+cleaned_columns = None
+live_alerts = {}
 
 def write_status(stage, detail, progress):
     status = {
@@ -21,8 +33,34 @@ def write_status(stage, detail, progress):
     except Exception as e:
         print(f"Error writing status: {e}")
 
+def start_engine():
+    global engine, processor, cleaned_columns, live_alerts
+    # One full clean and entity-linking pass; it leaves the canonical vendor map
+    # in processor.vendor_map for the events that follow
+    processor = DataProcessor(TX_FILE, CLEANED_FILE)
+    processor.process()
+    with open(CLEANED_FILE, newline='') as f:
+        cleaned_columns = next(csv.reader(f))
+    engine = AuditEngine(CLEANED_FILE)
+    live_alerts = {a['transaction_id']: a for a in engine.run()}
+    write_alerts()
+
+def write_alerts():
+    with open(ALERTS_FILE, "w") as f:
+        json.dump(sorted(live_alerts.values(), key=lambda x: x['risk_score'], reverse=True), f, indent=2)
+
+def clean_transaction(raw):
+    """Clean and link one raw ledger row as processor.py does, and append it to the cleaned ledger"""
+    row = {k: str(v) for k, v in raw.items()} # as csv.DictReader would read it back
+    processor.clean_row(row)
+    if row['vendor_id'] != "UNKNOWN":
+        processor.resolve_vendor(row['vendor_id'])
+    processor.link_row(row, processor.vendor_map)
+    with open(CLEANED_FILE, 'a', newline='') as f:
+        csv.DictWriter(f, fieldnames=cleaned_columns, restval="", extrasaction='ignore').writerow(row)
+    return row
+
 def push_transaction():
-    tx_file = 'data/transactions.csv'
     dept = random.choice(["DEPT-NHAI", "DEPT-CPWD", "DEPT-RAIL", "DEPT-EDU-DELHI", "DEPT-HEALTH-AIIMS"])
     vendor = random.choice(["VEN-INFRA-01", "VEN-TECH-02", "VEN-MED-X", "VEN-019", "VEN-088"])
     
@@ -66,7 +104,7 @@ def push_transaction():
         project_id
     ]
     
-    with open(tx_file, 'a', newline='') as f:
+    with open(TX_FILE, 'a', newline='') as f:
         writer = csv.writer(f)
         writer.writerow(new_row)
     
@@ -76,22 +114,22 @@ def push_transaction():
     write_status("Data Processing", "Normalizing fields and resolving entities...", 50)
     print("\nSTAGE 2: DATA PROCESSING (NORMALIZATION & CLEANING)")
     print("-" * 50)
-    proc_res = subprocess.run(["python3", "processor.py"], capture_output=True, text=True)
-    if proc_res.returncode == 0:
-        print("✅ Data standardized. Levenshtein fuzzy matching and canonical mapping applied.")
-    else:
-        print(f"❌ Processor error: {proc_res.stderr}")
+    cleaned_row = clean_transaction(dict(zip(CLEANED_COLUMNS, new_row)))
+    print(f"✅ Data standardized. Vendor linked to canonical entity {cleaned_row['vendor_id']}.")
     time.sleep(1)
 
     write_status("Risk Engine", "Applying heuristic signals and composite scoring...", 75)
     print("\nSTAGE 3: RISK ENGINE (EVALUATION & PRE-PAYMENT GUARD)")
     print("-" * 50)
-    eng_res = subprocess.run(["python3", "engine.py"], capture_output=True, text=True)
-    if eng_res.returncode == 0:
-        print("✅ Risk scoring complete. Statistical outliers and rule violations flagged.")
-        print("✅ Pre-payment Guard: Transaction held for mandatory review if score > 0.7")
-    else:
-        print(f"❌ Engine error: {eng_res.stderr}")
+    alerts_delta = engine.ingest(cleaned_row)
+    for alert in alerts_delta:
+        if alert.get('retracted'):
+            live_alerts.pop(alert['transaction_id'], None)
+        else:
+            live_alerts[alert['transaction_id']] = alert
+    write_alerts()
+    print(f"✅ Risk scoring complete. {len(alerts_delta)} alert(s) updated incrementally.")
+    print("✅ Pre-payment Guard: Transaction held for mandatory review if score > 0.7")
     time.sleep(1)
 
     write_status("Frontend Sync", "Syncing ledger and updating dashboard anomalies...", 100)
@@ -108,6 +146,7 @@ if __name__ == "__main__":
     print("This simulator demonstrates the full end-to-end flow of a transaction.")
     print("Check your terminal logs to see each stage of the pipeline.")
     print("-" * 50)
+    start_engine()
     try:
         while True:
             push_transaction()
@@ -1,5 +1,54 @@
+import numpy as np
 import pandas as pd
 import random
+from collections import Counter
+from typing import Dict, List, Optional
+
+from reason_codes import (reason, WEEKEND, ROUND_AMOUNT, ML_ANOMALY, DEPT_MULTIPLE, VENDOR_BATCH,
+                          REPEAT_OFFENDER, ESCALATING, DUPLICATE_PAYMENT)
+
+class NarrativeContext:
+    """
+    What narratives need to know about the batch a transaction came from:
+    transactions per vendor and the mean amount per department. Built once per
+    batch (or fed chunk by chunk with `add`), so each narrative is a pair of
+    dict lookups instead of two scans of the batch.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.vendor_counts = Counter()
+        self._dept_amounts = {} # department -> amount arrays, in file order
+        self._dept_means = {}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "NarrativeContext":
+        context = cls()
+        if df is not None:
+            context.add(df)
+        return context
+
+    def add(self, df: pd.DataFrame):
+        """Count another chunk of the batch (needs vendor_id, department_id and amount)"""
+        self.rows += len(df)
+        if df.empty:
+            return
+        self.vendor_counts.update(df['vendor_id'].value_counts().to_dict())
+        for dept, amounts in df.groupby('department_id', sort=False)['amount']:
+            self._dept_amounts.setdefault(dept, []).append(amounts.to_numpy())
+        self._dept_means.clear()
+
+    def vendor_count(self, vendor) -> int:
+        return self.vendor_counts.get(vendor, 0)
+
+    def department_mean(self, dept):
+        """Mean amount of the department's transactions, None if it has none"""
+        if dept not in self._dept_means:
+            chunks = self._dept_amounts.get(dept)
+            # Series.mean over the rows in file order, so the value (and the
+            # text it is formatted into) is exactly what filtering the frame gives
+            self._dept_means[dept] = pd.Series(np.concatenate(chunks)).mean() if chunks else None
+        return self._dept_means[dept]
 
 class NarrativeEngine:
     def __init__(self):
@@ -17,8 +66,53 @@ class NarrativeEngine:
         """
         Generate a natural language explanation for a standard transaction dict.
         df: Optional full dataframe to calculate context (averages, counts).
+        For many transactions of one batch, use generate_narratives.
+        """
+        context = NarrativeContext.from_frame(df) if df is not None else None
+        return self.render(dict(transaction, narrative_codes=self.narrative_codes(transaction, context)))
+
+    def generate_narratives(self, results: List[dict], context: NarrativeContext = None) -> List[str]:
+        """generate_narrative for every result of a batch, against the batch's context"""
+        return [self.render(dict(transaction, narrative_codes=self.narrative_codes(transaction, context)))
+                for transaction in results]
+
+    def narrative_codes(self, transaction: dict, context: NarrativeContext = None) -> List[Dict]:
+        """
+        The batch facts the transaction's narrative mentions, as narrative codes
+        to store with it (see reason_codes.py); render() turns them into text.
+        """
+        if context is None or context.rows == 0 or transaction.get('risk_score', 0) <= 0.5:
+            return [] # routine transactions get no context sentences
+        amount = transaction.get('amount', 0)
+        codes = []
+        avg_amt = context.department_mean(transaction.get('department_id', 'Unknown Dept'))
+        if avg_amt is not None and amount > avg_amt * 2:
+            codes.append(reason(DEPT_MULTIPLE, average=float(avg_amt)))
+        vendor_count = context.vendor_count(transaction.get('vendor_id', 'Unknown Vendor'))
+        if vendor_count > 1:
+            codes.append(reason(VENDOR_BATCH, count=int(vendor_count)))
+        return codes
+
+    def render(self, transaction: dict) -> str:
         """
-        reasons = transaction.get('reasons', [])
+        Narrative text of a result or stored document: its risk score, reason
+        codes (or legacy reason strings) and narrative codes.
+        """
+        codes = {c['code']: c for c in transaction.get('narrative_codes') or []}
+        if DUPLICATE_PAYMENT in codes:
+            duplicate = codes[DUPLICATE_PAYMENT]
+            return f"🚨 DUPLICATE PAYMENT DETECTED. Identical amount (₹{duplicate['amount']}) paid to this vendor recently (ID: {duplicate['transaction_id']})."
+
+        explanation = self._narrative(transaction, codes)
+        # Enrich narrative with historical context
+        if REPEAT_OFFENDER in codes:
+            flags, boost = codes[REPEAT_OFFENDER]['flags'], codes[REPEAT_OFFENDER]['boost']
+            explanation = f"⚠️ Repeat Offender ({flags} prior flags). {explanation} [Score boosted +{boost} due to {flags} previous flags]"
+        if ESCALATING in codes:
+            explanation = f"🚨 ESCALATING RISK: Vendor risk trajectory is increasing rapidly. {explanation}"
+        return explanation
+
+    def _narrative(self, transaction: dict, codes: Dict[str, Dict]) -> str:
         amount = transaction.get('amount', 0)
         vendor = transaction.get('vendor_id', 'Unknown Vendor')
         dept = transaction.get('department_id', 'Unknown Dept')
@@ -34,34 +128,64 @@ class NarrativeEngine:
         else:
             return "Routine transaction. No significant anomalies detected."
 
-        # 2. Contextual Analysis (if DF provided)
-        if df is not None and not df.empty:
-            # Vendor Context
-            vendor_txs = df[df['vendor_id'] == vendor]
-            vendor_count = len(vendor_txs)
-            
-            # Dept Context
-            dept_txs = df[df['department_id'] == dept]
-            if not dept_txs.empty:
-                avg_amt = dept_txs['amount'].mean()
-                if amount > avg_amt * 2:
-                    narrative_parts.append(f"The transaction value (₹{amount:,.2f}) is {amount/avg_amt:.1f}x higher than the {dept} average (₹{avg_amt:,.2f}).")
-            
-            if vendor_count > 1:
-                narrative_parts.append(f"This vendor has {vendor_count} transactions in the current batch.")
+        # 2. Contextual Analysis (batch facts recorded by narrative_codes)
+        if DEPT_MULTIPLE in codes:
+            avg_amt = codes[DEPT_MULTIPLE]['average']
+            narrative_parts.append(f"The transaction value (₹{amount:,.2f}) is {amount/avg_amt:.1f}x higher than the {dept} average (₹{avg_amt:,.2f}).")
+        if VENDOR_BATCH in codes:
+            narrative_parts.append(f"This vendor has {codes[VENDOR_BATCH]['count']} transactions in the current batch.")
 
         # 3. Specific Reason Expansion
-        for reason in reasons:
-            if "weekend" in reason.lower():
-                narrative_parts.append("The timestamp indicates processing outside standard business hours (Weekend/Night).")
-            elif "round" in reason.lower():
-                narrative_parts.append("The round invoice amount is suspicious and warrants invoice verification.")
-            elif "benford" in reason.lower() or "statistical" in reason.lower():
-                narrative_parts.append("Statistical tests indicate the amount may be fabricated (Benford's Law violation).")
-            elif "graph" in reason.lower():
-                narrative_parts.append("Graph analysis links this vendor to other high-risk entities.")
+        if 'reason_codes' in transaction:
+            for code in transaction['reason_codes'] or []:
+                sentence = REASON_SENTENCES.get(code['code'])
+                if sentence:
+                    narrative_parts.append(sentence)
+        else:
+            # Free-text reasons (documents stored before reason codes)
+            for text in transaction.get('reasons') or []:
+                sentence = _reason_sentence(text)
+                if sentence:
+                    narrative_parts.append(sentence)
         
         # 4. Conclusion
         narrative_parts.append("Recommended Action: Audit invoice content and verify vendor contract terms.")
         
         return " ".join(narrative_parts)
+
+WEEKEND_SENTENCE = "The timestamp indicates processing outside standard business hours (Weekend/Night)."
+ROUND_SENTENCE = "The round invoice amount is suspicious and warrants invoice verification."
+BENFORD_SENTENCE = "Statistical tests indicate the amount may be fabricated (Benford's Law violation)."
+GRAPH_SENTENCE = "Graph analysis links this vendor to other high-risk entities."
+
+# The sentence each detector reason adds to a narrative. These are the
+# sentences the narrative used to find by scanning the reason text for
+# "weekend", "round" and "statistical".
+REASON_SENTENCES = {
+    WEEKEND: WEEKEND_SENTENCE,
+    ROUND_AMOUNT: ROUND_SENTENCE,
+    ML_ANOMALY: BENFORD_SENTENCE,
+}
+
+def _reason_sentence(text: str) -> Optional[str]:
+    text = text.lower()
+    if "weekend" in text:
+        return WEEKEND_SENTENCE
+    elif "round" in text:
+        return ROUND_SENTENCE
+    elif "benford" in text or "statistical" in text:
+        return BENFORD_SENTENCE
+    elif "graph" in text:
+        return GRAPH_SENTENCE
+    return None
+
+_renderer = NarrativeEngine()
+
+def render_explanation(document: dict) -> str:
+    """The explanation of an alert or transaction document, rendered when it is read"""
+    if document.get('explanation'):
+        return document['explanation'] # stored text: audit engine alerts, older uploads
+    if 'reason_codes' in document or 'narrative_codes' in document:
+        return _renderer.render(document)
+    reasons = document.get('reasons')
+    return ' | '.join(reasons) if isinstance(reasons, list) else ""
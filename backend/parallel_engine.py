@@ -0,0 +1,134 @@
+"""
+Multi-core execution for AuditEngine.
+
+Every signal is local to a partition of the ledger once the category statistics
+are known: DUPLICATE, OFF_HOURS, STAT_OUTLIER and HIGH_FREQUENCY to a
+(vendor, department) group, CONTRACT_SPLIT to a project. The parent computes the
+global category statistics, hash-partitions compact row tuples into shards, and
+a process pool computes the signals of each shard. Workers are forked where the
+platform allows it, so they inherit the row tuples and each task only carries
+the row numbers of its shard. The per-shard signal maps are
+merged back in batch order before calculate_composite_score, so alerts match the
+single-core engine.
+"""
+
+import gc
+import math
+import multiprocessing
+import os
+from array import array
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+from engine import AuditEngine
+from chunked_engine import group_signals, contract_split_signals, row_record, TX_ID
+
+# Shards per worker; a few more shards than workers evens out skewed groups
+SHARDS_PER_WORKER = 2
+
+
+# Row tuples of the ledger being scored, inherited by forked workers
+_ROWS = None
+
+
+def _set_rows(rows):
+    global _ROWS
+    _ROWS = rows
+
+
+def _score_shard(group_idx, project_idx, cat_stats, split_window, split_min_count, split_ceiling):
+    """
+    Worker entry point: signals for one (vendor, department) shard and one
+    project shard, keyed by transaction ID so the parent can merge with dict.update
+    """
+    rules, prob = group_signals([_ROWS[i] for i in group_idx], cat_stats)
+    splits = contract_split_signals([_ROWS[i] for i in project_idx], split_window, split_min_count, split_ceiling)
+    return (
+        {_ROWS[row_no][TX_ID]: sigs for row_no, sigs in rules.items()},
+        {_ROWS[row_no][TX_ID]: sigs for row_no, sigs in prob.items()},
+        [(r[TX_ID], sig) for r, sig in splits],
+    )
+
+
+class ParallelAuditEngine(AuditEngine):
+    """AuditEngine whose signals are computed by a process pool; opt in with `engine.py --workers N`."""
+
+    def __init__(self, data_path, feedback_path='data/auditor_feedback.json', workers=None, **kwargs):
+        self.workers = workers or os.cpu_count() or 1
+        super().__init__(data_path, feedback_path, **kwargs)
+
+    def category_stats(self):
+        """Global mean/std per vendor category, computed exactly as the batch engine does"""
+        cat_map = defaultdict(list)
+        for tx in self.transactions:
+            cat_map[tx['vendor_category']].append(tx['amount'])
+        cat_stats = {}
+        for cat, amounts in cat_map.items():
+            avg = sum(amounts) / len(amounts)
+            std = math.sqrt(sum((x - avg)**2 for x in amounts) / len(amounts)) if len(amounts) > 1 else 0
+            cat_stats[cat] = {"avg": avg, "std": std}
+        return cat_stats
+
+    def partition(self, shards):
+        """Row tuples, plus their row numbers hash-partitioned by (vendor, department) and by project"""
+        rows = []
+        group_shards = [array('L') for _ in range(shards)]
+        project_shards = [array('L') for _ in range(shards)]
+        for row_no, tx in enumerate(self.transactions):
+            rows.append(row_record(row_no, tx, self.records[row_no]))
+            # Only the parent assigns shards, so the per-process hash seed does not matter
+            group_shards[hash((tx['vendor_id'], tx['department_id'])) % shards].append(row_no)
+            if tx.get('project_id'):
+                project_shards[hash(tx['project_id']) % shards].append(row_no)
+        return rows, group_shards, project_shards
+
+    def get_signal_maps(self):
+        """(rules, prob) signal maps, identical to get_rules_signals / get_probabilistic_signals"""
+        cat_stats = self.category_stats()
+        shards = self.workers * SHARDS_PER_WORKER
+        rows, group_shards, project_shards = self.partition(shards)
+        args = [
+            (group_shards[k], project_shards[k], cat_stats,
+             self.split_window, self.split_min_count, self.split_ceiling)
+            for k in range(shards)
+        ]
+        _set_rows(rows)
+        # Keep the collector off the inherited heap (copy-on-write) and off the
+        # unpickled results, which are all long-lived
+        gc.freeze()
+        gc.disable()
+        try:
+            if self.workers == 1:
+                results = [_score_shard(*a) for a in args]
+            elif 'fork' in multiprocessing.get_all_start_methods():
+                with ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('fork')) as pool:
+                    results = list(pool.map(_score_shard, *zip(*args)))
+            else:
+                with ProcessPoolExecutor(max_workers=self.workers, initializer=_set_rows, initargs=(rows,)) as pool:
+                    results = list(pool.map(_score_shard, *zip(*args)))
+        finally:
+            _set_rows(None)
+            gc.enable()
+            gc.unfreeze()
+
+        # Transaction IDs are unique and each one belongs to exactly one group shard
+        rules = defaultdict(list)
+        prob = defaultdict(list)
+        for shard_rules, shard_prob, _ in results:
+            rules.update(shard_rules)
+            prob.update(shard_prob)
+        # CONTRACT_SPLIT comes from the project shards and goes after STAT_OUTLIER and HIGH_FREQUENCY
+        for _, _, splits in results:
+            for tx_id, sig in splits:
+                prob[tx_id].append(sig)
+        return rules, prob
+
+    def get_rules_signals(self):
+        return self.get_signal_maps()[0]
+
+    def get_probabilistic_signals(self):
+        return self.get_signal_maps()[1]
+
+    def run(self):
+        rules, prob = self.get_signal_maps()
+        return self.calculate_composite_score(rules, prob)
@@ -1,4 +1,5 @@
 import csv
+import itertools
 import json
 import logging
 from datetime import datetime
@@ -13,6 +14,9 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+CLEANED_COLUMNS = ['transaction_id', 'timestamp', 'department_id', 'vendor_id', 'vendor_category', 'amount', 'payment_method', 'description', 'approver_id', 'budget_code', 'project_id']
+MISSING_VALUE_FIELDS = ['vendor_id', 'department_id', 'vendor_category', 'approver_id', 'budget_code']
+
 def levenshtein_distance(s1, s2):
     if len(s1) < len(s2):
         return levenshtein_distance(s2, s1)
@@ -68,40 +72,34 @@ class DataProcessor:
                 continue
         return date_str # Return as-is if no format matches
 
-    def process(self):
-        raw_data = []
-        with open(self.input_path, mode='r') as f:
-            reader = csv.DictReader(f)
-            raw_data = [row for row in reader]
-
-        # First pass: Cleaning and Canonical Entity Extraction
-        for row in raw_data:
-            tx_id = row['transaction_id']
-            
-            # 1. Standardise Amount
-            original_amount = row['amount']
-            try:
-                row['amount'] = float(original_amount)
-            except ValueError:
-                row['amount'] = 0.0
-                self.log_transformation(tx_id, 'amount', original_amount, 0.0, "Invalid numeric format")
-
-            # 2. Standardise Date
-            original_date = row['timestamp']
-            cleaned_date = self.parse_date(original_date)
-            if cleaned_date != original_date:
-                row['timestamp'] = cleaned_date
-                self.log_transformation(tx_id, 'timestamp', original_date, cleaned_date, "Date format standardisation")
-
-            # 3. Handle Missing Values
-            for field in ['vendor_id', 'department_id', 'vendor_category', 'approver_id', 'budget_code']:
-                if not row[field] or row[field].strip() == '':
-                    old_val = row[field]
-                    row[field] = "UNKNOWN"
-                    self.log_transformation(tx_id, field, old_val, "UNKNOWN", "Missing value replacement")
-
-        # Second pass: Entity Linking (Identity Resolution)
-        unique_vendors = list(set(row['vendor_id'] for row in raw_data if row['vendor_id'] != "UNKNOWN"))
+    def clean_row(self, row):
+        """Standardise one raw row in place, logging every transformation"""
+        tx_id = row['transaction_id']
+        
+        # 1. Standardise Amount
+        original_amount = row['amount']
+        try:
+            row['amount'] = float(original_amount)
+        except ValueError:
+            row['amount'] = 0.0
+            self.log_transformation(tx_id, 'amount', original_amount, 0.0, "Invalid numeric format")
+
+        # 2. Standardise Date
+        original_date = row['timestamp']
+        cleaned_date = self.parse_date(original_date)
+        if cleaned_date != original_date:
+            row['timestamp'] = cleaned_date
+            self.log_transformation(tx_id, 'timestamp', original_date, cleaned_date, "Date format standardisation")
+
+        # 3. Handle Missing Values
+        for field in MISSING_VALUE_FIELDS:
+            if not row[field] or row[field].strip() == '':
+                old_val = row[field]
+                row[field] = "UNKNOWN"
+                self.log_transformation(tx_id, field, old_val, "UNKNOWN", "Missing value replacement")
+
+    def resolve_entities(self, unique_vendors):
+        """Map every vendor name to the first canonical name it fuzzy-matches"""
         canonical_vendors = {} # Original Name -> Canonical Name
 
         for v in unique_vendors:
@@ -113,19 +111,96 @@ class DataProcessor:
                     break
             if not matched:
                 canonical_vendors[v] = v # This is a new canonical entity
+        return canonical_vendors
+
+    def resolve_vendor(self, v_id):
+        """
+        Canonical name of one vendor against the map of the last process() run,
+        linking a name it has not seen the way resolve_entities would have
+        """
+        if v_id not in self.vendor_map:
+            self.vendor_map[v_id] = next((canon for canon in self.vendor_map if fuzzy_match(v_id, canon)), v_id)
+        return self.vendor_map[v_id]
+
+    def link_row(self, row, canonical_vendors):
+        tx_id = row['transaction_id']
+        v_id = row['vendor_id']
+        if v_id in canonical_vendors and canonical_vendors[v_id] != v_id:
+            row['vendor_id_original'] = v_id
+            row['vendor_id'] = canonical_vendors[v_id]
+            self.log_transformation(tx_id, 'vendor_id', v_id, canonical_vendors[v_id], "Entity linking / Alias resolution")
+
+    def process(self, chunk_size=None):
+        if chunk_size:
+            return self.process_chunked(chunk_size)
+
+        raw_data = []
+        with open(self.input_path, mode='r') as f:
+            reader = csv.DictReader(f)
+            raw_data = [row for row in reader]
+
+        # First pass: Cleaning and Canonical Entity Extraction
+        for row in raw_data:
+            self.clean_row(row)
+
+        # Second pass: Entity Linking (Identity Resolution)
+        unique_vendors = list(set(row['vendor_id'] for row in raw_data if row['vendor_id'] != "UNKNOWN"))
+        canonical_vendors = self.resolve_entities(unique_vendors)
+        self.vendor_map = canonical_vendors
 
         # Third pass: Apply Entity Linking
         for row in raw_data:
-            tx_id = row['transaction_id']
-            v_id = row['vendor_id']
-            if v_id in canonical_vendors and canonical_vendors[v_id] != v_id:
-                row['vendor_id_original'] = v_id
-                row['vendor_id'] = canonical_vendors[v_id]
-                self.log_transformation(tx_id, 'vendor_id', v_id, canonical_vendors[v_id], "Entity linking / Alias resolution")
+            self.link_row(row, canonical_vendors)
 
         self.data = raw_data
         self.save_data()
 
+    def iter_chunks(self, chunk_size):
+        with open(self.input_path, mode='r') as f:
+            reader = csv.DictReader(f)
+            while True:
+                chunk = list(itertools.islice(reader, chunk_size))
+                if not chunk:
+                    return
+                yield reader.fieldnames, chunk
+
+    def process_chunked(self, chunk_size):
+        """
+        Same output as process() with at most chunk_size rows in memory: one pass
+        collects the vendor names for entity linking, a second pass cleans, links
+        and writes each batch.
+        """
+        unique_vendors = set()
+        rows_read = 0
+        for _, chunk in self.iter_chunks(chunk_size):
+            rows_read += len(chunk)
+            for row in chunk:
+                v_id = row['vendor_id']
+                # Mirrors the missing-value rule in clean_row without logging it twice
+                if v_id and v_id.strip() != '' and v_id != "UNKNOWN":
+                    unique_vendors.add(v_id)
+        canonical_vendors = self.resolve_entities(list(unique_vendors))
+        self.vendor_map = canonical_vendors
+        if not rows_read:
+            return # like save_data, leave an existing output untouched
+        linked = any(canon != v for v, canon in canonical_vendors.items())
+
+        writer = None
+        with open(self.output_path, 'w', newline='') as out:
+            for fieldnames, chunk in self.iter_chunks(chunk_size):
+                if writer is None:
+                    ordered_keys = list(CLEANED_COLUMNS)
+                    for k in list(fieldnames) + (['vendor_id_original'] if linked else []):
+                        if k not in ordered_keys:
+                            ordered_keys.append(k)
+                    writer = csv.DictWriter(out, fieldnames=ordered_keys, restval="")
+                    writer.writeheader()
+                for row in chunk:
+                    self.clean_row(row)
+                    self.link_row(row, canonical_vendors)
+                writer.writerows(chunk)
+        print(f"Cleaned data saved to {self.output_path}")
+
     def save_data(self):
         if not self.data: return
         # Ensure all rows have all keys for the DictWriter
@@ -134,7 +209,7 @@ class DataProcessor:
             all_keys.update(row.keys())
         
         # Consistent order: original keys first, then new ones
-        ordered_keys = ['transaction_id', 'timestamp', 'department_id', 'vendor_id', 'vendor_category', 'amount', 'payment_method', 'description', 'approver_id', 'budget_code', 'project_id']
+        ordered_keys = list(CLEANED_COLUMNS)
         for k in all_keys:
             if k not in ordered_keys:
                 ordered_keys.append(k)
@@ -150,9 +225,13 @@ class DataProcessor:
         print(f"Cleaned data saved to {self.output_path}")
 
 if __name__ == "__main__":
-    import sys
-    input_f = sys.argv[1] if len(sys.argv) > 1 else 'data/transactions.csv'
-    output_f = sys.argv[2] if len(sys.argv) > 2 else 'data/transactions_cleaned.csv'
+    import argparse
+    parser = argparse.ArgumentParser(description="AuditAI ledger cleaning and entity linking")
+    parser.add_argument("input", nargs="?", default='data/transactions.csv')
+    parser.add_argument("output", nargs="?", default='data/transactions_cleaned.csv')
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="stream the ledger in batches of this many rows instead of loading it whole")
+    args = parser.parse_args()
     
-    processor = DataProcessor(input_f, output_f)
-    processor.process()
+    processor = DataProcessor(args.input, args.output)
+    processor.process(chunk_size=args.chunk_size)
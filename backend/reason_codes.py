@@ -0,0 +1,57 @@
+"""
+Reason codes: why a transaction was flagged, as compact records.
+
+A reason is a dict holding a `code` from the catalogue below plus the numbers
+its sentence needs, e.g. {"code": "Z_EXTREME", "z": 3.41}. The detector emits
+these and the database stores them. Text is produced only when a result or
+alert is shown: render_reason gives the sentence the detector used to emit.
+
+Narrative codes follow the same shape. They carry the facts a narrative
+needs beyond the detector's reasons: the batch context, the vendor's history
+and duplicate payments. NarrativeEngine.render turns them into text.
+"""
+
+import calendar
+from typing import Dict, List
+
+# Detector reasons
+Z_EXTREME = "Z_EXTREME"           # z: z-score against the department baseline
+Z_SIGNIFICANT = "Z_SIGNIFICANT"   # z
+IQR_OUTLIER = "IQR_OUTLIER"
+ML_ANOMALY = "ML_ANOMALY"         # score: Isolation Forest anomaly score
+WEEKEND = "WEEKEND"               # weekday: 5 or 6
+OFF_HOURS = "OFF_HOURS"           # hour, minute
+ROUND_AMOUNT = "ROUND_AMOUNT"
+
+# Narrative facts
+DEPT_MULTIPLE = "DEPT_MULTIPLE"         # average: department mean of the batch (amount > 2x it)
+VENDOR_BATCH = "VENDOR_BATCH"           # count: the vendor's transactions in the batch
+REPEAT_OFFENDER = "REPEAT_OFFENDER"     # flags: prior alerts of the vendor, boost: score points added
+ESCALATING = "ESCALATING"
+DUPLICATE_PAYMENT = "DUPLICATE_PAYMENT" # amount, transaction_id: the earlier payment
+
+REASON_TEMPLATES = {
+    Z_EXTREME: "Extreme deviation from department average (z-score: {z:.2f})",
+    Z_SIGNIFICANT: "Significant deviation from department average (z-score: {z:.2f})",
+    IQR_OUTLIER: "Amount outside normal IQR range for this department",
+    ML_ANOMALY: "ML model detected rare statistical pattern (anomaly score: {score:.3f})",
+    WEEKEND: "Transaction on {day} (weekend)",
+    OFF_HOURS: "Transaction at {hour:02d}:{minute:02d} (outside business hours)",
+    ROUND_AMOUNT: "Suspiciously round amount (multiple of ₹1,000)",
+}
+
+
+def reason(code: str, **params) -> Dict:
+    return {"code": code, **params}
+
+
+def render_reason(reason: Dict) -> str:
+    """The sentence for one detector reason"""
+    params = dict(reason)
+    if 'weekday' in params:
+        params['day'] = calendar.day_name[params['weekday']]
+    return REASON_TEMPLATES[reason['code']].format(**params)
+
+
+def render_reasons(reasons: List[Dict]) -> List[str]:
+    return [render_reason(r) for r in reasons or []]
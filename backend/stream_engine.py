@@ -0,0 +1,270 @@
+"""
+Incremental scoring state behind AuditEngine.ingest.
+
+Scoring one new transaction only needs a small amount of state: running
+statistics per vendor category (Welford mean/variance), the recent duplicate-key
+index, and the HIGH_FREQUENCY / CONTRACT_SPLIT windows that are still open.
+Everything older than the longest window is evicted, so the cost of an event
+depends on how many transactions share its windows, not on the ledger size.
+
+Windows look forward from each transaction, so a new arrival can also change the
+signals of earlier transactions still inside its window (a higher payment count,
+or a project sum crossing the ceiling). Those transactions are reported as
+changed alongside the new one.
+"""
+
+import bisect
+import math
+from collections import deque
+
+from engine import (
+    HIGH_FREQUENCY_WINDOW,
+    HIGH_FREQUENCY_MIN_COUNT,
+    duplicate_signal,
+    is_off_hours,
+    off_hours_signal,
+    outlier_signal,
+    high_frequency_signal,
+    contract_split_signal,
+    DUP_KEY,
+)
+from window_engine import (
+    forward_window_counts, forward_window_sums, epoch_micros, to_paise,
+    HOUR, MINUTE, WEEKDAY, DUPLICATE_WINDOW_MICROS,
+)
+
+RULE_TYPES = ("DUPLICATE", "OFF_HOURS")
+PROB_TYPES = ("STAT_OUTLIER", "HIGH_FREQUENCY", "CONTRACT_SPLIT")
+
+
+class _WindowEntry:
+    __slots__ = ("micros", "timestamp", "tx_id", "amount", "count", "total")
+
+    def __init__(self, micros, timestamp, tx_id, amount, count=1, total=0):
+        self.micros = micros # epoch microseconds
+        self.timestamp = timestamp
+        self.tx_id = tx_id
+        self.amount = amount
+        self.count = count
+        self.total = total
+
+    def order(self):
+        return (self.micros, self.timestamp)
+
+
+class StreamingState:
+    """Open windows, running statistics and live signals for incremental ingestion."""
+
+    def __init__(self, split_window, split_min_count, split_ceiling):
+        self.split_window = split_window
+        self.split_min_count = split_min_count
+        self.split_ceiling = split_ceiling
+        # Windows and times are in epoch microseconds, so every edge is that of datetime subtraction
+        self.freq_window = HIGH_FREQUENCY_WINDOW * 10**6
+        self.split_window_micros = split_window * 10**6
+        self.ceiling_paise = to_paise(split_ceiling)
+        self.horizon = max(self.freq_window, self.split_window_micros, DUPLICATE_WINDOW_MICROS)
+
+        self.cat_stats = {} # category -> [n, mean, M2]
+        self.dup_index = {} # duplicate key -> (epoch microseconds, transaction_id)
+        self.freq_windows = {} # (vendor, department) -> sorted [_WindowEntry]
+        self.split_windows = {} # project -> sorted [_WindowEntry], amounts in paise
+        self.live = {} # transaction_id -> (tx, record, {signal type: signal})
+        self.expiry = deque() # (epoch microseconds, transaction_id) in arrival order
+        self.watermark = None
+
+    # --- Warm start from a batch run ---
+
+    def warm(self, transactions, records, rules, prob):
+        """Seed the state from an already-loaded ledger, its tx_records and its batch signal maps."""
+        for tx in transactions:
+            self._update_category(tx['vendor_category'], tx['amount'])
+        if not transactions:
+            return
+
+        micros = [epoch_micros(rec) for rec in records]
+        self.watermark = max(micros)
+        for tx, rec, at in zip(transactions, records, micros):
+            self.dup_index[rec[DUP_KEY]] = (at, tx['transaction_id'])
+        # A key whose last occurrence is older than 24h can never flag a new arrival
+        self.dup_index = {
+            k: v for k, v in self.dup_index.items() if v[0] + DUPLICATE_WINDOW_MICROS > self.watermark
+        }
+
+        recent = sorted(
+            ((at, tx['timestamp'], tx, rec) for tx, rec, at in zip(transactions, records, micros)
+             if at + self.horizon > self.watermark),
+            key=lambda x: x[:2]
+        )
+        for at, timestamp, tx, rec in recent:
+            tx_id = tx['transaction_id']
+            sigs = {s['type']: s for s in rules.get(tx_id, []) + prob.get(tx_id, [])}
+            self.live[tx_id] = (tx, rec, sigs)
+            self.expiry.append((at, tx_id))
+            if at + self.freq_window > self.watermark:
+                self.freq_windows.setdefault((tx['vendor_id'], tx['department_id']), []).append(
+                    _WindowEntry(at, timestamp, tx_id, tx['amount']))
+            if tx.get('project_id') and at + self.split_window_micros > self.watermark:
+                self.split_windows.setdefault(tx['project_id'], []).append(
+                    _WindowEntry(at, timestamp, tx_id, to_paise(tx['amount'])))
+
+        # Every transaction that can still join an open window is recent, so
+        # forward counts over the recent subset are the full-ledger counts
+        for entries in self.freq_windows.values():
+            counts = forward_window_counts([e.micros for e in entries], self.freq_window)
+            for entry, count in zip(entries, counts):
+                entry.count = count
+        for entries in self.split_windows.values():
+            counts, sums = forward_window_sums(
+                [e.micros for e in entries], [e.amount for e in entries], self.split_window_micros)
+            for entry, count, total in zip(entries, counts, sums):
+                entry.count, entry.total = count, total
+        self._evict()
+
+    # --- Incremental update ---
+
+    def ingest(self, tx, record):
+        """
+        Apply one transaction and its tx_record. Returns the IDs of every live
+        transaction whose signals changed, the new one included when it has any signal.
+        """
+        tx_id = tx['transaction_id']
+        amount = tx['amount']
+        dt_micros = epoch_micros(record)
+        self.watermark = dt_micros if self.watermark is None else max(self.watermark, dt_micros)
+        self._evict()
+
+        sigs = {}
+        changed = set()
+
+        # DUPLICATE: same vendor|department|amount as the previous occurrence within 24h
+        key = record[DUP_KEY]
+        prev = self.dup_index.get(key)
+        if prev and abs(dt_micros - prev[0]) < DUPLICATE_WINDOW_MICROS:
+            sigs["DUPLICATE"] = duplicate_signal(amount, tx['vendor_id'], prev[1])
+        self.dup_index[key] = (dt_micros, tx_id)
+
+        # OFF_HOURS
+        if is_off_hours(record[HOUR], record[WEEKDAY]):
+            sigs["OFF_HOURS"] = off_hours_signal(record[HOUR], record[MINUTE], record[WEEKDAY])
+
+        # STAT_OUTLIER against the running category statistics (this transaction included)
+        n, mean, m2 = self._update_category(tx['vendor_category'], amount)
+        std = math.sqrt(m2 / n) if n > 1 else 0
+        if std > 0:
+            z = abs(amount - mean) / std
+            if z > 2.0:
+                sigs["STAT_OUTLIER"] = outlier_signal(amount, z, mean)
+
+        self.live[tx_id] = (tx, record, sigs)
+        self.expiry.append((dt_micros, tx_id))
+
+        # HIGH_FREQUENCY: the new payment joins the window of every earlier one within 48h
+        vendor, dept = tx['vendor_id'], tx['department_id']
+        entries = self.freq_windows.setdefault((vendor, dept), [])
+        new_entry = _WindowEntry(dt_micros, tx['timestamp'], tx_id, amount)
+        for entry in self._insert(entries, new_entry, self.freq_window):
+            if entry.count >= HIGH_FREQUENCY_MIN_COUNT:
+                self._set_signal(entry.tx_id, "HIGH_FREQUENCY", high_frequency_signal(vendor, entry.count), changed)
+
+        # CONTRACT_SPLIT: rolling count and sum per project
+        pid = tx.get('project_id')
+        if pid:
+            entries = self.split_windows.setdefault(pid, [])
+            new_entry = _WindowEntry(dt_micros, tx['timestamp'], tx_id, to_paise(amount))
+            for entry in self._insert(entries, new_entry, self.split_window_micros):
+                if entry.count >= self.split_min_count and entry.total < self.ceiling_paise:
+                    sig = contract_split_signal(pid, entry.count, self.split_ceiling, self.split_window)
+                else:
+                    sig = None
+                self._set_signal(entry.tx_id, "CONTRACT_SPLIT", sig, changed)
+
+        if sigs:
+            changed.add(tx_id)
+        return changed
+
+    def signals_for(self, tx_id):
+        """(tx, record, rule signals, probabilistic signals) of a live transaction, in batch order"""
+        tx, record, sigs = self.live[tx_id]
+        return (
+            tx,
+            record,
+            [sigs[t] for t in RULE_TYPES if t in sigs],
+            [sigs[t] for t in PROB_TYPES if t in sigs],
+        )
+
+    # --- Helpers ---
+
+    def _update_category(self, category, amount):
+        stats = self.cat_stats.setdefault(category, [0, 0.0, 0.0])
+        stats[0] += 1
+        delta = amount - stats[1]
+        stats[1] += delta / stats[0]
+        stats[2] += delta * (amount - stats[1])
+        return stats
+
+    @staticmethod
+    def _insert(entries, new, window):
+        """
+        Insert a window entry in (epoch, timestamp) order and update the forward
+        counts/sums it affects. Returns the entries whose aggregates changed.
+        """
+        pos = bisect.bisect_right(entries, new.order(), key=_WindowEntry.order)
+        entries.insert(pos, new)
+
+        # Later entries inside the new entry's own window
+        new.total = new.amount
+        j = pos + 1
+        while j < len(entries) and entries[j].micros < new.micros + window:
+            new.count += 1
+            new.total += entries[j].amount
+            j += 1
+
+        # Earlier entries whose window now includes the new one
+        touched = [new]
+        i = pos - 1
+        while i >= 0 and entries[i].micros > new.micros - window:
+            entries[i].count += 1
+            entries[i].total += new.amount
+            touched.append(entries[i])
+            i -= 1
+        return touched
+
+    def _set_signal(self, tx_id, sig_type, sig, changed):
+        live = self.live.get(tx_id)
+        if live is None:
+            return
+        sigs = live[2]
+        if sig is None:
+            if sigs.pop(sig_type, None) is not None:
+                changed.add(tx_id)
+        elif sigs.get(sig_type) != sig:
+            sigs[sig_type] = sig
+            changed.add(tx_id)
+
+    def _evict(self):
+        """Drop everything that can no longer gain or match a later transaction."""
+        while self.expiry and self.expiry[0][0] + self.horizon <= self.watermark:
+            _, tx_id = self.expiry.popleft()
+            live = self.live.pop(tx_id, None)
+            if live is None:
+                continue
+            tx, record = live[0], live[1]
+            key = record[DUP_KEY]
+            if self.dup_index.get(key, (None, None))[1] == tx_id:
+                del self.dup_index[key]
+            self._drop_entry(self.freq_windows, (tx['vendor_id'], tx['department_id']), tx_id)
+            if tx.get('project_id'):
+                self._drop_entry(self.split_windows, tx['project_id'], tx_id)
+
+    @staticmethod
+    def _drop_entry(windows, key, tx_id):
+        entries = windows.get(key)
+        if not entries:
+            return
+        for i, entry in enumerate(entries):
+            if entry.tx_id == tx_id:
+                del entries[i]
+                break
+        if not entries:
+            del windows[key]
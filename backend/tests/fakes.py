@@ -0,0 +1,256 @@
+"""
+In-memory stand-ins for the Motor collections the API and its rollups use.
+
+Just enough of MongoDB's query and update language for the tests: equality,
+$gte/$lte/$in/$not/$or filters, bulk UpdateOne upserts with $inc, $max, $push
+($each/$sort/$slice), $addToSet and $set on dotted paths, projections, simple
+$match/$group aggregations, and a database whose collections can be renamed.
+Dates are compared as MongoDB stores them: naive UTC.
+"""
+
+import sys
+import os
+from datetime import datetime
+
+import pandas as pd
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+from alert_index import as_utc
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, keys, direction=None):
+        if isinstance(keys, str):
+            keys = [(keys, direction)]
+        for field, order in reversed(keys):
+            self.docs.sort(key=lambda d: _sort_key(_get(d, field)), reverse=order < 0)
+        return self
+
+    def limit(self, n):
+        self.docs = self.docs[:n]
+        return self
+
+    async def to_list(self, length=None):
+        return self.docs[:length]
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self.docs:
+            yield doc
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.collections = {}
+
+    def get_collection(self, name):
+        return self.collections.setdefault(name, FakeCollection(self, name))
+
+
+class FakeCollection:
+    """A list of documents behind the Motor collection methods the tests reach"""
+
+    def __init__(self, database=None, name=None, docs=(), aggregate_result=None):
+        self.database = database
+        self.name = name
+        self.docs = []
+        self.indexes = []
+        self.finds = []
+        self.pipelines = []
+        self.bulk_writes = 0
+        # Returned by aggregate() for pipelines the fake does not evaluate ($facet)
+        self.aggregate_result = aggregate_result
+        self.add_docs(docs)
+
+    # --- Writes ---
+
+    async def insert_one(self, doc):
+        self.add_docs([doc])
+
+    async def insert_many(self, docs):
+        self.add_docs(docs)
+
+    def add_docs(self, docs):
+        """insert_many without awaiting; like pymongo, sets _id on the documents passed in"""
+        for doc in docs:
+            doc.setdefault("_id", len(self.docs))
+            self.docs.append(dict(doc))
+
+    async def bulk_write(self, requests, ordered=True):
+        self.bulk_writes += 1
+        for request in requests:
+            self.update(request._filter, request._doc, request._upsert)
+
+    async def update_one(self, query, update, upsert=False):
+        self.update(query, update, upsert)
+
+    async def replace_one(self, query, doc, upsert=False):
+        current = self.find_now(query)
+        if current is None and not upsert:
+            return
+        if current is not None:
+            self.docs.remove(current)
+        self.docs.append(dict(doc, _id=query["_id"]))
+
+    def update(self, query, update, upsert=False):
+        doc = self.find_now(query)
+        if doc is None:
+            if not upsert:
+                return
+            doc = {k: v for k, v in query.items() if not isinstance(v, dict)}
+            doc.setdefault("_id", len(self.docs))
+            self.docs.append(doc)
+        for path, value in update.get("$inc", {}).items():
+            target, leaf = _parent(doc, path)
+            target[leaf] = target.get(leaf, 0) + value
+        for path, value in update.get("$max", {}).items():
+            target, leaf = _parent(doc, path)
+            target[leaf] = value if target.get(leaf) is None else max(target[leaf], value)
+        for path, value in update.get("$addToSet", {}).items():
+            target, leaf = _parent(doc, path)
+            entries = target.setdefault(leaf, [])
+            entries += [v for v in value["$each"] if v not in entries]
+        for path, value in update.get("$push", {}).items():
+            target, leaf = _parent(doc, path)
+            entries = target.get(leaf, []) + list(value["$each"])
+            for field, order in reversed(list(value.get("$sort", {}).items())):
+                entries.sort(key=lambda e: _sort_key(e.get(field)), reverse=order < 0)
+            target[leaf] = entries[:value["$slice"]] if "$slice" in value else entries
+        for path, value in update.get("$set", {}).items():
+            target, leaf = _parent(doc, path)
+            target[leaf] = value
+
+    async def delete_many(self, query):
+        self.docs = [d for d in self.docs if not matches(d, query)]
+
+    async def drop(self):
+        self.docs, self.indexes = [], []
+
+    async def create_index(self, keys, **options):
+        self.indexes.append(options["name"])
+        return options["name"]
+
+    async def rename(self, new_name, dropTarget=False):
+        del self.database.collections[self.name]
+        self.name = new_name
+        self.database.collections[new_name] = self
+
+    # --- Reads ---
+
+    def find_now(self, query):
+        return next((d for d in self.docs if matches(d, query or {})), None)
+
+    async def find_one(self, query=None):
+        doc = self.find_now(query)
+        return None if doc is None else dict(doc)
+
+    def find(self, query=None, projection=None):
+        self.finds.append(query)
+        return FakeCursor([_project(d, projection) for d in self.docs if matches(d, query or {})])
+
+    async def count_documents(self, query):
+        return sum(1 for d in self.docs if matches(d, query))
+
+    async def estimated_document_count(self):
+        return len(self.docs)
+
+    def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        if self.aggregate_result is not None:
+            return FakeCursor(list(self.aggregate_result))
+        docs = self.docs
+        for stage in pipeline:
+            if "$match" in stage:
+                docs = [d for d in docs if matches(d, stage["$match"])]
+            elif "$group" in stage:
+                docs = _group(docs, stage["$group"])
+            else:
+                raise NotImplementedError(f"aggregation stage {stage}")
+        return FakeCursor(docs)
+
+
+def matches(doc, query) -> bool:
+    for field, cond in query.items():
+        if field == "$or":
+            if not any(matches(doc, branch) for branch in cond):
+                return False
+            continue
+        value = _comparable(_get(doc, field))
+        if isinstance(cond, dict):
+            if "$not" in cond:
+                if matches(doc, {field: cond["$not"]}):
+                    return False
+                continue
+            if "$in" in cond:
+                if value not in [_comparable(v) for v in cond["$in"]]:
+                    return False
+                continue
+            for op, bound in cond.items():
+                bound = _comparable(bound)
+                if not _same_type(value, bound):
+                    return False # MongoDB compares within a type only
+                if (op == "$gte" and value < bound) or (op == "$lte" and value > bound):
+                    return False
+        elif value != _comparable(cond):
+            return False
+    return True
+
+
+def _comparable(value):
+    return as_utc(value) if isinstance(value, (datetime, pd.Timestamp)) else value
+
+
+def _same_type(a, b):
+    numbers = (int, float)
+    return (isinstance(a, numbers) and isinstance(b, numbers)) or (a is not None and type(a) is type(b))
+
+
+def _sort_key(value):
+    # Missing values sort first ascending, as null does in MongoDB
+    value = _comparable(value)
+    return (value is not None, value if value is not None else 0)
+
+
+def _get(doc, path):
+    for part in path.split("."):
+        if not isinstance(doc, dict):
+            return None
+        doc = doc.get(part)
+    return doc
+
+
+def _parent(doc, path):
+    *parents, leaf = path.split(".")
+    for parent in parents:
+        doc = doc.setdefault(parent, {})
+    return doc, leaf
+
+
+def _project(doc, projection):
+    if not projection:
+        return dict(doc)
+    if not any(projection.values()):
+        return {k: v for k, v in doc.items() if k not in projection}
+    kept = {k: v for k, v in doc.items() if projection.get(k)}
+    if projection.get("_id", 1):
+        kept["_id"] = doc["_id"]
+    return kept
+
+
+def _group(docs, spec):
+    """$group on one field (or None) with {"$sum": 1} counters"""
+    key = spec["_id"]
+    groups = {}
+    for doc in docs:
+        group_id = _get(doc, key[1:]) if key else None
+        group = groups.setdefault(group_id, {"_id": group_id})
+        for field, accumulator in spec.items():
+            if field != "_id":
+                group[field] = group.get(field, 0) + accumulator["$sum"]
+    return list(groups.values())
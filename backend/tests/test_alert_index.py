@@ -0,0 +1,137 @@
+import sys
+import os
+import asyncio
+import random
+import unittest
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+# Add parent directory to path to import the index
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+from alert_index import AlertIndex
+from fakes import FakeCollection
+
+
+class ScanningAlerts(FakeCollection):
+    """Calls `during_scan` once the window scan of a warm has returned its first alert"""
+
+    def __init__(self, docs, during_scan):
+        super().__init__(docs=docs)
+        self.during_scan = during_scan
+
+    async def _scan(self, docs):
+        for i, doc in enumerate(docs):
+            yield doc
+            if i == 0:
+                self.during_scan()
+
+    def find(self, query, projection=None):
+        return self._scan(super().find(query, projection).docs)
+
+
+class TestAlertIndex(unittest.TestCase):
+    def random_alert(self, rng, now, i):
+        created_at = now - timedelta(hours=rng.uniform(-2, 60))
+        if i % 5 == 0:
+            created_at = pd.Timestamp(created_at).tz_localize("UTC").tz_convert("Asia/Kolkata") # uploaded timestamps
+        alert = {"transaction_id": f"T{i}", "vendor_id": f"V{rng.randrange(30)}",
+                 "amount": float(rng.choice([1000, 2500, 4999.5, 12000])), "created_at": created_at}
+        if i % 17 == 0:
+            del alert["created_at"] # duplicate-branch alerts have none
+        return alert
+
+    def assertAgrees(self, index, alerts, rng, now):
+        since = now - timedelta(hours=24)
+        for _ in range(300):
+            vendor, amount = f"V{rng.randrange(32)}", float(rng.choice([1000, 2500, 4999.5, 12000, 7]))
+            expected = asyncio.run(alerts.find_one({"vendor_id": vendor, "amount": amount, "created_at": {"$gte": since}}))
+            found = asyncio.run(index.find_duplicate(vendor, amount, since))
+            self.assertEqual(found is None, expected is None, (vendor, amount))
+            if found is not None:
+                self.assertGreaterEqual(found["created_at"], since)
+                self.assertEqual(found["vendor_id"], vendor)
+            self.assertEqual(asyncio.run(index.vendor_alert_count(vendor)),
+                             asyncio.run(alerts.count_documents({"vendor_id": vendor})))
+
+    def test_matches_mongo_queries(self):
+        rng = random.Random(3)
+        now = datetime.utcnow()
+        alerts = FakeCollection(docs=[self.random_alert(rng, now, i) for i in range(600)])
+        index = AlertIndex(alerts, mode="local")
+        asyncio.run(index.warm())
+        self.assertTrue(index.ready)
+        self.assertAgrees(index, alerts, rng, now)
+
+        # Alerts inserted after warming are seen through add/add_many
+        new = [self.random_alert(rng, now, i) for i in range(600, 900)]
+        alerts.add_docs(new)
+        index.add(new[0])
+        index.add_many(new[1:])
+        self.assertAgrees(index, alerts, rng, now)
+        self.assertEqual(index.metrics()["lookups"], {"memory": 600})
+
+    def test_inserts_during_warm_are_replayed(self):
+        rng = random.Random(4)
+        now = datetime.utcnow()
+        new = [{"transaction_id": f"N{i}", "vendor_id": "V1", "amount": 777.0, "created_at": now} for i in range(3)]
+
+        def insert():
+            alerts.add_docs(new[:2]) # after the scan's snapshot: not returned by it
+            index.add_many(new[:2] + new[2:]) # new[2] was inserted before the warm and is returned
+
+        alerts = ScanningAlerts([self.random_alert(rng, now, i) for i in range(200)] + new[2:], insert)
+        index = AlertIndex(alerts)
+        asyncio.run(index.warm())
+        self.assertAgrees(index, alerts, rng, now)
+        self.assertEqual(asyncio.run(index.vendor_alert_count("V1")), sum(d["vendor_id"] == "V1" for d in alerts.docs))
+
+    def test_clear_during_warm_wins(self):
+        now = datetime.utcnow()
+        def clear():
+            alerts.docs = []
+            index.clear()
+        alerts = ScanningAlerts([{"transaction_id": f"T{i}", "vendor_id": "V1", "amount": 500.0, "created_at": now}
+                                 for i in range(2)], clear)
+        index = AlertIndex(alerts)
+        asyncio.run(index.warm())
+        self.assertEqual(asyncio.run(index.vendor_alert_count("V1")), 0)
+        self.assertIsNone(asyncio.run(index.find_duplicate("V1", 500.0, now - timedelta(hours=1))))
+
+    def test_window_moves_on(self):
+        now = datetime.utcnow()
+        alerts = FakeCollection(docs=[{"transaction_id": "T1", "vendor_id": "V1", "amount": 500.0, "created_at": now - timedelta(hours=23)}])
+        index = AlertIndex(alerts)
+        asyncio.run(index.warm())
+        self.assertEqual(asyncio.run(index.find_duplicate("V1", 500.0, now - timedelta(hours=24)))["transaction_id"], "T1")
+        self.assertIsNone(asyncio.run(index.find_duplicate("V1", 500.0, now - timedelta(hours=22))))
+        asyncio.run(index.find_duplicate("V1", 500.0, now + timedelta(hours=2)))
+        self.assertEqual(index.metrics()["hour_buckets"], 0) # pruned
+        self.assertEqual(asyncio.run(index.vendor_alert_count("V1")), 1) # history has no window
+
+    def test_clear_and_cold_index(self):
+        now = datetime.utcnow()
+        alerts = FakeCollection(docs=[{"transaction_id": "T1", "vendor_id": "V1", "amount": 500.0, "created_at": now}])
+        cold = AlertIndex(alerts)
+        # Not warmed: the checks go to MongoDB
+        self.assertEqual(asyncio.run(cold.find_duplicate("V1", 500.0, now - timedelta(hours=1)))["transaction_id"], "T1")
+        self.assertEqual(asyncio.run(cold.vendor_alert_count("V1")), 1)
+        self.assertEqual(cold.metrics()["lookups"], {"mongo": 1})
+
+        asyncio.run(cold.warm())
+        cold.clear()
+        self.assertIsNone(asyncio.run(cold.find_duplicate("V1", 500.0, now - timedelta(hours=1))))
+        self.assertEqual(asyncio.run(cold.vendor_alert_count("V1")), 0)
+
+    def test_mongo_mode_never_warms(self):
+        alerts = FakeCollection(docs=[{"transaction_id": "T1", "vendor_id": "V1", "amount": 500.0}])
+        index = AlertIndex(alerts, mode="mongo")
+        asyncio.run(index.warm())
+        self.assertFalse(index.ready)
+        self.assertEqual(asyncio.run(index.vendor_alert_count("V1")), 1)
+        with self.assertRaises(ValueError):
+            AlertIndex(alerts, mode="redis")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+import sys
+import os
+import asyncio
+import random
+import unittest
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+# Add parent directory to path to import the stats
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+from alert_stats import AlertStats, FACET_PIPELINE, STATS_ID
+from fakes import FakeCollection
+
+
+def recount(alerts):
+    """What the per-query /api/stats implementation returned for these alerts"""
+    scores = [a["risk_score"] for a in alerts if isinstance(a.get("risk_score"), (int, float))]
+    monthly = {}
+    for a in alerts:
+        created_at = a.get("created_at")
+        if isinstance(created_at, pd.Timestamp):
+            created_at = created_at.tz_convert("UTC") if created_at.tzinfo else created_at
+        if created_at is not None:
+            monthly[created_at.month] = monthly.get(created_at.month, 0) + 1
+    return {
+        "total": len(alerts),
+        "critical": sum(s >= 0.8 for s in scores),
+        "high": sum(0.6 <= s < 0.8 for s in scores),
+        "medium": sum(0.4 <= s < 0.6 for s in scores),
+        "total_flagged_amount": sum(a["amount"] for a in alerts if isinstance(a.get("amount"), (int, float))),
+        "monthly": monthly,
+    }
+
+
+class TestAlertStats(unittest.TestCase):
+    def random_alerts(self, rng, n, start):
+        base = datetime(2025, 1, 1)
+        alerts = []
+        for i in range(start, start + n):
+            alert = {"transaction_id": f"T{i}", "risk_score": round(rng.random(), 3),
+                     "amount": float(rng.randrange(1, 10**6)), "created_at": base + timedelta(days=rng.randrange(365))}
+            if i % 11 == 0:
+                alert["created_at"] = pd.Timestamp(alert["created_at"]).tz_localize("Asia/Kolkata")
+            if i % 13 == 0:
+                del alert["created_at"]
+            alerts.append(alert)
+        return alerts
+
+    def test_materialized_counts_follow_inserts_deletes_and_rescores(self):
+        rng = random.Random(5)
+        alerts = self.random_alerts(rng, 200, 0)
+        stats = AlertStats(FakeCollection(aggregate_result=[]), FakeCollection(), mode="materialized")
+        asyncio.run(stats.ensure()) # built from the (empty) collection
+        asyncio.run(stats.apply(added=alerts))
+
+        more = self.random_alerts(rng, 100, 200)
+        asyncio.run(stats.apply(added=more))
+        alerts += more
+        gone = alerts[:30]
+        asyncio.run(stats.apply(removed=gone))
+        alerts = alerts[30:]
+        rescored = [dict(a, risk_score=0.95) for a in alerts[:20]]
+        asyncio.run(stats.apply(added=rescored, removed=alerts[:20]))
+        alerts = rescored + alerts[20:]
+
+        got = asyncio.run(stats.get())
+        expected = recount(alerts)
+        self.assertAlmostEqual(got.pop("total_flagged_amount"), expected.pop("total_flagged_amount"), places=3)
+        self.assertEqual(got, expected)
+
+    def test_facet_result_mapping(self):
+        facet = [{"totals": [{"_id": None, "total": 7, "total_flagged_amount": 1234.5, "critical": 2, "high": 1, "medium": 3}],
+                  "monthly": [{"_id": None, "count": 1}, {"_id": 1, "count": 4}, {"_id": 12, "count": 2}]}]
+        alerts = FakeCollection(aggregate_result=facet)
+        stats = AlertStats(alerts, FakeCollection())
+        self.assertEqual(asyncio.run(stats.get()), {"total": 7, "critical": 2, "high": 1, "medium": 3,
+                                                     "total_flagged_amount": 1234.5, "monthly": {1: 4, 12: 2}})
+        self.assertEqual(alerts.pipelines, [FACET_PIPELINE]) # one aggregation per request
+
+        empty = AlertStats(FakeCollection(aggregate_result=[{"totals": [], "monthly": []}]), FakeCollection())
+        self.assertEqual(asyncio.run(empty.get()), {"total": 0, "critical": 0, "high": 0, "medium": 0,
+                                                    "total_flagged_amount": 0.0, "monthly": {}})
+
+    def test_facet_mode_writes_nothing(self):
+        store = FakeCollection()
+        stats = AlertStats(FakeCollection(aggregate_result=[]), store)
+        asyncio.run(stats.ensure())
+        asyncio.run(stats.apply(added=[{"risk_score": 0.9, "amount": 1.0}]))
+        self.assertEqual(store.docs, [])
+
+    def test_rebuild_replaces_drifted_document(self):
+        facet = [{"totals": [{"_id": None, "total": 3, "total_flagged_amount": 30.0, "critical": 1, "high": 0, "medium": 1}],
+                  "monthly": [{"_id": 2, "count": 3}]}]
+        store = FakeCollection()
+        stats = AlertStats(FakeCollection(aggregate_result=facet), store, mode="materialized")
+        asyncio.run(stats.apply(added=[{"risk_score": 0.9, "amount": 99.0}]))
+        asyncio.run(stats.rebuild())
+        self.assertEqual(store.docs[0]["_id"], STATS_ID)
+        self.assertEqual(store.docs[0]["monthly"], {"2": 3})
+        self.assertEqual(asyncio.run(stats.get())["total"], 3)
+
+if __name__ == "__main__":
+    unittest.main()
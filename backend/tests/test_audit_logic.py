@@ -64,5 +64,30 @@ class TestAuditLogic(unittest.TestCase):
         self.assertTrue(len(freq_alerts) > 0, "High frequency transaction group starting at TX-FREQ-01 was not flagged.")
         self.assertIn("indicating an accelerated payout pattern", freq_alerts[0]['explanation'])
 
+    def test_feedback_adjustments_are_incremental(self):
+        feedback_path = "test_feedback.json"
+        try:
+            engine = AuditEngine(self.test_data_path, feedback_path=feedback_path)
+            for tx_id in ["TX-NORM-01", "TX-NORM-02"]:
+                engine.submit_feedback(tx_id, "dismiss", "Known vendor")
+            self.assertEqual(engine.get_feedback_adjustments().get("VEN-OFFICE-01", 0), 0)
+            engine.submit_feedback("TX-NORM-03", "dismiss", "Known vendor")
+            engine.submit_feedback("TX-OFF-01", "escalate", "Night payment")
+            # Feedback for a transaction that has not arrived yet counts once it is ingested
+            engine.submit_feedback("TX-LATE-01", "escalate", "Flagged upstream")
+            self.assertEqual(dict(engine.get_feedback_adjustments()), {"VEN-OFFICE-01": -0.15, "VEN-TECH-01": 0.1})
+
+            engine.ingest({"transaction_id": "TX-LATE-01", "timestamp": "2025-11-09T10:00:00", "department_id": "DEP-EDU",
+                           "vendor_id": "VEN-PROF-02", "vendor_category": "Consulting", "amount": "700.0"})
+            self.assertEqual(engine.get_feedback_adjustments()["VEN-PROF-02"], 0.1)
+
+            # A fresh engine rebuilds the same counters from the feedback file
+            reloaded = AuditEngine(self.test_data_path, feedback_path=feedback_path)
+            self.assertEqual(dict(reloaded.get_feedback_adjustments()), {"VEN-OFFICE-01": -0.15, "VEN-TECH-01": 0.1})
+        finally:
+            for path in (feedback_path, feedback_path + ".journal"):
+                if os.path.exists(path):
+                    os.remove(path)
+
 if __name__ == "__main__":
     unittest.main()
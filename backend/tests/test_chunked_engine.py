@@ -0,0 +1,73 @@
+import sys
+import os
+import json
+import unittest
+import tempfile
+
+# Add parent directory to path to import the engines
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+from engine import AuditEngine
+from chunked_engine import ChunkedAuditEngine
+from processor import DataProcessor, CLEANED_COLUMNS
+
+LEDGERS = ["transactions_cleaned.csv", "transactions_large.csv", "transactions_fraud.csv"]
+
+
+def comparable(alerts):
+    # risk_score carries random variance, everything else must match exactly
+    return sorted(tuple(sorted((k, str(v)) for k, v in a.items() if k != 'risk_score')) for a in alerts)
+
+
+class TestChunkedEngine(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.feedback_path = os.path.join(self.tmp.name, "feedback.json")
+        with open(self.feedback_path, "w") as f:
+            json.dump([
+                {"transaction_id": "LTX-00000", "action": "escalate", "reason": "", "timestamp": "2025-11-01T10:00:00"},
+                {"transaction_id": "LTX-00001", "action": "dismiss", "reason": "", "timestamp": "2025-11-01T10:00:00"},
+            ], f)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def chunked(self, path):
+        engine = ChunkedAuditEngine(path, feedback_path=self.feedback_path, chunk_size=1000, memory_limit_mb=1)
+        # Force many small partitions so windows and duplicates cross chunk boundaries
+        engine.partition_rows = 400
+        return engine
+
+    def test_alerts_match_in_memory_engine(self):
+        for name in LEDGERS:
+            path = os.path.join(BACKEND_DIR, "data", name)
+            expected = AuditEngine(path, feedback_path=self.feedback_path).run()
+            engine = self.chunked(path)
+            actual = engine.run()
+            self.assertEqual(engine.transaction_count, len(AuditEngine(path).transactions))
+            self.assertEqual(comparable(actual), comparable(expected), name)
+            self.assertEqual([a['risk_score'] for a in actual], sorted((a['risk_score'] for a in actual), reverse=True))
+
+    def test_run_to_file_writes_json_array(self):
+        path = os.path.join(BACKEND_DIR, "data", "transactions_fraud.csv")
+        output = os.path.join(self.tmp.name, "alerts.json")
+        count = self.chunked(path).run_to_file(output)
+        with open(output) as f:
+            alerts = json.load(f)
+        self.assertEqual(len(alerts), count)
+        self.assertEqual(comparable(alerts), comparable(AuditEngine(path, feedback_path=self.feedback_path).run()))
+
+    def test_empty_ledger_keeps_previous_output(self):
+        source = os.path.join(self.tmp.name, "transactions.csv")
+        output = os.path.join(self.tmp.name, "transactions_cleaned.csv")
+        with open(source, "w") as f:
+            f.write(",".join(CLEANED_COLUMNS) + "\n")
+        with open(output, "w") as f:
+            f.write("previous ledger\n")
+        DataProcessor(source, output).process(chunk_size=100)
+        with open(output) as f:
+            self.assertEqual(f.read(), "previous ledger\n")
+
+
+if __name__ == "__main__":
+    unittest.main()
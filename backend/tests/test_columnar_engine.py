@@ -0,0 +1,51 @@
+import sys
+import os
+import json
+import unittest
+import tempfile
+
+# Add parent directory to path to import the engines
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+from engine import AuditEngine
+from columnar_engine import ColumnarAuditEngine
+
+LEDGERS = ["transactions_cleaned.csv", "transactions_large.csv", "transactions_fraud.csv"]
+
+
+def comparable(alerts):
+    # risk_score carries random variance, everything else must match exactly
+    return sorted(tuple(sorted((k, str(v)) for k, v in a.items() if k != 'risk_score')) for a in alerts)
+
+
+class TestColumnarEngine(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.feedback_path = os.path.join(self.tmp.name, "feedback.json")
+        with open(self.feedback_path, "w") as f:
+            json.dump([
+                {"transaction_id": "LTX-00000", "action": "escalate", "reason": "", "timestamp": "2025-11-01T10:00:00"},
+                {"transaction_id": "LTX-00001", "action": "dismiss", "reason": "", "timestamp": "2025-11-01T10:00:00"},
+            ], f)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_alerts_match_dict_engine(self):
+        for name in LEDGERS:
+            path = os.path.join(BACKEND_DIR, "data", name)
+            expected = AuditEngine(path, feedback_path=self.feedback_path).run()
+            actual = ColumnarAuditEngine(path, feedback_path=self.feedback_path).run()
+            self.assertEqual(comparable(actual), comparable(expected), name)
+            self.assertEqual([a['risk_score'] for a in actual], sorted((a['risk_score'] for a in actual), reverse=True))
+
+    def test_signal_maps_match_dict_engine(self):
+        path = os.path.join(BACKEND_DIR, "data", "transactions_fraud.csv")
+        expected = AuditEngine(path, feedback_path=self.feedback_path)
+        actual = ColumnarAuditEngine(path, feedback_path=self.feedback_path)
+        self.assertEqual(dict(actual.get_rules_signals()), dict(expected.get_rules_signals()))
+        self.assertEqual(dict(actual.get_probabilistic_signals()), dict(expected.get_probabilistic_signals()))
+        self.assertEqual(dict(actual.get_feedback_adjustments()), dict(expected.get_feedback_adjustments()))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import sys
+import os
+import io
+import unittest
+
+import pandas as pd
+
+# Add parent directory to path to import the reader
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+from csv_stream import CsvBatchReader, MAX_EXAMPLES
+
+
+def csv_file(text):
+    return io.BytesIO(text.encode())
+
+
+class TestCsvBatchReader(unittest.TestCase):
+    def test_batches_match_whole_file_read(self):
+        source = os.path.join(BACKEND_DIR, "demo_transactions_with_anomalies.csv")
+        expected = pd.read_csv(source, comment='#', skip_blank_lines=True)
+        expected['amount'] = pd.to_numeric(expected['amount'], errors='coerce')
+        expected = expected.dropna(subset=['amount'])
+
+        with open(source, 'rb') as f:
+            batches = list(CsvBatchReader(f, chunk_rows=1000))
+        self.assertEqual(len(batches), -(-len(expected) // 1000))
+        self.assertTrue(all(len(chunk) <= 1000 for chunk, _ in batches))
+        streamed = pd.concat([chunk for chunk, _ in batches])
+        pd.testing.assert_frame_equal(streamed.reset_index(drop=True), expected.reset_index(drop=True))
+        self.assertEqual(sum(report['rows_rejected'] for _, report in batches), 0)
+
+    def test_bad_rows_are_reported_per_batch(self):
+        text = (
+            "transaction_id,amount,department_id\n"
+            "# exported by the ERP\n"
+            "T1,10.5,D1\n"
+            "T2,abc,D1\n"
+            "\n"
+            "T3,20,D1,extra\n"
+            "T4,,D2\n"
+            "T5,30,D2\n"
+        )
+        batches = list(CsvBatchReader(csv_file(text), chunk_rows=2))
+        chunks = [chunk for chunk, _ in batches]
+        reports = [report for _, report in batches]
+
+        self.assertEqual(pd.concat(chunks)['transaction_id'].tolist(), ['T1', 'T5'])
+        self.assertEqual(pd.concat(chunks)['amount'].tolist(), [10.5, 30.0])
+        self.assertEqual(sum(r['rows_rejected'] for r in reports), 3)
+        examples = [e for r in reports for e in r['examples']]
+        self.assertIn({"reason": "invalid amount", "transaction_id": "T2", "amount": "abc"}, examples)
+        self.assertIn({"reason": "invalid amount", "transaction_id": "T4", "amount": None}, examples)
+        self.assertIn({"reason": "malformed line (4 fields)", "fields": ['T3', '20', 'D1']}, examples)
+        self.assertEqual([r['chunk'] for r in reports], list(range(len(reports))))
+
+    def test_examples_are_capped(self):
+        rows = "".join(f"T{i},n/a\n" for i in range(20))
+        (chunk, report), = CsvBatchReader(csv_file("transaction_id,amount\n" + rows), chunk_rows=100)
+        self.assertTrue(chunk.empty)
+        self.assertEqual(report['rows_rejected'], 20)
+        self.assertEqual(len(report['examples']), MAX_EXAMPLES)
+
+    def test_columns_and_rereads(self):
+        f = csv_file("transaction_id,amount,vendor_id\nT1,5,V1\n")
+        reader = CsvBatchReader(f, usecols=['amount'])
+        self.assertEqual(reader.columns(), ['transaction_id', 'amount', 'vendor_id'])
+        first = [chunk for chunk, _ in reader]
+        second = [chunk for chunk, _ in reader]
+        self.assertEqual(list(first[0].columns), ['amount'])
+        pd.testing.assert_frame_equal(first[0], second[0])
+        self.assertFalse(f.closed)
+
+    def test_empty_file(self):
+        with self.assertRaises(pd.errors.EmptyDataError):
+            CsvBatchReader(csv_file("")).columns()
+
+    def test_id_columns_keep_their_type_across_batches(self):
+        text = "transaction_id,amount,department_id,vendor_id\n1,10,101,7\n2,20,102,8\n3,30,D-3,V9\n"
+        chunks = [chunk for chunk, _ in CsvBatchReader(csv_file(text), chunk_rows=2)]
+        self.assertEqual(pd.concat(chunks)['department_id'].tolist(), ['101', '102', 'D-3'])
+        for chunk in chunks:
+            self.assertTrue(all(pd.api.types.is_string_dtype(chunk[col]) for col in ['transaction_id', 'department_id', 'vendor_id']))
+            self.assertEqual(chunk['amount'].dtype, float)
+
+    def test_long_malformed_line_with_usecols(self):
+        text = "transaction_id,amount,vendor_id\nT1,5,V1\nT2,6,V2,x,,z\nT3,7,V3\n"
+        (chunk, report), = CsvBatchReader(csv_file(text), usecols=['vendor_id', 'amount'])
+        self.assertEqual(chunk['vendor_id'].tolist(), ['V1', 'V3'])
+        self.assertEqual(report['rows_rejected'], 1)
+        self.assertEqual(report['examples'], [{"reason": "malformed line (6 fields)", "fields": ['6', 'V2', 'x']}])
+
+
+if __name__ == "__main__":
+    unittest.main()
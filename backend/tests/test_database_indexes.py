@@ -0,0 +1,93 @@
+import sys
+import os
+import asyncio
+import unittest
+
+from pymongo.errors import OperationFailure
+
+# Add parent directory to path to import the database module
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+import database
+from database import INDEX_SPECS, HOT_QUERIES, ensure_indexes, explain_hot_queries
+
+
+class FakeCollection:
+    def __init__(self, fail=()):
+        self.indexes = {}
+        self.fail = set(fail)
+
+    async def create_index(self, keys, name, **options):
+        if name in self.fail:
+            raise OperationFailure(f"cannot build {name}")
+        self.indexes.setdefault(name, (keys, options)) # existing indexes are left as they are
+        return name
+
+
+class FakeDatabase:
+    def __init__(self, plans=None, fail=()):
+        self.collections = {}
+        self.plans = plans or {}
+        self.fail = fail
+
+    def get_collection(self, name):
+        return self.collections.setdefault(name, FakeCollection(self.fail))
+
+    async def command(self, command):
+        query = command["explain"]
+        collection = query.get("find") or query.get("count")
+        return {"queryPlanner": {"winningPlan": self.plans.get(collection, {"stage": "COLLSCAN"})}}
+
+
+def query_shape(query):
+    """(equality fields, sort fields, range fields) of a HOT_QUERIES entry"""
+    filter_ = query.get("filter", query.get("query", {}))
+    equality = [f for f, v in filter_.items() if not isinstance(v, dict)]
+    sort = list(query.get("sort", {}))
+    ranges = [f for f, v in filter_.items() if isinstance(v, dict) and f not in sort] # a sort key bounds its own range
+    return equality, sort, ranges
+
+
+class TestIndexes(unittest.TestCase):
+    def test_every_hot_query_has_an_index(self):
+        # Equality fields, then the sort, then ranges must lead one index's keys
+        for name, query in HOT_QUERIES.items():
+            collection = query.get("find") or query.get("count")
+            equality, sort, ranges = query_shape(query)
+            served = False
+            for keys, _ in INDEX_SPECS[collection]:
+                fields = [field for field, _ in keys]
+                n = len(equality)
+                if set(fields[:n]) != set(equality) or fields[n:n + len(sort)] != sort:
+                    continue
+                rest = fields[n + len(sort):]
+                if all(field in rest[:len(ranges)] for field in ranges):
+                    served = True
+            self.assertTrue(served, name)
+
+    def test_ensure_indexes_is_idempotent(self):
+        db = FakeDatabase()
+        first = asyncio.run(ensure_indexes(db))
+        second = asyncio.run(ensure_indexes(db))
+        self.assertEqual(first, second)
+        self.assertEqual(set(first["alerts"]), {options["name"] for _, options in INDEX_SPECS["alerts"]})
+        self.assertEqual(db.collections["users"].indexes["email"][1], {"unique": True})
+
+    def test_unbuildable_index_does_not_stop_the_rest(self):
+        db = FakeDatabase(fail={"email"})
+        created = asyncio.run(ensure_indexes(db))
+        self.assertEqual(created["users"], [])
+        self.assertEqual(len(created["alerts"]), len(INDEX_SPECS["alerts"]))
+
+    def test_explain_flags_collscans(self):
+        ixscan = {"stage": "LIMIT", "inputStage": {"stage": "FETCH", "inputStage": {"stage": "IXSCAN", "indexName": "email"}}}
+        # Slot-based engine output wraps the tree in queryPlan
+        db = FakeDatabase(plans={"users": {"queryPlan": ixscan, "slotBasedPlan": {}}})
+        report = asyncio.run(explain_hot_queries(db))
+        self.assertEqual(report["user_by_email"], {"stages": ["LIMIT", "FETCH", "IXSCAN"], "index": "email", "collscan": False})
+        self.assertTrue(report["duplicate_check"]["collscan"])
+        self.assertIsNone(report["duplicate_check"]["index"])
+        self.assertEqual(set(report), set(HOT_QUERIES))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+import sys
+import os
+import asyncio
+import bisect
+import random
+import unittest
+from datetime import date, datetime, timedelta
+
+from fastapi import HTTPException
+from pymongo import UpdateOne
+
+# Add parent directory to path to import the rollups
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+import api
+from department_rollups import DepartmentRollups, KLL_STORED_ITEMS
+from fakes import FakeCollection, FakeDatabase
+
+
+def aggregate_departments(alerts):
+    """What the $group aggregation of /api/departments returned for these alerts"""
+    groups = {}
+    for a in alerts:
+        groups.setdefault(a["department_id"], []).append(a)
+    departments = [{
+        "_id": department,
+        "dept_name": department,
+        "flag_count": len(group),
+        "total_risk_score": sum(a["risk_score"] for a in group),
+        "avg_risk_score": sum(a["risk_score"] for a in group) / len(group),
+        "total_amount": sum(a["amount"] for a in group),
+        "vendor_count": len({a["vendor_id"] for a in group}),
+        "top_risk_vendor_score": max(a["risk_score"] for a in group),
+    } for department, group in groups.items()]
+    departments.sort(key=lambda d: d["total_risk_score"], reverse=True)
+    return departments
+
+
+class TestDepartmentRollups(unittest.TestCase):
+    def random_alerts(self, rng, n, start=datetime(2025, 1, 1)):
+        return [{
+            "vendor_id": f"V{rng.randrange(40)}",
+            "department_id": f"D{rng.randrange(5)}",
+            "amount": round(rng.uniform(100, 90000), 2),
+            "risk_score": round(rng.random(), 3),
+            "created_at": start + timedelta(hours=rng.randrange(24 * 180)),
+        } for _ in range(n)]
+
+    def rollups(self, alerts=()):
+        database = FakeDatabase()
+        rollups = DepartmentRollups(FakeCollection(database, "alerts", alerts), database.get_collection("department_days"))
+        return database, rollups
+
+    def assertSameDepartments(self, actual, expected):
+        self.assertEqual([d["_id"] for d in actual], [d["_id"] for d in expected])
+        for a, e in zip(actual, expected):
+            for field in ("total_risk_score", "avg_risk_score", "total_amount"):
+                self.assertAlmostEqual(a.pop(field), e.pop(field), places=6)
+            a.pop("amount_quartiles")
+            self.assertEqual(a, e) # vendor counts of 40 or fewer are exact
+
+    def test_matches_aggregation(self):
+        rng = random.Random(5)
+        alerts = self.random_alerts(rng, 2000)
+        _, rollups = self.rollups()
+        for i in range(0, len(alerts), 37):
+            asyncio.run(rollups.apply(alerts[i:i + 37]))
+        self.assertSameDepartments(asyncio.run(rollups.departments()), aggregate_departments(alerts))
+
+    def test_date_range_merges_its_days(self):
+        rng = random.Random(6)
+        alerts = self.random_alerts(rng, 2000)
+        _, rollups = self.rollups()
+        asyncio.run(rollups.apply(alerts))
+        start, end = date(2025, 2, 10), date(2025, 3, 31)
+        in_range = [a for a in alerts if start <= a["created_at"].date() <= end]
+        self.assertSameDepartments(asyncio.run(rollups.departments(start, end)), aggregate_departments(in_range))
+        self.assertEqual(rollups.buckets.finds[-1], {"day": {"$gte": "2025-02-10", "$lte": "2025-03-31"}})
+        # One bucket per department and day, however many alerts
+        self.assertLessEqual(len(rollups.buckets.docs), 5 * 181)
+
+    def test_amount_quartiles(self):
+        rng = random.Random(10)
+        alerts = self.random_alerts(rng, 6000)
+        _, rollups = self.rollups()
+        for i in range(0, len(alerts), 25):
+            asyncio.run(rollups.apply(alerts[i:i + 25]))
+        for d in asyncio.run(rollups.departments()):
+            amounts = sorted(a["amount"] for a in alerts if a["department_id"] == d["_id"])
+            for q, estimate in zip((0.25, 0.5, 0.75), d["amount_quartiles"]):
+                rank = bisect.bisect_right(amounts, estimate) / len(amounts)
+                self.assertLess(abs(rank - q), 0.02)
+
+    def test_read_compacts_amount_sketches(self):
+        alerts = self.random_alerts(random.Random(11), 1500)
+        for a in alerts:
+            a["department_id"], a["created_at"] = "D0", datetime(2025, 1, 1, 12) # one bucket
+        _, rollups = self.rollups()
+        for a in alerts:
+            asyncio.run(rollups.apply([a]))
+        stored = lambda: max(sum(map(len, d["amount_kll"].values())) for d in rollups.buckets.docs)
+        self.assertGreater(stored(), KLL_STORED_ITEMS)
+        first = asyncio.run(rollups.departments())
+        self.assertLessEqual(stored(), KLL_STORED_ITEMS)
+        again = asyncio.run(rollups.departments())
+        self.assertEqual(again[0]["flag_count"], first[0]["flag_count"])
+        self.assertEqual(again[0]["amount_quartiles"], first[0]["amount_quartiles"])
+
+        # A bucket written after it was read is not overwritten by a stale compaction
+        bucket = rollups.buckets.docs[0]
+        bucket["amount_n"] += 1
+        request = UpdateOne({"_id": bucket["_id"], "amount_n": bucket["amount_n"] - 1}, {"$set": {"amount_kll": {}}})
+        asyncio.run(rollups.buckets.bulk_write([request]))
+        self.assertTrue(bucket["amount_kll"])
+
+    def test_writes_compact_amount_sketches(self):
+        alerts = self.random_alerts(random.Random(12), 5000)
+        for a in alerts:
+            a["department_id"], a["created_at"] = "D0", datetime(2025, 1, 1, 12) # one bucket, never read
+        _, rollups = self.rollups()
+        stored = lambda: sum(map(len, rollups.buckets.docs[0]["amount_kll"].values()))
+        largest = 0
+        for a in alerts:
+            asyncio.run(rollups.apply([a]))
+            largest = max(largest, stored())
+        self.assertLessEqual(largest, 2 * KLL_STORED_ITEMS)
+        # The sketches are re-read only when amount_n crosses a multiple of KLL_STORED_ITEMS
+        rereads = [q for q in rollups.buckets.finds if "_id" in q]
+        self.assertEqual(len(rereads), len(alerts) // KLL_STORED_ITEMS)
+
+        amounts = sorted(a["amount"] for a in alerts)
+        for q, estimate in zip((0.25, 0.5, 0.75), asyncio.run(rollups.departments())[0]["amount_quartiles"]):
+            self.assertLess(abs(bisect.bisect_right(amounts, estimate) / len(amounts) - q), 0.02)
+
+    def test_alerts_without_date(self):
+        _, rollups = self.rollups()
+        asyncio.run(rollups.apply([{"vendor_id": "V1", "department_id": "D1", "amount": 10.0, "risk_score": 0.5}]))
+        self.assertEqual(asyncio.run(rollups.departments())[0]["flag_count"], 1)
+        self.assertEqual(asyncio.run(rollups.departments(date(2025, 1, 1))), [])
+
+    def test_rebuild(self):
+        alerts = self.random_alerts(random.Random(8), 500)
+        database, rollups = self.rollups(alerts)
+        asyncio.run(rollups.ensure())
+        self.assertNotIn("department_days_rebuild", database.collections)
+        rebuilt = DepartmentRollups(None, database.get_collection("department_days"))
+        self.assertSameDepartments(asyncio.run(rebuilt.departments()), aggregate_departments(alerts))
+
+    def test_endpoint_periods(self):
+        self.assertEqual(api.period_start("quarter", date(2025, 8, 19)), date(2025, 7, 1))
+        self.assertEqual(api.period_start("month", date(2025, 8, 19)), date(2025, 8, 1))
+        self.assertEqual(api.period_start("year", date(2025, 8, 19)), date(2025, 1, 1))
+        with self.assertRaises(HTTPException):
+            api.period_start("week", date(2025, 8, 19))
+        with self.assertRaises(HTTPException):
+            api.parse_day("last tuesday", "start_date")
+
+        saved = api.department_rollups
+        _, api.department_rollups = self.rollups()
+        try:
+            asyncio.run(api.department_rollups.apply(self.random_alerts(random.Random(9), 100)))
+            results = asyncio.run(api.get_departments(start_date="2025-01-01", end_date="2025-06-30T23:59:59"))
+            self.assertEqual(sum(r["flag_count"] for r in results), 100)
+            self.assertEqual(api.department_rollups.buckets.finds[-1], {"day": {"$gte": "2025-01-01", "$lte": "2025-06-30"}})
+        finally:
+            api.department_rollups = saved
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import sys
+import os
+import asyncio
+import unittest
+import warnings
+
+import pandas as pd
+
+# Add parent directory to path to import the executors
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+from executors import Executors
+from fraud_detector import FraudDetector
+
+ARTIFACT_PATH = os.path.join(BACKEND_DIR, "model_artifact")
+
+
+class TestExecutors(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.detector = FraudDetector(ARTIFACT_PATH)
+        cls.df = pd.read_csv(os.path.join(BACKEND_DIR, "demo_transactions_with_anomalies.csv"))
+
+    def test_process_pool_scoring_matches_detector(self):
+        executors = Executors(ARTIFACT_PATH, thread_workers=2, process_workers=2, process_min_rows=100)
+        try:
+            executors.warm()
+            actual = asyncio.run(executors.score_dataframe(self.detector, self.df))
+        finally:
+            executors.shutdown()
+        pd.testing.assert_frame_equal(actual, self.detector.predict_dataframe(self.df))
+
+    def test_small_batches_and_other_models_stay_in_threads(self):
+        executors = Executors(ARTIFACT_PATH, thread_workers=2, process_workers=2, process_min_rows=10 ** 9)
+        try:
+            actual = asyncio.run(executors.score_dataframe(self.detector, self.df.head(50)))
+            self.assertIsNone(executors._processes)
+            self.assertEqual(asyncio.run(executors.run(sum, [1, 2, 3])), 6)
+        finally:
+            executors.shutdown()
+        pd.testing.assert_frame_equal(actual, self.detector.predict_dataframe(self.df.head(50)))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import sys
+import os
+import json
+import unittest
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+# Add parent directory to path to import the journal
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from feedback_journal import FeedbackJournal
+
+
+def _append_many(path, worker, count):
+    journal = FeedbackJournal(path, compact_every=25)
+    for i in range(count):
+        journal.append({"transaction_id": f"TX-{worker}-{i}", "action": "dismiss"})
+    journal.close()
+
+
+class TestFeedbackJournal(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "auditor_feedback.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_legacy_snapshot_is_read_and_extended(self):
+        legacy = [{"transaction_id": "TX-1", "action": "dismiss", "reason": "", "timestamp": "2025-11-01T10:00:00"}]
+        with open(self.path, "w") as f:
+            json.dump(legacy, f, indent=2)
+        journal = FeedbackJournal(self.path)
+        self.assertEqual(journal.load(), legacy)
+        journal.append({"transaction_id": "TX-2", "action": "escalate"})
+        journal.close()
+
+        # The snapshot is untouched until compaction; the entry lives in the journal
+        with open(self.path) as f:
+            self.assertEqual(json.load(f), legacy)
+        entries = FeedbackJournal(self.path).load()
+        self.assertEqual([e['transaction_id'] for e in entries], ["TX-1", "TX-2"])
+
+    def test_compaction_folds_journal_into_snapshot(self):
+        journal = FeedbackJournal(self.path, compact_every=3)
+        for i in range(4):
+            journal.append({"transaction_id": f"TX-{i}", "action": "dismiss"})
+        journal.close()
+        with open(self.path) as f:
+            self.assertEqual(len(json.load(f)), 3)
+        with open(self.path + ".journal") as f:
+            self.assertEqual(len(f.readlines()), 1)
+        self.assertEqual([e['transaction_id'] for e in FeedbackJournal(self.path).load()], [f"TX-{i}" for i in range(4)])
+
+    def test_replay_skips_torn_lines_and_compacted_entries(self):
+        journal = FeedbackJournal(self.path)
+        first = journal.append({"transaction_id": "TX-1", "action": "dismiss"})
+        journal.close()
+        # Crash after the snapshot was replaced but before the journal was truncated
+        with open(self.path, "w") as f:
+            json.dump([first], f)
+        # Crash in the middle of writing a line
+        with open(self.path + ".journal", "a") as f:
+            f.write('{"transaction_id": "TX-torn"')
+
+        journal = FeedbackJournal(self.path)
+        self.assertEqual([e['transaction_id'] for e in journal.load()], ["TX-1"])
+        journal.append({"transaction_id": "TX-2", "action": "escalate"})
+        journal.close()
+        self.assertEqual([e['transaction_id'] for e in FeedbackJournal(self.path).load()], ["TX-1", "TX-2"])
+
+    def test_lines_without_entry_id_are_all_kept(self):
+        with open(self.path + ".journal", "w") as f:
+            for tx_id in ("TX-1", "TX-2", "TX-3"):
+                f.write(json.dumps({"transaction_id": tx_id, "action": "dismiss"}) + "\n")
+        journal = FeedbackJournal(self.path)
+        journal.append({"transaction_id": "TX-4", "action": "escalate"})
+        journal.close()
+        self.assertEqual([e['transaction_id'] for e in FeedbackJournal(self.path).load()], ["TX-1", "TX-2", "TX-3", "TX-4"])
+
+    def test_concurrent_writers(self):
+        journal = FeedbackJournal(self.path, compact_every=40)
+        threads = [
+            threading.Thread(target=lambda w=w: [journal.append({"transaction_id": f"T{w}-{i}"}) for i in range(50)])
+            for w in range(4)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        journal.close()
+        with ProcessPoolExecutor(max_workers=3) as pool:
+            list(pool.map(_append_many, [self.path] * 3, range(3), [60] * 3))
+
+        entries = FeedbackJournal(self.path).load()
+        self.assertEqual(len(entries), 4 * 50 + 3 * 60)
+        self.assertEqual(len({e['entry_id'] for e in entries}), len(entries))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import sys
+import os
+import pickle
+import unittest
+import warnings
+
+import numpy as np
+import pandas as pd
+
+# Add parent directory to path to import the compiler
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+from forest_compiler import CompiledIsolationForest
+from fraud_detector import FraudDetector
+
+
+class TestCompiledIsolationForest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore") # model pickled by an older scikit-learn
+            with open(os.path.join(BACKEND_DIR, "trained_model.pkl"), "rb") as f:
+                cls.forest = pickle.load(f)['iso_model']
+        cls.compiled = CompiledIsolationForest.from_forest(cls.forest)
+
+    def test_identical_to_sklearn_on_training_data(self):
+        amounts = pd.read_csv(os.path.join(BACKEND_DIR, "training_transactions.csv"))['amount'].dropna()
+        self.assertEqual(self.compiled.verify(self.forest, amounts.to_numpy()), len(amounts))
+
+    def test_identical_at_breakpoints_and_edges(self):
+        b = self.compiled.breakpoints
+        x = np.concatenate([
+            b, np.nextafter(b, np.inf), np.nextafter(b, -np.inf),
+            np.random.default_rng(0).uniform(-1e3, 1e8, 20000),
+            [0.0, -5.0, 1e30, np.inf, -np.inf, np.nan],
+        ])
+        self.compiled.verify(self.forest, x)
+
+    def test_single_value_path(self):
+        for amount in [0.0, 1500.0, 99999.99, 5000000, float('nan')]:
+            expected = self.forest.score_samples(np.array([[amount]]))[0]
+            self.assertEqual(self.compiled.score_one(amount), expected)
+            self.assertEqual(self.compiled.predict_one(amount), self.forest.predict(np.array([[amount]]))[0])
+
+    def test_detector_matches_sklearn(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            detector = FraudDetector(os.path.join(BACKEND_DIR, "trained_model.pkl"))
+        for amount in [250.0, 5000000.0]:
+            result = detector.predict_single({"amount": amount, "department_id": "Ministry of Health"})
+            anomaly = self.forest.predict(np.array([[amount]]))[0] == -1
+            self.assertEqual(result['ml_flag'], "ANOMALY" if anomaly else "NORMAL")
+
+    def test_rejects_multi_feature_forest(self):
+        from sklearn.ensemble import IsolationForest
+        forest = IsolationForest(n_estimators=5, random_state=0).fit(np.random.default_rng(0).normal(size=(50, 2)))
+        with self.assertRaises(ValueError):
+            CompiledIsolationForest.from_forest(forest)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import sys
+import os
+import unittest
+import warnings
+
+import pandas as pd
+
+# Add parent directory to path to import the detector
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+from fraud_detector import FraudDetector, RESULT_COLUMNS
+
+
+def row_by_row(detector, df):
+    # The pre-batch implementation of predict_dataframe
+    return pd.DataFrame([detector.predict_single(row.to_dict()) for _, row in df.iterrows()])
+
+
+class TestPredictDataframe(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore") # model pickled by an older scikit-learn
+            cls.detector = FraudDetector(os.path.join(BACKEND_DIR, "trained_model.pkl"))
+        if not cls.detector.model_loaded:
+            raise unittest.SkipTest("trained_model.pkl could not be loaded")
+
+    def assertMatchesPredictSingle(self, df):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore") # predict_single passes unnamed features
+            expected = row_by_row(self.detector, df)
+        actual = self.detector.predict_dataframe(df)
+        pd.testing.assert_frame_equal(actual, expected)
+
+    def test_matches_predict_single_on_ledger(self):
+        df = pd.read_csv(os.path.join(BACKEND_DIR, "demo_transactions_with_anomalies.csv"))
+        # Every 8th row keeps the per-row reference fast and still covers every risk level
+        sample = df.iloc[::8].reset_index(drop=True)
+        self.assertEqual(set(self.detector.predict_dataframe(sample)['risk_level']), {"CRITICAL", "HIGH", "MEDIUM", "LOW", "MINIMAL"})
+        self.assertMatchesPredictSingle(sample)
+
+    def test_matches_predict_single_on_edge_cases(self):
+        df = pd.DataFrame([
+            {"transaction_id": "T1", "timestamp": "2025-01-10T02:00:00", "department_id": "Dept of Education", "vendor_id": "V1", "amount": 5000000.0},
+            {"transaction_id": "T2", "timestamp": "2025-01-11 10:00:00", "department_id": "Ministry of Health", "vendor_id": "V2", "amount": 3000.0},
+            {"transaction_id": "T3", "timestamp": "2025-01-10T23:15:00Z", "department_id": "DEPT-UNKNOWN", "vendor_id": "V3", "amount": 120.5},
+            {"transaction_id": "T4", "timestamp": "2025-01-10T05:59:59.123456+05:30", "department_id": "Transport Authority", "vendor_id": "V4", "amount": 88000.0},
+            {"transaction_id": "T5", "timestamp": None, "department_id": "Transport Authority", "vendor_id": None, "amount": 1000.0},
+            {"transaction_id": "T6", "timestamp": "", "department_id": None, "vendor_id": "V6", "amount": 2500000.0},
+            {"transaction_id": "T7", "timestamp": "not a date", "department_id": "IT Services Division", "vendor_id": "V7", "amount": 42.0},
+            {"transaction_id": "T8", "timestamp": "2025-02-30T03:00:00", "department_id": "IT Services Division", "vendor_id": "V8", "amount": 42.0},
+            {"transaction_id": "T9", "timestamp": "2025-01-12", "department_id": "Urban Development Board", "vendor_id": "V9", "amount": 7000.0},
+            {"transaction_id": "T10", "timestamp": "20250110T230000", "department_id": "Dept of Public Works", "vendor_id": "V10", "amount": 0.0},
+        ])
+        self.assertMatchesPredictSingle(df)
+        self.assertMatchesPredictSingle(df.astype(object))
+
+    def test_predict_batch_matches_predict_single(self):
+        df = pd.read_csv(os.path.join(BACKEND_DIR, "demo_transactions_with_anomalies.csv")).iloc[::8]
+        transactions = [
+            {k: row[k] for k in ["transaction_id", "amount", "department_id", "vendor_id", "timestamp"]}
+            for row in df.to_dict('records')
+        ]
+        transactions += [
+            {"transaction_id": "T1", "amount": 5000000, "department_id": "DEPT-UNKNOWN", "vendor_id": "V1", "timestamp": None},
+            {"amount": 2000.0, "timestamp": "2025-01-11T10:00:00Z"},
+        ]
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            expected = [self.detector.predict_single(tx) for tx in transactions]
+        self.assertEqual(self.detector.predict_batch(transactions), expected)
+
+    def test_missing_optional_columns(self):
+        df = pd.DataFrame({"amount": [150.0, 9000000.0]})
+        self.assertMatchesPredictSingle(df)
+
+    def test_empty_frame_keeps_result_columns(self):
+        result = self.detector.predict_dataframe(pd.DataFrame(columns=["transaction_id", "amount"]))
+        self.assertEqual(list(result.columns), RESULT_COLUMNS)
+        self.assertEqual(len(result), 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import sys
+import os
+import asyncio
+import threading
+import time
+import unittest
+
+# Add parent directory to path to import the batcher
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+from micro_batcher import MicroBatcher
+
+
+class TestMicroBatcher(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+
+    def score(self, items):
+        self.calls.append(list(items))
+        return [item * 10 for item in items]
+
+    def test_concurrent_requests_share_a_batch(self):
+        batcher = MicroBatcher(self.score, max_batch_size=64, max_wait_ms=5)
+
+        async def run():
+            return await asyncio.gather(*(batcher.submit(i) for i in range(10)))
+
+        self.assertEqual(asyncio.run(run()), [i * 10 for i in range(10)])
+        self.assertEqual(self.calls, [list(range(10))])
+        metrics = batcher.metrics()
+        self.assertEqual((metrics["batches"], metrics["items"], metrics["flushes_timer"]), (1, 10, 1))
+        self.assertEqual(metrics["queue_depth"], 0)
+        self.assertEqual(metrics["max_queue_depth"], 10)
+        self.assertEqual(metrics["batch_size_histogram"]["16"], 1)
+
+    def test_full_batches_flush_without_waiting(self):
+        batcher = MicroBatcher(self.score, max_batch_size=4, max_wait_ms=10000)
+
+        async def run():
+            return await asyncio.wait_for(asyncio.gather(*(batcher.submit(i) for i in range(8))), timeout=5)
+
+        self.assertEqual(asyncio.run(run()), [i * 10 for i in range(8)])
+        self.assertEqual(self.calls, [[0, 1, 2, 3], [4, 5, 6, 7]])
+        self.assertEqual(batcher.metrics()["flushes_full"], 2)
+
+    def test_errors_reach_every_request_in_the_batch(self):
+        def fail(items):
+            raise ValueError("model unavailable")
+        batcher = MicroBatcher(fail, max_batch_size=8, max_wait_ms=1)
+
+        async def run():
+            return await asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True)
+
+        results = asyncio.run(run())
+        self.assertTrue(all(isinstance(r, ValueError) for r in results))
+        self.assertEqual(batcher.metrics()["errors"], 1)
+
+    def test_scoring_runs_off_the_event_loop(self):
+        scored_on = []
+        def slow(items):
+            scored_on.append(threading.current_thread())
+            time.sleep(0.2)
+            return items
+        batcher = MicroBatcher(slow, max_batch_size=8, max_wait_ms=1)
+
+        async def run():
+            ticks = 0
+            request = asyncio.ensure_future(batcher.submit(1))
+            while not request.done():
+                ticks += 1
+                await asyncio.sleep(0.01)
+            return await request, ticks
+
+        result, ticks = asyncio.run(run())
+        self.assertEqual(result, 1)
+        self.assertIsNot(scored_on[0], threading.main_thread())
+        self.assertGreater(ticks, 5) # the loop kept running while the batch scored
+        self.assertEqual(batcher.metrics()["batches_in_flight"], 0)
+
+    def test_custom_runner(self):
+        runs = []
+        async def run_inline(fn, *args):
+            runs.append(fn)
+            return fn(*args)
+        batcher = MicroBatcher(self.score, max_batch_size=2, max_wait_ms=1, run=run_inline)
+
+        async def run():
+            return await asyncio.gather(*(batcher.submit(i) for i in range(3)))
+
+        self.assertEqual(asyncio.run(run()), [0, 10, 20])
+        self.assertEqual(runs, [self.score, self.score])
+
+if __name__ == "__main__":
+    unittest.main()
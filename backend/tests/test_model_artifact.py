@@ -0,0 +1,70 @@
+import sys
+import os
+import json
+import unittest
+import tempfile
+import warnings
+
+import pandas as pd
+
+# Add parent directory to path to import the detector
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+from fraud_detector import FraudDetector
+from model_artifact import export_pickle, load_artifact, ArtifactError, MANIFEST
+
+PICKLE_PATH = os.path.join(BACKEND_DIR, "trained_model.pkl")
+
+
+class TestModelArtifact(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore") # model pickled by an older scikit-learn
+            cls.pickled = FraudDetector(PICKLE_PATH)
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "model")
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            self.manifest = export_pickle(PICKLE_PATH, self.path)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_predictions_match_pickle(self):
+        detector = FraudDetector(self.path)
+        df = pd.read_csv(os.path.join(BACKEND_DIR, "demo_transactions_with_anomalies.csv"))
+        pd.testing.assert_frame_equal(detector.predict_dataframe(df), self.pickled.predict_dataframe(df))
+        tx = {"transaction_id": "T1", "amount": 5000000, "department_id": "Ministry of Health", "timestamp": "2025-01-10T02:00:00"}
+        self.assertEqual(detector.predict_single(tx), self.pickled.predict_single(tx))
+        self.assertEqual(detector.get_model_info()['model_version'], self.manifest['model_version'])
+        self.assertEqual(detector.get_model_info()['contamination'], 0.05)
+
+    def test_lazy_load_on_first_use(self):
+        detector = FraudDetector(self.path, lazy=True)
+        self.assertIsNone(detector.dept_stats)
+        self.assertTrue(detector.predict_single({"amount": 100.0})['risk_level'])
+        self.assertIsNotNone(detector.dept_stats)
+
+    def test_checksum_mismatch_is_rejected(self):
+        with open(os.path.join(self.path, "scores.npy"), "r+b") as f:
+            f.seek(-1, os.SEEK_END)
+            f.write(b"\x01")
+        with self.assertRaises(ArtifactError):
+            load_artifact(self.path)
+        self.assertFalse(FraudDetector(self.path).model_loaded)
+
+    def test_unknown_format_is_rejected(self):
+        manifest_path = os.path.join(self.path, MANIFEST)
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        manifest['format_version'] = 99
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f)
+        with self.assertRaises(ArtifactError):
+            load_artifact(self.path)
+
+if __name__ == "__main__":
+    unittest.main()
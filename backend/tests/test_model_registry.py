@@ -0,0 +1,66 @@
+import sys
+import os
+import unittest
+import tempfile
+import warnings
+
+# Add parent directory to path to import the registry
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+import fraud_detector
+from fraud_detector import get_detector, reload_detector
+from model_registry import ModelRegistry
+
+PICKLE_PATH = os.path.join(BACKEND_DIR, "trained_model.pkl")
+ARTIFACT_PATH = os.path.join(BACKEND_DIR, "model_artifact")
+
+
+class TestModelRegistry(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.registry = ModelRegistry(os.path.join(self.tmp.name, "models"))
+        self.saved_instance = fraud_detector._detector_instance
+
+    def tearDown(self):
+        fraud_detector._detector_instance = self.saved_instance
+        self.tmp.cleanup()
+
+    def test_publish_and_activate(self):
+        self.assertIsNone(self.registry.active_path())
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore") # model pickled by an older scikit-learn
+            self.registry.publish(PICKLE_PATH, version="v1")
+        self.registry.publish(ARTIFACT_PATH, version="v2", activate=True)
+        self.assertEqual(sorted(v["version"] for v in self.registry.versions()), ["v1", "v2"])
+        self.assertEqual(self.registry.active_version(), "v2")
+        self.registry.activate("v1")
+        self.assertEqual(self.registry.active_path(), os.path.join(self.registry.root, "v1"))
+
+    def test_rejects_unknown_and_duplicate_versions(self):
+        self.registry.publish(ARTIFACT_PATH, version="v1")
+        with self.assertRaises(ValueError):
+            self.registry.publish(ARTIFACT_PATH, version="v1")
+        for version in ["v9", "../models", ""]:
+            with self.assertRaises(KeyError):
+                self.registry.activate(version)
+        self.assertEqual(len(os.listdir(self.registry.root)), 1) # no staging leftovers
+
+    def test_reload_swaps_singleton(self):
+        old = get_detector()
+        version = self.registry.publish(ARTIFACT_PATH, version="v2")
+        new = reload_detector(self.registry.path(version))
+        self.assertIs(get_detector(), new)
+        self.assertIsNot(new, old)
+        self.assertEqual(new.get_model_info()["model_version"], "3111ad6e2684")
+        self.assertIsNotNone(new.get_model_info()["loaded_at"])
+        # A request that already held the old detector finishes on it
+        self.assertIn("risk_score", old.predict_single({"amount": 2500.0}))
+
+    def test_failed_reload_keeps_current_model(self):
+        current = get_detector()
+        with self.assertRaises(RuntimeError):
+            reload_detector(os.path.join(self.tmp.name, "missing"))
+        self.assertIs(get_detector(), current)
+
+if __name__ == "__main__":
+    unittest.main()
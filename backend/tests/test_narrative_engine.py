@@ -0,0 +1,81 @@
+import sys
+import os
+import unittest
+
+import numpy as np
+import pandas as pd
+
+# Add parent directory to path to import the engine
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+from narrative_engine import NarrativeEngine, NarrativeContext
+
+
+def filtered_context(transaction, df):
+    """Narrative context sentences the way they were built by filtering the frame per row"""
+    parts = []
+    amount, vendor, dept = transaction['amount'], transaction['vendor_id'], transaction['department_id']
+    vendor_count = len(df[df['vendor_id'] == vendor])
+    dept_txs = df[df['department_id'] == dept]
+    if not dept_txs.empty:
+        avg_amt = dept_txs['amount'].mean()
+        if amount > avg_amt * 2:
+            parts.append(f"The transaction value (₹{amount:,.2f}) is {amount/avg_amt:.1f}x higher than the {dept} average (₹{avg_amt:,.2f}).")
+    if vendor_count > 1:
+        parts.append(f"This vendor has {vendor_count} transactions in the current batch.")
+    return parts
+
+
+class TestNarrativeEngine(unittest.TestCase):
+    def setUp(self):
+        self.engine = NarrativeEngine()
+        rng = np.random.default_rng(7)
+        n = 3000
+        self.df = pd.DataFrame({
+            'transaction_id': [f"T{i}" for i in range(n)],
+            'amount': np.round(rng.lognormal(8, 1.2, n), 2),
+            'department_id': rng.choice([f"D{i:03d}" for i in range(12)], n),
+            'vendor_id': rng.choice([f"V{i:03d}" for i in range(400)], n),
+        })
+        self.results = [
+            dict(row, risk_score=float(score), reasons=["Round amount"] if i % 3 == 0 else [])
+            for i, (row, score) in enumerate(zip(self.df.to_dict('records'), rng.uniform(0.4, 1.0, n)))
+        ]
+
+    def test_batch_matches_per_row_filtering(self):
+        narratives = self.engine.generate_narratives(self.results, NarrativeContext.from_frame(self.df))
+        no_context = self.engine.generate_narratives(self.results)
+        compared = 0
+        for result, narrative, plain in zip(self.results[::7], narratives[::7], no_context[::7]):
+            if result['risk_score'] <= 0.5:
+                self.assertEqual(narrative, plain)
+                continue
+            # The context sentences go right after the severity intro
+            intro, rest = plain.split(". ", 1)
+            expected = " ".join([intro + "."] + filtered_context(result, self.df) + [rest])
+            self.assertEqual(narrative, expected)
+            compared += 1
+        self.assertGreater(compared, 100)
+
+    def test_single_and_chunked_contexts_agree(self):
+        chunked = NarrativeContext()
+        for start in range(0, len(self.df), 700):
+            chunked.add(self.df.iloc[start:start + 700])
+        whole = NarrativeContext.from_frame(self.df)
+        self.assertEqual(chunked.rows, len(self.df))
+        self.assertEqual(self.engine.generate_narratives(self.results, chunked),
+                         self.engine.generate_narratives(self.results, whole))
+        for result in self.results[:50]:
+            self.assertEqual(self.engine.generate_narrative(result, self.df),
+                             self.engine.generate_narratives([result], whole)[0])
+
+    def test_unknown_keys_and_empty_context(self):
+        context = NarrativeContext.from_frame(self.df)
+        self.assertEqual(context.vendor_count("V-missing"), 0)
+        self.assertIsNone(context.department_mean("D-missing"))
+        result = dict(self.results[0], risk_score=0.9)
+        self.assertEqual(self.engine.generate_narratives([result], NarrativeContext()),
+                         [self.engine.generate_narrative(result, None)])
+
+if __name__ == "__main__":
+    unittest.main()
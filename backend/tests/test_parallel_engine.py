@@ -0,0 +1,31 @@
+import sys
+import os
+import unittest
+
+# Add parent directory to path to import the engines
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+from engine import AuditEngine
+from parallel_engine import ParallelAuditEngine
+
+LEDGERS = ["transactions_cleaned.csv", "transactions_large.csv", "transactions_fraud.csv"]
+
+
+class TestParallelEngine(unittest.TestCase):
+    def test_signal_maps_match_single_core(self):
+        for name in LEDGERS:
+            path = os.path.join(BACKEND_DIR, "data", name)
+            expected = AuditEngine(path)
+            for workers in (1, 2):
+                rules, prob = ParallelAuditEngine(path, workers=workers).get_signal_maps()
+                self.assertEqual(dict(rules), dict(expected.get_rules_signals()), name)
+                self.assertEqual(dict(prob), dict(expected.get_probabilistic_signals()), name)
+
+    def test_run_flags_the_same_transactions(self):
+        path = os.path.join(BACKEND_DIR, "data", "transactions_fraud.csv")
+        expected = {a['transaction_id']: a['explanation'] for a in AuditEngine(path).run()}
+        actual = {a['transaction_id']: a['explanation'] for a in ParallelAuditEngine(path, workers=2).run()}
+        self.assertEqual(actual, expected)
+
+if __name__ == "__main__":
+    unittest.main()
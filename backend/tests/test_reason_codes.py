@@ -0,0 +1,79 @@
+import sys
+import os
+import unittest
+
+# Add parent directory to path to import the codes
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+from reason_codes import (reason, render_reason, render_reasons, Z_EXTREME, Z_SIGNIFICANT, IQR_OUTLIER,
+                          ML_ANOMALY, WEEKEND, OFF_HOURS, ROUND_AMOUNT, DEPT_MULTIPLE, VENDOR_BATCH,
+                          REPEAT_OFFENDER, ESCALATING, DUPLICATE_PAYMENT)
+from narrative_engine import NarrativeEngine, REASON_SENTENCES, _reason_sentence, render_explanation
+
+
+class TestReasonCodes(unittest.TestCase):
+    def test_render_matches_detector_text(self):
+        self.assertEqual(render_reasons([
+            reason(Z_EXTREME, z=3.4567),
+            reason(Z_SIGNIFICANT, z=-2.5),
+            reason(IQR_OUTLIER),
+            reason(ML_ANOMALY, score=-0.61234),
+            reason(WEEKEND, weekday=6),
+            reason(OFF_HOURS, hour=2, minute=5),
+            reason(ROUND_AMOUNT),
+        ]), [
+            "Extreme deviation from department average (z-score: 3.46)",
+            "Significant deviation from department average (z-score: -2.50)",
+            "Amount outside normal IQR range for this department",
+            "ML model detected rare statistical pattern (anomaly score: -0.612)",
+            "Transaction on Sunday (weekend)",
+            "Transaction at 02:05 (outside business hours)",
+            "Suspiciously round amount (multiple of ₹1,000)",
+        ])
+        self.assertEqual(render_reasons(None), [])
+
+    def test_narrative_sentences_match_text_scan(self):
+        # Each code adds the sentence the narrative used to find in its text
+        examples = [reason(Z_EXTREME, z=4.0), reason(Z_SIGNIFICANT, z=2.2), reason(IQR_OUTLIER),
+                    reason(ML_ANOMALY, score=-0.7), reason(WEEKEND, weekday=5),
+                    reason(OFF_HOURS, hour=23, minute=59), reason(ROUND_AMOUNT)]
+        for code in examples:
+            self.assertEqual(REASON_SENTENCES.get(code['code']), _reason_sentence(render_reason(code)), code)
+
+    def test_stored_codes_render_like_text_reasons(self):
+        engine = NarrativeEngine()
+        codes = [reason(ML_ANOMALY, score=-0.7), reason(WEEKEND, weekday=5), reason(ROUND_AMOUNT)]
+        doc = {"risk_score": 0.9, "amount": 50000.0, "vendor_id": "V1", "department_id": "D1",
+               "reason_codes": codes,
+               "narrative_codes": [reason(DEPT_MULTIPLE, average=12000.0), reason(VENDOR_BATCH, count=4)]}
+        legacy = dict(doc, reasons=render_reasons(codes))
+        del legacy['reason_codes']
+        self.assertEqual(render_explanation(doc), engine.render(legacy))
+        self.assertEqual(render_explanation(doc), (
+            "CRITICAL ALERT: High-confidence anomaly detected for V1. "
+            "The transaction value (₹50,000.00) is 4.2x higher than the D1 average (₹12,000.00). "
+            "This vendor has 4 transactions in the current batch. "
+            "Statistical tests indicate the amount may be fabricated (Benford's Law violation). "
+            "The timestamp indicates processing outside standard business hours (Weekend/Night). "
+            "The round invoice amount is suspicious and warrants invoice verification. "
+            "Recommended Action: Audit invoice content and verify vendor contract terms."))
+
+    def test_history_and_duplicate_codes(self):
+        doc = {"risk_score": 0.3, "vendor_id": "V1", "reason_codes": [],
+               "narrative_codes": [reason(REPEAT_OFFENDER, flags=2, boost=20), reason(ESCALATING)]}
+        self.assertEqual(render_explanation(doc), (
+            "🚨 ESCALATING RISK: Vendor risk trajectory is increasing rapidly. "
+            "⚠️ Repeat Offender (2 prior flags). Routine transaction. No significant anomalies detected. "
+            "[Score boosted +20 due to 2 previous flags]"))
+        duplicate = {"risk_score": 1.0, "reason_codes": [],
+                     "narrative_codes": [reason(DUPLICATE_PAYMENT, amount=150.0, transaction_id="T1")]}
+        self.assertEqual(render_explanation(duplicate),
+                         "🚨 DUPLICATE PAYMENT DETECTED. Identical amount (₹150.0) paid to this vendor recently (ID: T1).")
+
+    def test_legacy_documents(self):
+        self.assertEqual(render_explanation({"explanation": "stored text", "reason_codes": []}), "stored text")
+        self.assertEqual(render_explanation({"reasons": ["a", "b"]}), "a | b")
+        self.assertEqual(render_explanation({}), "")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import sys
+import os
+import random
+import unittest
+
+import numpy as np
+
+# Add parent directory to path to import the sketches
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+from sketches import HyperLogLog, KllSketch, hll_register
+
+
+class TestHyperLogLog(unittest.TestCase):
+    def test_small_counts_are_exact(self):
+        for n in (0, 1, 7, 30):
+            self.assertEqual(HyperLogLog().update(f"V{i}" for i in range(n)).count(), n)
+
+    def test_large_counts_within_error(self):
+        # 1.6% standard error at the default precision; allow 4 sigma
+        for n in (5000, 50000):
+            estimate = HyperLogLog().update(f"V{i}" for i in range(n)).count()
+            self.assertLess(abs(estimate - n) / n, 0.065, n)
+
+    def test_duplicates_do_not_count(self):
+        sketch = HyperLogLog().update(["V1", "V2"] * 500)
+        self.assertEqual(sketch.count(), 2)
+
+    def test_merge_is_the_union(self):
+        a = HyperLogLog().update(f"V{i}" for i in range(0, 3000))
+        b = HyperLogLog().update(f"V{i}" for i in range(2000, 5000))
+        union = HyperLogLog().update(f"V{i}" for i in range(0, 5000))
+        self.assertEqual(a.merge(b).registers, union.registers)
+
+    def test_document_round_trip(self):
+        sketch = HyperLogLog().update(f"V{i}" for i in range(200))
+        document = sketch.to_document()
+        self.assertTrue(all(isinstance(k, str) and v > 0 for k, v in document.items()))
+        self.assertEqual(HyperLogLog.from_document(document).registers, sketch.registers)
+
+    def test_registers_are_stable(self):
+        # Stored sketches are written by many processes; the hash must not vary per process
+        self.assertEqual(hll_register("V-1001"), hll_register("V-1001"))
+        index, rank = hll_register(12345, precision=10)
+        self.assertTrue(0 <= index < 1024 and 1 <= rank <= 55)
+
+    def test_precision_mismatch(self):
+        with self.assertRaises(ValueError):
+            HyperLogLog(12).merge(HyperLogLog(10))
+
+
+class TestKllSketch(unittest.TestCase):
+    def rank_errors(self, sketch, values, qs=np.linspace(0.01, 0.99, 99)):
+        ordered = np.sort(values)
+        ranks = np.searchsorted(ordered, sketch.quantiles(qs), side="right") / len(ordered)
+        return np.abs(ranks - qs)
+
+    def test_exact_below_k(self):
+        values = [random.Random(0).uniform(0, 100) for _ in range(150)]
+        sketch = KllSketch().update_many(values)
+        self.assertEqual(sketch.count(), 150)
+        self.assertEqual(sketch.quantiles([0, 0.5, 1]), [min(values), sorted(values)[74], max(values)])
+
+    def test_rank_error_and_bounded_size(self):
+        values = np.random.default_rng(1).lognormal(8, 1.2, 200000)
+        sketch = KllSketch().update_many(values)
+        self.assertEqual(sketch.count(), len(values))
+        self.assertLess(sum(map(len, sketch.levels)), 3 * sketch.k + 50)
+        self.assertLess(self.rank_errors(sketch, values).max(), 0.015)
+
+    def test_merge_across_buckets(self):
+        values = np.random.default_rng(2).exponential(5000, 100000)
+        merged = KllSketch()
+        for i, part in enumerate(np.array_split(values, 365)):
+            merged.merge_document(KllSketch(seed=i).update_many(part).to_document())
+        self.assertEqual(merged.count(), len(values))
+        self.assertLess(self.rank_errors(merged, values).max(), 0.015)
+
+    def test_document_round_trip(self):
+        sketch = KllSketch().update_many(range(5000))
+        document = sketch.to_document()
+        self.assertTrue(all(isinstance(level, str) for level in document))
+        self.assertEqual(KllSketch.from_document(document).levels, sketch.levels)
+
+    def test_empty_and_mismatch(self):
+        self.assertEqual(KllSketch().quantiles([0.25, 0.75]), [None, None])
+        self.assertEqual(KllSketch.from_document({}).count(), 0)
+        with self.assertRaises(ValueError):
+            KllSketch(200).merge(KllSketch(100))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import sys
+import os
+import asyncio
+import io
+import shutil
+import tempfile
+import unittest
+
+import pandas as pd
+
+# Add parent directory to path to import the API
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+from fastapi import HTTPException, UploadFile
+
+import api
+from jobs import JobStore, COMPLETED, FAILED
+from vendor_rollups import VendorRollups
+from department_rollups import DepartmentRollups
+from narrative_engine import NarrativeContext, render_explanation
+from reason_codes import render_reasons
+from fakes import FakeCollection
+
+
+class TestUploadJobs(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.saved = (api.transactions_collection, api.alerts_collection, api.upload_jobs, api.UPLOAD_CHUNK_ROWS, api.vendor_rollups, api.department_rollups)
+        api.transactions_collection = FakeCollection()
+        api.alerts_collection = FakeCollection()
+        api.upload_jobs = JobStore()
+        api.UPLOAD_CHUNK_ROWS = 1000
+        api.vendor_rollups = VendorRollups(api.alerts_collection, FakeCollection())
+        api.department_rollups = DepartmentRollups(api.alerts_collection, FakeCollection())
+
+    def tearDown(self):
+        api.transactions_collection, api.alerts_collection, api.upload_jobs, api.UPLOAD_CHUNK_ROWS, api.vendor_rollups, api.department_rollups = self.saved
+        self.tmp.cleanup()
+
+    def run_job(self, source):
+        path = os.path.join(self.tmp.name, "upload.csv")
+        shutil.copy(source, path)
+
+        async def run():
+            job = api.upload_jobs.create("upload.csv")
+            await api.upload_jobs.launch(job, lambda job: api.run_upload_job(job, path))
+            return await api.upload_jobs.get(job.id)
+
+        return asyncio.run(run()), path
+
+    def test_job_matches_inline_upload(self):
+        source = os.path.join(BACKEND_DIR, "demo_transactions_with_anomalies.csv")
+        progress, path = self.run_job(source)
+        self.assertEqual(progress['status'], COMPLETED, progress['error'])
+        self.assertFalse(os.path.exists(path)) # spooled upload is removed
+
+        df = pd.read_csv(source, comment='#', skip_blank_lines=True)
+        df['amount'] = pd.to_numeric(df['amount'], errors='coerce')
+        df = df.dropna(subset=['amount'])
+        expected = api.get_detector().predict_dataframe(df)
+        summary = progress['summary']
+        self.assertEqual(progress['rows_processed'], len(df))
+        self.assertEqual(progress['chunks_processed'], 5)
+        self.assertEqual(summary['total_transactions'], len(df))
+        self.assertEqual(summary['fraudulent_transactions'], int(expected['is_fraud'].sum()))
+        self.assertEqual(summary['high_risk_count'], int(expected['risk_level'].isin(['CRITICAL', 'HIGH']).sum()))
+        self.assertEqual(len(summary['results']), 50)
+        self.assertEqual(summary['results'][0]['risk_score'], expected['risk_score'].max())
+
+        # Narratives use the whole file as context, as the inline upload does
+        # Documents store codes only; their text renders as the narrative did
+        results = api.build_upload_results(expected, NarrativeContext.from_frame(df))
+        narratives = api.narrative_engine.generate_narratives(results, NarrativeContext.from_frame(df))
+        inline = {r['transaction_id']: text for r, text in zip(results, narratives)}
+        stored = {r['transaction_id']: render_explanation(r) for r in api.transactions_collection.docs}
+        self.assertEqual(stored, inline)
+        self.assertFalse(any('explanation' in r or 'reasons' in r for r in api.alerts_collection.docs))
+        top = summary['results'][0]
+        self.assertEqual(top['explanation'], inline[top['transaction_id']])
+        self.assertEqual(top['reasons'], render_reasons(top['reason_codes']))
+        self.assertEqual(len(api.alerts_collection.docs), len(df))
+        self.assertEqual(sum(d['flag_count'] for d in api.vendor_rollups.rollups.docs), len(df))
+        self.assertEqual(sum(d['flag_count'] for d in api.department_rollups.buckets.docs), len(df))
+
+    def test_failed_job_reports_error(self):
+        path = os.path.join(self.tmp.name, "bad.csv")
+        with open(path, "w") as f:
+            f.write("transaction_id,department_id,vendor_id\nT1,D1,V1\n")
+        progress, _ = self.run_job(path)
+        self.assertEqual(progress['status'], FAILED)
+        self.assertIn("amount", progress['error'])
+
+    def upload_inline(self, text):
+        upload = UploadFile(file=io.BytesIO(text.encode()), filename="upload.csv")
+        return asyncio.run(api.upload_csv(upload))
+
+    def test_inline_upload_reports_rejected_rows(self):
+        rows = [f"T{i},{100 + i},D001,V{i % 7:03d}" for i in range(2500)]
+        rows[10] = "T10,not-a-number,D001,V003"
+        rows[1500] = "T1500,250.0,D001,V003,extra,fields"
+        summary = self.upload_inline("transaction_id,amount,department_id,vendor_id\n" + "\n".join(rows) + "\n")
+
+        self.assertEqual(summary['total_transactions'], 2498)
+        self.assertEqual(summary['rows_rejected'], 2)
+        self.assertEqual([r['chunk'] for r in summary['rejected_by_chunk']], [0, 1])
+        self.assertEqual(summary['rejected_by_chunk'][0]['examples'][0]['transaction_id'], "T10")
+        self.assertEqual(summary['rejected_by_chunk'][1]['examples'][0]['reason'], "malformed line (6 fields)")
+        self.assertEqual(len(api.transactions_collection.docs), 2498)
+        self.assertEqual(len(api.alerts_collection.docs), 2498)
+
+    def test_inline_upload_checks_header(self):
+        with self.assertRaises(HTTPException) as missing:
+            self.upload_inline("transaction_id,department_id,vendor_id\nT1,D1,V1\n")
+        self.assertEqual(missing.exception.status_code, 400)
+        with self.assertRaises(HTTPException) as empty:
+            self.upload_inline("")
+        self.assertEqual(empty.exception.status_code, 400)
+
+    def test_finished_jobs_are_evicted(self):
+        store = JobStore(FakeCollection(), max_finished=2)
+
+        async def done(job):
+            job.complete({})
+
+        async def broken(job):
+            raise ValueError("bad file")
+
+        async def run():
+            jobs = [store.create(f"upload-{i}.csv") for i in range(3)]
+            for job, work in zip(jobs, [done, broken, done]):
+                await store.launch(job, work)
+            return jobs, [await store.get(job.id) for job in jobs]
+
+        jobs, progress = asyncio.run(run())
+        self.assertEqual([p['status'] for p in progress], [COMPLETED, FAILED, COMPLETED])
+        self.assertEqual(list(store.jobs), [jobs[1].id, jobs[2].id])
+        self.assertEqual(store._last_persist, {})
+        # The evicted job still answers from the collection
+        self.assertEqual(progress[0]['filename'], "upload-0.csv")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+import sys
+import os
+import asyncio
+import random
+import unittest
+from datetime import datetime, timedelta
+
+# Add parent directory to path to import the rollups
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+from vendor_rollups import VendorRollups, RECENT_SCORES, RECENT_REASONS
+from narrative_engine import render_explanation
+from fakes import FakeCollection, FakeDatabase
+from reason_codes import reason, Z_EXTREME, ROUND_AMOUNT
+
+
+def aggregate_entities(alerts):
+    """What the $group aggregation of /api/entities returned for these alerts"""
+    groups = {}
+    for a in sorted(alerts, key=lambda a: a["created_at"], reverse=True):
+        g = groups.setdefault(a["vendor_id"], {"_id": a["vendor_id"], "category": a.get("vendor_category"), "alerts": []})
+        g["alerts"].append(a)
+    entities = []
+    for g in groups.values():
+        scores = [a["risk_score"] for a in g["alerts"]]
+        entities.append({
+            "_id": g["_id"],
+            "category": g["category"],
+            "flag_count": len(g["alerts"]),
+            "total_risk_score": sum(scores),
+            "max_risk_score": max(scores),
+            "total_amount": sum(a["amount"] for a in g["alerts"]),
+            "last_flagged": max(a["created_at"] for a in g["alerts"]),
+            "departments": {a["department_id"] for a in g["alerts"]},
+            "recent_scores": scores[:10],
+            "recent_reasons": [render_explanation(a) for a in g["alerts"][:3]],
+        })
+    entities.sort(key=lambda e: (e["max_risk_score"], e["flag_count"]), reverse=True)
+    return entities
+
+
+class TestVendorRollups(unittest.TestCase):
+    def random_alerts(self, rng, n):
+        start = datetime(2025, 3, 1)
+        alerts = []
+        for i in range(n):
+            codes = [reason(Z_EXTREME, z=round(rng.uniform(3, 6), 2))] if rng.random() < 0.5 else [reason(ROUND_AMOUNT)]
+            alerts.append({
+                "transaction_id": f"T{i}",
+                "vendor_id": f"V{rng.randrange(12)}",
+                "vendor_category": rng.choice(["IT", "Construction", "Medical"]),
+                "department_id": f"D{rng.randrange(4)}",
+                "amount": round(rng.uniform(100, 90000), 2),
+                "risk_score": round(rng.random(), 3),
+                "reason_codes": codes,
+                "created_at": start + timedelta(minutes=i * 7 + rng.randrange(5)),
+            })
+        rng.shuffle(alerts) # writes do not arrive in created_at order
+        return alerts
+
+    def entities(self, rollups):
+        return [{
+            "_id": e["_id"],
+            "category": e["category"],
+            "flag_count": e["flag_count"],
+            "total_risk_score": e["total_risk_score"],
+            "max_risk_score": e["max_risk_score"],
+            "total_amount": e["total_amount"],
+            "last_flagged": e["last_flagged"],
+            "departments": set(e["departments"]),
+            "recent_scores": e["recent_scores"],
+            "recent_reasons": [render_explanation(r) for r in e["recent_reasons"]],
+        } for e in asyncio.run(rollups.entities())]
+
+    def assertSameEntities(self, actual, expected):
+        self.assertEqual([e["_id"] for e in actual], [e["_id"] for e in expected])
+        for a, e in zip(actual, expected):
+            for field in ("total_risk_score", "total_amount"):
+                self.assertAlmostEqual(a.pop(field), e.pop(field), places=6)
+            self.assertEqual(a, e)
+
+    def test_matches_aggregation_when_written_in_batches(self):
+        rng = random.Random(7)
+        alerts = self.random_alerts(rng, 600)
+        rollups = VendorRollups(FakeCollection(None, "alerts"), FakeDatabase().get_collection("vendor_rollups"))
+        i = 0
+        while i < len(alerts):
+            size = rng.choice([1, 1, 5, 50])
+            asyncio.run(rollups.apply(alerts[i:i + size]))
+            i += size
+        self.assertSameEntities(self.entities(rollups), aggregate_entities(alerts))
+
+    def test_average_skips_unscored_alerts(self):
+        rollups = VendorRollups(FakeCollection(None, "alerts"), FakeDatabase().get_collection("vendor_rollups"))
+        alerts = self.random_alerts(random.Random(5), 200)
+        for alert in alerts[::3]:
+            alert["risk_score"] = None
+        asyncio.run(rollups.apply(alerts))
+        for e in asyncio.run(rollups.entities()):
+            scores = [a["risk_score"] for a in alerts if a["vendor_id"] == e["_id"] and a["risk_score"] is not None]
+            self.assertAlmostEqual(e["avg_risk_score"], sum(scores) / len(scores)) # what $avg returned
+
+    def test_buffers_are_capped(self):
+        rollups = VendorRollups(FakeCollection(None, "alerts"), FakeDatabase().get_collection("vendor_rollups"))
+        alerts = self.random_alerts(random.Random(1), 300)
+        asyncio.run(rollups.apply(alerts))
+        for doc in rollups.rollups.docs:
+            self.assertLessEqual(len(doc["recent_scores"]), RECENT_SCORES)
+            self.assertLessEqual(len(doc["recent_reasons"]), RECENT_REASONS)
+
+    def test_one_write_per_batch(self):
+        rollups = VendorRollups(FakeCollection(None, "alerts"), FakeDatabase().get_collection("vendor_rollups"))
+        asyncio.run(rollups.apply(self.random_alerts(random.Random(2), 500)))
+        asyncio.run(rollups.apply([]))
+        self.assertEqual(rollups.rollups.bulk_writes, 1)
+
+    def test_rebuild_recomputes_from_alerts(self):
+        alerts = self.random_alerts(random.Random(3), 400)
+        database = FakeDatabase()
+        stale = database.get_collection("vendor_rollups")
+        stale.docs = [{"_id": "V-GONE", "flag_count": 99, "max_risk_score": 1.0}]
+        rollups = VendorRollups(FakeCollection(database, "alerts", alerts), stale)
+        self.assertEqual(asyncio.run(rollups.rebuild(batch_size=64)), 12)
+
+        self.assertNotIn("vendor_rollups_rebuild", database.collections)
+        rebuilt = VendorRollups(None, database.get_collection("vendor_rollups"))
+        self.assertIn("risk_flags", rebuilt.rollups.indexes)
+        self.assertSameEntities(self.entities(rebuilt), aggregate_entities(alerts))
+
+    def test_ensure_rebuilds_only_when_empty(self):
+        database = FakeDatabase()
+        alerts = FakeCollection(database, "alerts", self.random_alerts(random.Random(4), 50))
+        asyncio.run(VendorRollups(alerts, database.get_collection("vendor_rollups")).ensure())
+        self.assertGreater(len(database.get_collection("vendor_rollups").docs), 0)
+
+        database.get_collection("vendor_rollups").docs = [{"_id": "V0", "flag_count": 1}]
+        asyncio.run(VendorRollups(alerts, database.get_collection("vendor_rollups")).ensure())
+        self.assertEqual([d["_id"] for d in database.get_collection("vendor_rollups").docs], ["V0"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,259 @@
+import sys
+import os
+import unittest
+import tempfile
+import importlib.util
+from datetime import datetime
+from collections import defaultdict
+
+# Add parent directory to path to import AuditEngine
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+from engine import AuditEngine
+from chunked_engine import ChunkedAuditEngine
+from columnar_engine import ColumnarAuditEngine
+
+LARGE_LEDGER = os.path.join(BACKEND_DIR, "data", "transactions_large.csv")
+NO_FEEDBACK = os.path.join(BACKEND_DIR, "data", "__no_feedback__.json")
+BACKENDS = ("engine", "columnar", "chunked", "stream")
+
+
+def legacy_high_frequency(transactions):
+    """The original O(n^2) HIGH_FREQUENCY scan, kept as the reference output."""
+    flagged = {}
+    history = defaultdict(list)
+    for tx in transactions:
+        history[(tx['vendor_id'], tx['department_id'])].append(tx)
+    for (v, d), txs in history.items():
+        txs = sorted(txs, key=lambda x: x['timestamp'])
+        for i in range(len(txs)):
+            count = 1
+            t_start = datetime.fromisoformat(txs[i]['timestamp'])
+            for j in range(i + 1, len(txs)):
+                t_curr = datetime.fromisoformat(txs[j]['timestamp'])
+                if (t_curr - t_start).total_seconds() < 172800:
+                    count += 1
+            if count >= 3:
+                flagged[txs[i]['transaction_id']] = count
+    return flagged
+
+
+def legacy_contract_split(transactions):
+    """The original O(n^2) CONTRACT_SPLIT scan, kept as the reference output."""
+    flagged = {}
+    history = defaultdict(list)
+    for tx in transactions:
+        if tx.get('project_id'):
+            history[tx['project_id']].append(tx)
+    for pid, txs in history.items():
+        txs = sorted(txs, key=lambda x: x['timestamp'])
+        for i in range(len(txs)):
+            count = 1
+            t_start = datetime.fromisoformat(txs[i]['timestamp'])
+            amount_sum = float(txs[i]['amount'])
+            for j in range(i + 1, len(txs)):
+                t_curr = datetime.fromisoformat(txs[j]['timestamp'])
+                if (t_curr - t_start).total_seconds() < 604800:
+                    count += 1
+                    amount_sum += float(txs[j]['amount'])
+            if count >= 4 and amount_sum < 2000000:
+                flagged[txs[i]['transaction_id']] = count
+    return flagged
+
+
+def signals_of_type(signals, sig_type):
+    return {
+        tx_id: s['desc']
+        for tx_id, sigs in signals.items()
+        for s in sigs if s['type'] == sig_type
+    }
+
+
+class TestWindowSignals(unittest.TestCase):
+    def setUp(self):
+        self.engine = AuditEngine(LARGE_LEDGER, feedback_path=NO_FEEDBACK)
+
+    def test_high_frequency_matches_legacy_scan(self):
+        expected = legacy_high_frequency(self.engine.transactions)
+        actual = signals_of_type(self.engine.get_probabilistic_signals(), "HIGH_FREQUENCY")
+        self.assertEqual(set(actual), set(expected))
+        for tx_id, count in expected.items():
+            self.assertIn(f"received {count} payments within a 48-hour window", actual[tx_id])
+
+    def test_high_frequency_dense_group(self):
+        # Many same-minute and boundary timestamps in one vendor/department group
+        self.engine.transactions = [
+            {"transaction_id": f"TX-{i}", "vendor_id": "VEN-1", "department_id": "DEP-1",
+             "vendor_category": "Supplies", "amount": 100.0, "project_id": "",
+             "timestamp": ts}
+            for i, ts in enumerate([
+                "2025-01-01T00:00:00", "2025-01-01T00:00:00", "2025-01-02T12:00:00",
+                "2025-01-03T00:00:00", "2025-01-03T00:00:01", "2025-01-05T00:00:00",
+                "2025-01-10T00:00:00", "2025-01-10T00:00:00", "2025-01-11T23:59:59",
+            ])
+        ]
+        expected = legacy_high_frequency(self.engine.transactions)
+        actual = signals_of_type(self.engine.get_probabilistic_signals(), "HIGH_FREQUENCY")
+        self.assertEqual(set(actual), set(expected))
+
+    def test_contract_split_matches_legacy_scan(self):
+        for ledger in (LARGE_LEDGER, os.path.join(BACKEND_DIR, "data", "transactions_fraud.csv")):
+            engine = AuditEngine(ledger, feedback_path=NO_FEEDBACK)
+            expected = legacy_contract_split(engine.transactions)
+            actual = signals_of_type(engine.get_probabilistic_signals(), "CONTRACT_SPLIT")
+            self.assertEqual(set(actual), set(expected), ledger)
+            for tx_id, count in expected.items():
+                self.assertIn(f": {count} transactions appearing under ₹20L threshold within 7 days.", actual[tx_id])
+
+    def test_contract_split_thresholds_are_tunable(self):
+        engine = AuditEngine(LARGE_LEDGER, feedback_path=NO_FEEDBACK,
+                             split_window=86400 * 3, split_min_count=2, split_ceiling=500000)
+        flagged_ids = set()
+        for tx_id, sigs in engine.get_probabilistic_signals().items():
+            for s in sigs:
+                if s['type'] == "CONTRACT_SPLIT":
+                    self.assertIn("under ₹5L threshold within 3 days", s['desc'])
+                    flagged_ids.add(tx_id)
+        self.assertTrue(flagged_ids)
+
+    def test_contract_split_catches_split_project_at_scale(self):
+        # Regenerate the fraud scenario ledger at 10x its usual size
+        spec = importlib.util.spec_from_file_location(
+            "generator_fraud", os.path.join(BACKEND_DIR, "data", "generator_fraud.py"))
+        generator = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(generator)
+        cwd = os.getcwd()
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                generator.generate_fraud_dataset(n=60000)
+                engine = AuditEngine("transactions_fraud.csv", feedback_path=NO_FEEDBACK)
+            finally:
+                os.chdir(cwd)
+        split = signals_of_type(engine.get_probabilistic_signals(), "CONTRACT_SPLIT")
+        self.assertTrue(any(tx_id.startswith("FRAUD-SPLIT-") for tx_id in split))
+        self.assertTrue(any("Project PROJ-404" in desc for desc in split.values()))
+
+class TestIncrementalIngest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.ledger = os.path.join(self.tmp.name, "ledger.csv")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, rows):
+        with open(self.ledger, "w") as f:
+            f.write("transaction_id,timestamp,department_id,vendor_id,vendor_category,amount,project_id\n")
+            for row in rows:
+                f.write(",".join(str(v) for v in row) + "\n")
+        return AuditEngine(self.ledger, feedback_path=NO_FEEDBACK)
+
+    def test_window_signals_match_batch_after_ingest(self):
+        full = AuditEngine(LARGE_LEDGER, feedback_path=NO_FEEDBACK)
+        txs = sorted(full.transactions, key=lambda t: t['timestamp'])
+        head, tail = txs[:len(txs) // 2], txs[len(txs) // 2:]
+        engine = self._write([
+            (t['transaction_id'], t['timestamp'], t['department_id'], t['vendor_id'],
+             t['vendor_category'], t['amount'], t['project_id']) for t in head
+        ])
+        live = {}
+        for tx in tail:
+            for alert in engine.ingest(tx):
+                live[alert['transaction_id']] = alert
+
+        # STAT_OUTLIER follows running statistics, every other signal must match the batch run
+        full.transactions = head + tail
+        batch_rules = full.get_rules_signals()
+        batch_prob = full.get_probabilistic_signals()
+        for tx in tail:
+            tx_id = tx['transaction_id']
+            expected = [s['desc'] for s in batch_rules.get(tx_id, []) + batch_prob.get(tx_id, [])
+                        if s['type'] != "STAT_OUTLIER"]
+            for desc in expected:
+                self.assertIn(desc, live[tx_id]['explanation'])
+
+    def test_ingest_updates_and_retracts_earlier_transactions(self):
+        engine = self._write([
+            ("TX-1", "2025-03-03T10:00:00", "DEP-1", "VEN-1", "Supplies", 100000.0, "PROJ-1"),
+            ("TX-2", "2025-03-03T11:00:00", "DEP-1", "VEN-2", "Supplies", 100000.0, "PROJ-1"),
+            ("TX-3", "2025-03-03T12:00:00", "DEP-1", "VEN-3", "Supplies", 100000.0, "PROJ-1"),
+        ])
+        delta = {a['transaction_id']: a for a in engine.ingest(
+            {"transaction_id": "TX-4", "timestamp": "2025-03-04T10:00:00", "department_id": "DEP-1",
+             "vendor_id": "VEN-4", "vendor_category": "Supplies", "amount": "100000", "project_id": "PROJ-1"})}
+        self.assertEqual(delta["TX-1"]['type'], "CONTRACT_SPLIT")
+        self.assertIn("4 transactions appearing under ₹20L", delta["TX-1"]['explanation'])
+
+        # A large payment pushes the project window over the ceiling
+        delta = {a['transaction_id']: a for a in engine.ingest(
+            {"transaction_id": "TX-5", "timestamp": "2025-03-04T11:00:00", "department_id": "DEP-1",
+             "vendor_id": "VEN-5", "vendor_category": "Supplies", "amount": "5000000", "project_id": "PROJ-1"})}
+        self.assertTrue(delta["TX-1"]['retracted'])
+
+    def test_duplicate_gap_is_exact_to_the_microsecond(self):
+        rows = [
+            ("TX-1", "2025-01-01T00:00:00.900000", "DEP-1", "VEN-1", "Supplies", 12345.0, ""),
+            # 86,399.2 s after TX-1: inside 24h, although the whole seconds are 86,400 apart
+            ("TX-2", "2025-01-02T00:00:00.100000", "DEP-1", "VEN-1", "Supplies", 12345.0, ""),
+            # 86,400.1 s after TX-2: outside
+            ("TX-3", "2025-01-03T00:00:00.200000", "DEP-1", "VEN-1", "Supplies", 12345.0, ""),
+        ]
+        self.assertEqual(self._flagged_by_backend(rows, "DUPLICATE", "Identical payment"),
+                         dict.fromkeys(BACKENDS, {"TX-2"}))
+
+    def test_high_frequency_window_is_exact_to_the_microsecond(self):
+        rows = [
+            ("TX-A", "2025-01-01T00:00:00.500000", "DEP-1", "VEN-1", "Supplies", 1000.0, ""),
+            ("TX-B", "2025-01-02T00:00:00", "DEP-1", "VEN-1", "Supplies", 2000.0, ""),
+            # 172,799.7 s and 172,799.8 s after TX-A: inside its 48h window, although
+            # the whole seconds are 172,800 apart
+            ("TX-C", "2025-01-03T00:00:00.200000", "DEP-1", "VEN-1", "Supplies", 3000.0, ""),
+            ("TX-D", "2025-01-03T00:00:00.300000", "DEP-1", "VEN-1", "Supplies", 4000.0, ""),
+        ]
+        flagged = self._flagged_by_backend(rows, "HIGH_FREQUENCY", "within a 48-hour window")
+        self.assertEqual(flagged, dict.fromkeys(BACKENDS, {"TX-A", "TX-B"}))
+
+    def test_contract_split_ceiling_is_exact(self):
+        amounts = [1.1, 500000.0, 0.2, 333333.33, 333333.33, 666666.67, 666666.67]
+        rows = [(f"TX-{i}", f"2025-03-03T{10 + i:02d}:00:00", "DEP-1", f"VEN-{i}", "Supplies", amount, "PROJ-1")
+                for i, amount in enumerate(amounts)]
+        # The last four sum to exactly 20,00,000, which is not under the ceiling
+        expected = set(legacy_contract_split(self._write(rows).transactions))
+        self.assertEqual(expected, set())
+        flagged = self._flagged_by_backend(rows, "CONTRACT_SPLIT", "transactions appearing under")
+        self.assertEqual(flagged, dict.fromkeys(BACKENDS, expected))
+
+    def test_contract_split_window_is_exact_to_the_microsecond(self):
+        rows = [
+            ("TX-A", "2025-03-03T00:00:00.500000", "DEP-1", "VEN-1", "Supplies", 1000.0, "PROJ-1"),
+            ("TX-B", "2025-03-04T00:00:00", "DEP-1", "VEN-2", "Supplies", 1000.0, "PROJ-1"),
+            ("TX-C", "2025-03-05T00:00:00", "DEP-1", "VEN-3", "Supplies", 1000.0, "PROJ-1"),
+            # 604,799.7 s after TX-A: inside its 7-day window
+            ("TX-D", "2025-03-10T00:00:00.200000", "DEP-1", "VEN-4", "Supplies", 1000.0, "PROJ-1"),
+        ]
+        self.assertEqual(set(legacy_contract_split(self._write(rows).transactions)), {"TX-A"})
+        flagged = self._flagged_by_backend(rows, "CONTRACT_SPLIT", "transactions appearing under")
+        self.assertEqual(flagged, dict.fromkeys(BACKENDS, {"TX-A"}))
+
+    def _flagged_by_backend(self, rows, sig_type, marker):
+        """IDs each backend flags with `sig_type` (the chunked backend by `marker` in its alerts)"""
+        flagged = {}
+        engine = self._write(rows)
+        signals = [engine.get_rules_signals(), engine.get_probabilistic_signals()]
+        flagged["engine"] = {tx_id for sigs in signals for tx_id, s in sigs.items() if any(x['type'] == sig_type for x in s)}
+        columnar = ColumnarAuditEngine(self.ledger, feedback_path=NO_FEEDBACK)
+        signals = [columnar.get_rules_signals(), columnar.get_probabilistic_signals()]
+        flagged["columnar"] = {tx_id for sigs in signals for tx_id, s in sigs.items() if any(x['type'] == sig_type for x in s)}
+        chunked = ChunkedAuditEngine(self.ledger, feedback_path=NO_FEEDBACK).run()
+        flagged["chunked"] = {a['transaction_id'] for a in chunked if marker in a['explanation']}
+
+        streamed = self._write(rows[:1])
+        for tx_id, ts, dept, vendor, category, amount, project in rows[1:]:
+            streamed.ingest({"transaction_id": tx_id, "timestamp": ts, "department_id": dept, "vendor_id": vendor,
+                             "vendor_category": category, "amount": amount, "project_id": project})
+        flagged["stream"] = {tx_id for tx_id, (_, _, sigs) in streamed._stream.live.items() if sig_type in sigs}
+        return flagged
+
+if __name__ == "__main__":
+    unittest.main()
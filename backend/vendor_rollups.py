@@ -0,0 +1,163 @@
+"""
+Per-vendor risk rollups backing `/api/entities`.
+
+`/api/entities` used to group the whole alerts collection by vendor and
+`$push` every score and explanation before slicing them. The `vendor_rollups`
+collection holds the result per vendor instead, and the API updates it as it
+writes alerts:
+
+- counters and sums ($inc): flag_count, scored_count (alerts with a numeric
+  risk_score, which avg_risk_score divides by, as `$avg` did), total_risk_score,
+  total_amount;
+- max_risk_score and last_flagged ($max), departments ($addToSet);
+- capped ring buffers, newest first by created_at ($push with $sort/$slice):
+  the last RECENT_SCORES scores (with the alert's vendor_category) and the
+  last RECENT_REASONS explanation inputs.
+
+Listing entities is then one indexed read. `rebuild()` (or
+`python vendor_rollups.py rebuild`) recomputes the collection from the alerts
+into a scratch collection and swaps it in.
+"""
+
+import asyncio
+from collections import defaultdict
+from typing import Dict, Iterable, List
+
+from pymongo import UpdateOne
+
+from alert_index import as_utc, is_number
+
+COLLECTION = "vendor_rollups"
+RECENT_SCORES = 10
+RECENT_REASONS = 3
+# The entities listing's sort; also created on the scratch collection of a rebuild
+ENTITIES_INDEX = ([("max_risk_score", -1), ("flag_count", -1)], {"name": "risk_flags"})
+
+# Alert fields render_explanation needs to rebuild a reason's text
+REASON_FIELDS = ("explanation", "reasons", "reason_codes", "narrative_codes", "risk_score", "amount",
+                 "vendor_id", "department_id")
+
+
+class VendorRollups:
+    def __init__(self, alerts, rollups):
+        self.alerts = alerts
+        self.rollups = rollups
+
+    async def apply(self, alerts: Iterable[Dict]):
+        """Fold newly inserted alerts into their vendors' rollups (one update per vendor)"""
+        updates = [UpdateOne({"_id": vendor}, update, upsert=True) for vendor, update in rollup_updates(alerts).items()]
+        if updates:
+            await self.rollups.bulk_write(updates, ordered=False)
+
+    async def entities(self, limit: int = 100) -> List[Dict]:
+        """The riskiest vendors, shaped like the old /api/entities aggregation's output"""
+        cursor = self.rollups.find({}).sort(ENTITIES_INDEX[0]).limit(limit)
+        return [entity(doc) async for doc in cursor]
+
+    async def clear(self):
+        await self.rollups.delete_many({})
+
+    async def ensure(self):
+        """Rebuild from the alerts if there are alerts but no rollups yet (first start)"""
+        if await self.rollups.estimated_document_count() == 0 and await self.alerts.estimated_document_count() > 0:
+            await self.rebuild()
+
+    async def rebuild(self, batch_size: int = 5000) -> int:
+        """
+        Recompute every rollup from the alerts. Built in a scratch collection that
+        replaces the live one in a single rename, so readers never see it half
+        built; alerts written during the rebuild are in it only if the scan
+        reached them.
+        """
+        database = self.rollups.database
+        scratch = database.get_collection(f"{self.rollups.name}_rebuild")
+        await scratch.drop()
+        keys, options = ENTITIES_INDEX
+        await scratch.create_index(keys, **options)
+        batch = []
+        projection = {field: 1 for field in REASON_FIELDS + ("created_at", "vendor_category")}
+        async for alert in self.alerts.find({}, projection):
+            batch.append(alert)
+            if len(batch) >= batch_size:
+                await VendorRollups(self.alerts, scratch).apply(batch)
+                batch = []
+        await VendorRollups(self.alerts, scratch).apply(batch)
+        vendors = await scratch.estimated_document_count()
+        if vendors:
+            await scratch.rename(self.rollups.name, dropTarget=True)
+        else:
+            await self.rollups.delete_many({})
+        return vendors
+
+
+def rollup_updates(alerts: Iterable[Dict]) -> Dict[object, Dict]:
+    """The update document per vendor that folds these alerts into its rollup"""
+    by_vendor = defaultdict(list)
+    for alert in alerts:
+        by_vendor[alert.get("vendor_id")].append(alert)
+
+    updates = {}
+    for vendor, vendor_alerts in by_vendor.items():
+        inc = {"flag_count": len(vendor_alerts), "scored_count": 0, "total_risk_score": 0, "total_amount": 0}
+        maxes = {}
+        departments, scores, reasons = [], [], []
+        for alert in vendor_alerts:
+            created_at = as_utc(alert.get("created_at"))
+            score = alert.get("risk_score")
+            if is_number(score):
+                inc["scored_count"] += 1
+                inc["total_risk_score"] += score
+                maxes["max_risk_score"] = max(maxes.get("max_risk_score", score), score)
+            if is_number(alert.get("amount")):
+                inc["total_amount"] += alert["amount"]
+            if created_at is not None:
+                maxes["last_flagged"] = max(maxes.get("last_flagged", created_at), created_at)
+            if "department_id" in alert and alert["department_id"] not in departments:
+                departments.append(alert["department_id"])
+            scores.append({"created_at": created_at, "risk_score": score, "vendor_category": alert.get("vendor_category")})
+            reason = {field: alert[field] for field in REASON_FIELDS if field in alert}
+            reason["created_at"] = created_at
+            reasons.append(reason)
+
+        update = {
+            "$inc": inc,
+            "$push": {
+                "recent_scores": {"$each": scores, "$sort": {"created_at": -1}, "$slice": RECENT_SCORES},
+                "recent_reasons": {"$each": reasons, "$sort": {"created_at": -1}, "$slice": RECENT_REASONS},
+            },
+        }
+        if maxes:
+            update["$max"] = maxes
+        if departments:
+            update["$addToSet"] = {"departments": {"$each": departments}}
+        updates[vendor] = update
+    return updates
+
+
+def entity(doc: Dict) -> Dict:
+    recent = doc.get("recent_scores", [])
+    return {
+        "_id": doc["_id"],
+        "vendor_name": doc["_id"],
+        "category": recent[0].get("vendor_category") if recent else None,
+        "flag_count": doc.get("flag_count", 0),
+        "total_risk_score": doc.get("total_risk_score", 0),
+        "max_risk_score": doc.get("max_risk_score"),
+        "avg_risk_score": doc.get("total_risk_score", 0) / doc["scored_count"] if doc.get("scored_count") else None,
+        "total_amount": doc.get("total_amount", 0),
+        "last_flagged": doc.get("last_flagged"),
+        "departments": doc.get("departments", []),
+        "recent_scores": [r.get("risk_score") for r in recent],
+        "recent_reasons": doc.get("recent_reasons", []),
+    }
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:] != ["rebuild"]:
+        sys.exit("usage: python vendor_rollups.py rebuild")
+    from database import alerts_collection, vendor_rollups_collection
+
+    vendors = asyncio.run(VendorRollups(alerts_collection, vendor_rollups_collection).rebuild())
+    print(f"✅ Rebuilt rollups for {vendors} vendors")
@@ -0,0 +1,110 @@
+"""
+Windowed-count primitives shared by the audit engine signals.
+
+Every window signal in the engine has the same shape: for each transaction in a
+group sorted by time, look forward and aggregate the transactions that fall
+inside a fixed-length window starting at it. Working on pre-parsed integer epoch
+times (microseconds, so window edges match datetime subtraction) lets this be
+done with two pointers in O(n) per group instead of re-scanning (and
+re-parsing) every later transaction.
+"""
+
+from datetime import datetime, timezone
+from typing import List, Tuple
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+# Fields of a parsed timestamp
+EPOCH, MICROS, HOUR, MINUTE, WEEKDAY, AWARE = range(6)
+
+# DUPLICATE window in microseconds: every backend compares exact gaps, as datetime subtraction does
+DUPLICATE_WINDOW_MICROS = 86400 * 10**6
+
+
+def parse_timestamp(timestamp: str) -> Tuple[int, int, int, int, int, bool]:
+    """
+    Parse a transaction timestamp once into (epoch seconds, leftover
+    microseconds, hour, minute, weekday, timezone-aware), for every signal to
+    reuse. A plain tuple of scalars, which the garbage collector stops tracking,
+    keeps one per transaction cheap.
+    """
+    if timestamp.endswith('Z'):
+        timestamp = timestamp[:-1] + '+00:00'
+    dt = datetime.fromisoformat(timestamp)
+    epoch, micros = _epoch_parts(dt)
+    return (epoch, micros, dt.hour, dt.minute, dt.weekday(), dt.tzinfo is not None)
+
+
+def seconds_until(parsed, now: datetime) -> float:
+    """(now - timestamp).total_seconds() for a naive `now` and a naive parsed timestamp"""
+    now_epoch, now_micros = _epoch_parts(now)
+    return ((now_epoch - parsed[EPOCH]) * 10**6 + now_micros - parsed[MICROS]) / 10**6
+
+
+def epoch_micros(parsed) -> int:
+    """Integer epoch microseconds of a parsed timestamp"""
+    return parsed[EPOCH] * 10**6 + parsed[MICROS]
+
+
+def _epoch_parts(dt: datetime) -> Tuple[int, int]:
+    delta = dt - (_EPOCH_UTC if dt.tzinfo is not None else _EPOCH)
+    return delta.days * 86400 + delta.seconds, delta.microseconds
+
+
+def epoch_seconds(timestamp: str) -> int:
+    """Parse an ISO-8601 timestamp into integer epoch seconds.
+
+    Naive timestamps are treated as UTC wall-clock time, which keeps the
+    differences between them identical to subtracting the parsed datetimes.
+    """
+    return _epoch_parts(datetime.fromisoformat(timestamp))[0]
+
+
+def forward_window_counts(epochs: List[int], window: int) -> List[int]:
+    """
+    For every position i of a sorted epoch list, count the entries j >= i
+    with epochs[j] - epochs[i] < window (the entry itself included).
+    """
+    n = len(epochs)
+    counts = [0] * n
+    right = 0
+    for i in range(n):
+        if right < i:
+            right = i
+        limit = epochs[i] + window
+        while right < n and epochs[right] < limit:
+            right += 1
+        counts[i] = right - i
+    return counts
+
+
+def to_paise(amount) -> int:
+    """An amount in integer paise, so window totals add and slide without float error"""
+    return round(float(amount) * 100)
+
+
+def forward_window_sums(epochs: List[int], amounts: List[int], window: int) -> Tuple[List[int], List[int]]:
+    """
+    Rolling forward window over a sorted epoch list that also keeps a running
+    amount total: returns (counts, sums) for the entries j >= i with
+    epochs[j] - epochs[i] < window. Amounts are integer paise (see to_paise),
+    so every sum is exact however far the window slides.
+    """
+    n = len(epochs)
+    counts = [0] * n
+    sums = [0] * n
+    right = 0
+    running = 0
+    for i in range(n):
+        if right < i:
+            right = i
+        limit = epochs[i] + window
+        while right < n and epochs[right] < limit:
+            running += amounts[right]
+            right += 1
+        counts[i] = right - i
+        sums[i] = running
+        running -= amounts[i] # slide the window start past i
+    return counts, sums